@@ -34,6 +34,7 @@ from public_lock import (
 ROOT = Path(__file__).resolve().parents[1]
 SRC = ROOT / "src"
 API_DIR = SRC / "api"
+LOAD_SCENARIO_DIR = API_DIR / "tests" / "load" / "scenarios"
 PUBLISHER_DIR = SRC / "external-sli-publisher"
 WORKFLOWS_DIR = ROOT / ".github" / "workflows"
 ACTIONLINT_IMAGE = "rhysd/actionlint:1.7.12"
@@ -515,9 +516,13 @@ def target_test_api() -> None:
 
 
 def target_test_publisher() -> None:
-    print_step("Running external SLI publisher unit tests")
-    run_uv_in(PUBLISHER_DIR, ["pytest", "tests/unit/", "-q"], env=pythonpath_env())
-    print_success("External SLI publisher unit tests passed")
+    print_step("Running external SLI publisher unit and end-to-end tests")
+    run_uv_in(
+        PUBLISHER_DIR,
+        ["pytest", "tests/unit/", "tests/e2e/", "-q"],
+        env=pythonpath_env(),
+    )
+    print_success("External SLI publisher tests passed")
 
 
 def target_test_hooks() -> None:
@@ -1063,47 +1068,37 @@ def resolve_base_url() -> str:
     return base_url
 
 
+def load_scenario_path(profile: str) -> Path:
+    """Bundled scenario name (`tests/load/scenarios/<name>.toml`) or a file path."""
+    path = Path(profile)
+    if path.suffix == ".toml":
+        return path.resolve()
+    return LOAD_SCENARIO_DIR / f"{profile}.toml"
+
+
 def run_load_profile(profile: str) -> None:
-    defaults = {
-        "smoke": ("5", "2", "30"),
-        "baseline": ("50", "5", "120"),
-        "stress": ("200", "20", "300"),
-        "spike": ("300", "100", "120"),
-    }
-    if profile not in defaults:
-        print(f"error: Unknown load profile: {profile}", file=sys.stderr)
+    scenario = load_scenario_path(profile)
+    if not scenario.is_file():
+        available = ", ".join(
+            sorted(path.stem for path in LOAD_SCENARIO_DIR.glob("*.toml"))
+        )
+        print(
+            f"error: Unknown load scenario: {profile} (available: {available})",
+            file=sys.stderr,
+        )
         raise SystemExit(1)
 
-    default_users, default_spawn_rate, default_duration = defaults[profile]
-    users = os.environ.get("USERS", default_users)
-    spawn_rate = os.environ.get("SPAWN_RATE", default_spawn_rate)
-    duration = os.environ.get("DURATION", default_duration)
     base_url = resolve_base_url()
-
-    env = pythonpath_env({"TEST_BASE_PATH": base_url})
-    print(
-        f"[load] profile={profile} users={users} spawn_rate={spawn_rate}/s "
-        f"duration={duration}s host={base_url}",
-        file=sys.stderr,
-    )
-    run_uv_in(
-        API_DIR,
-        [
-            "locust",
-            "-f",
-            "tests/load/locustfile.py",
-            "--headless",
-            "-u",
-            users,
-            "-r",
-            spawn_rate,
-            "--run-time",
-            duration,
-            "--host",
-            base_url,
-        ],
-        env=env,
-    )
+    args = ["python", "tests/load/engine.py", str(scenario), "--host", base_url]
+    if duration := os.environ.get("DURATION"):
+        args += ["--duration", duration]
+    if rate_scale := os.environ.get("RATE_SCALE"):
+        args += ["--rate-scale", rate_scale]
+    if mode := os.environ.get("LOAD_MODE"):
+        args += ["--mode", mode]
+    if report := os.environ.get("LOAD_REPORT"):
+        args += ["--json", str(Path(report).resolve())]
+    run_uv_in(API_DIR, args, env=pythonpath_env())
 
 
 def target_load_smoke() -> None:
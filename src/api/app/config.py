@@ -16,6 +16,10 @@ class Settings(BaseSettings):
     # App
     app_port: int = Field(8000, alias="APP_PORT")
     log_level: str = Field("INFO", alias="LOG_LEVEL")
+    # console log: text (format string) / json (trace / request ID 付き構造化)
+    log_format: str = Field("text", alias="LOG_FORMAT")
+    # true で QueueHandler + listener thread に format / write を移す
+    log_async: bool = Field(False, alias="LOG_ASYNC")
 
     # Redis
     redis_enabled: bool = Field(False, alias="REDIS_ENABLED")
@@ -51,3 +55,40 @@ class Settings(BaseSettings):
     telemetry_export_interval_ms: int = Field(
         30000, alias="TELEMETRY_EXPORT_INTERVAL_MS"
     )
+    # In-process RED metrics: route template x status class の series 上限
+    # (超過分は __overflow__ route に合算)
+    red_metrics_max_series: int = Field(200, alias="RED_METRICS_MAX_SERIES")
+    # Runtime metrics (event-loop lag / GC pause / task 数 / RSS / CPU)
+    # lag sampler の周期。下限 50ms に clamp して sampling overhead を抑える
+    runtime_metrics_enabled: bool = Field(True, alias="RUNTIME_METRICS_ENABLED")
+    runtime_metrics_interval_ms: int = Field(500, alias="RUNTIME_METRICS_INTERVAL_MS")
+    # On-demand sampling profiler (opt-in)。無効時は endpoint が 404 を返し、
+    # signal handler / sampler thread も作らない
+    profiling_enabled: bool = Field(False, alias="PROFILING_ENABLED")
+    profiling_default_seconds: float = Field(10.0, alias="PROFILING_DEFAULT_SECONDS")
+    profiling_max_seconds: float = Field(60.0, alias="PROFILING_MAX_SECONDS")
+    profiling_interval_ms: int = Field(10, alias="PROFILING_INTERVAL_MS")
+    profiling_output_dir: str = Field("/tmp/profiles", alias="PROFILING_OUTPUT_DIR")  # noqa: S108
+    # OTLP log handler の dedup / rate limit。(logger, level, template) ごとに
+    # interval 内 burst 件を超えた record を severity 別に間引き summary 化する
+    log_rate_limit_enabled: bool = Field(True, alias="LOG_RATE_LIMIT_ENABLED")
+    log_rate_limit_interval_seconds: float = Field(
+        10.0, alias="LOG_RATE_LIMIT_INTERVAL_SECONDS"
+    )
+    log_rate_limit_burst: int = Field(5, alias="LOG_RATE_LIMIT_BURST")
+    log_rate_limit_max_keys: int = Field(1000, alias="LOG_RATE_LIMIT_MAX_KEYS")
+    # Exemplars: histogram bucket ごとに保持する sampled trace の上限
+    # (export interval 単位)。0 で exemplar を無効化する
+    telemetry_exemplars_per_bucket: int = Field(
+        2, alias="TELEMETRY_EXEMPLARS_PER_BUCKET"
+    )
+    # Disk spill buffer for OTLP export failures (collector outage 対策)
+    # emptyDir (/data) 上に失敗 batch を保持し、export 回復後に replay する
+    telemetry_spill_enabled: bool = Field(False, alias="TELEMETRY_SPILL_ENABLED")
+    telemetry_spill_dir: str = Field("/data/otel-spill", alias="TELEMETRY_SPILL_DIR")
+    telemetry_spill_max_bytes: int = Field(
+        64 * 1024 * 1024, alias="TELEMETRY_SPILL_MAX_BYTES"
+    )
+    telemetry_spill_segment_bytes: int = Field(
+        4 * 1024 * 1024, alias="TELEMETRY_SPILL_SEGMENT_BYTES"
+    )
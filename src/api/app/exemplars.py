@@ -0,0 +1,136 @@
+"""Bounded per-bucket exemplar reservoir for latency histograms.
+
+SDK 既定の AlignedHistogramBucketExemplarReservoir は bucket ごとに
+"最後に観測した 1 件" しか保持しないため、chaos 中に同じ bucket へ大量の
+測定値が入ると直近の trace に偏る。本モジュールの reservoir は
+
+- bucket ごとに最大 ``size_per_bucket`` 件を reservoir sampling
+  (Algorithm R) で一様に保持し、
+- export interval ごとの ``collect`` で中身を破棄する (DELTA と整合)。
+
+trace context を持たない測定値 (sampled span 外の record) は保持しない。
+"""
+
+import random
+from bisect import bisect_left
+from collections.abc import Callable, Sequence
+from functools import partial
+from threading import Lock
+
+from opentelemetry import trace
+from opentelemetry.context import Context
+from opentelemetry.sdk.metrics import Exemplar, ExemplarReservoir
+from opentelemetry.util.types import Attributes
+
+DEFAULT_EXEMPLARS_PER_BUCKET = 2
+
+
+class _Slot:
+    __slots__ = ("attributes", "span_id", "time_unix_nano", "trace_id", "value")
+
+    def __init__(
+        self,
+        value: float,
+        time_unix_nano: int,
+        attributes: Attributes,
+        trace_id: int,
+        span_id: int,
+    ) -> None:
+        self.value = value
+        self.time_unix_nano = time_unix_nano
+        self.attributes = attributes
+        self.trace_id = trace_id
+        self.span_id = span_id
+
+
+class BucketedExemplarReservoir(ExemplarReservoir):
+    """Keep up to ``size_per_bucket`` sampled exemplars per histogram bucket.
+
+    explicit bucket histogram からは ``boundaries`` が渡される。exponential
+    histogram から渡される ``size`` は使わず、それ以外の aggregation (sum 等) と
+    同じく ``size_per_bucket`` 件を上限とする単一 bucket として動く。
+    """
+
+    def __init__(
+        self,
+        *,
+        size_per_bucket: int = DEFAULT_EXEMPLARS_PER_BUCKET,
+        boundaries: Sequence[float] = (),
+        size: int | None = None,
+    ) -> None:
+        super().__init__()
+        if size_per_bucket < 1:
+            raise ValueError("size_per_bucket must be >= 1")
+        self._size = size_per_bucket
+        self._boundaries = tuple(boundaries)
+        bucket_count = len(self._boundaries) + 1
+        self._slots: list[list[_Slot]] = [[] for _ in range(bucket_count)]
+        self._seen: list[int] = [0] * bucket_count
+        self._lock = Lock()
+        self._random = random.Random()  # noqa: S311
+
+    def offer(
+        self,
+        value: float,
+        time_unix_nano: int,
+        attributes: Attributes,
+        context: Context,
+    ) -> None:
+        span_context = trace.get_current_span(context).get_span_context()
+        if not span_context.is_valid:
+            return
+        # explicit bucket の上限は inclusive (value <= boundary)
+        index = bisect_left(self._boundaries, value)
+        slot = _Slot(
+            value,
+            time_unix_nano,
+            attributes,
+            span_context.trace_id,
+            span_context.span_id,
+        )
+        with self._lock:
+            self._seen[index] += 1
+            slots = self._slots[index]
+            if len(slots) < self._size:
+                slots.append(slot)
+                return
+            replace_at = self._random.randrange(self._seen[index])
+            if replace_at < self._size:
+                slots[replace_at] = slot
+
+    def collect(self, point_attributes: Attributes) -> list[Exemplar]:
+        with self._lock:
+            buckets = self._slots
+            self._slots = [[] for _ in buckets]
+            self._seen = [0] * len(buckets)
+        point_keys = set(point_attributes or {})
+        exemplars: list[Exemplar] = []
+        for slots in buckets:
+            for slot in slots:
+                # data point 側に既にある attribute は exemplar から除く (仕様)
+                filtered = {
+                    key: val
+                    for key, val in (slot.attributes or {}).items()
+                    if key not in point_keys
+                }
+                exemplars.append(
+                    Exemplar(
+                        filtered,
+                        slot.value,
+                        slot.time_unix_nano,
+                        slot.span_id,
+                        slot.trace_id,
+                    )
+                )
+        return exemplars
+
+
+def bucketed_reservoir_factory(
+    size_per_bucket: int,
+) -> Callable[[type], Callable[..., ExemplarReservoir]]:
+    """Return a View ``exemplar_reservoir_factory`` for the bounded reservoir."""
+
+    def factory(_aggregation_type: type) -> Callable[..., ExemplarReservoir]:
+        return partial(BucketedExemplarReservoir, size_per_bucket=size_per_bucket)
+
+    return factory
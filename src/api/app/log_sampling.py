@@ -0,0 +1,153 @@
+"""Deduplication / rate limiting for the OTLP log handler.
+
+Redis 障害時の ``root()`` は request ごとに同じ ``Redis operation failed`` を
+出すため、stress profile の RPS ではそのまま OTLP exporter を溢れさせ、
+format / encode に CPU を使う。本 filter は ``app`` logger の OTLP handler に
+付け、
+
+- ``(logger name, level, message template)`` ごとに interval 内の先頭
+  ``burst`` 件だけを通し、
+- 以降は severity ごとの間隔 (``sample_every``) で決定的に間引き、
+- 抑制した件数を interval 終了後に 1 件の summary record として出す。
+
+判定は ``record.msg`` (format 前の template) のみで行い、抑制した record は
+format も export もしない。key 数は ``max_keys`` で上限を設ける。
+"""
+
+import logging
+import time
+from collections.abc import Callable, Mapping
+from threading import Lock
+
+DEFAULT_INTERVAL_SECONDS = 10.0
+DEFAULT_BURST = 5
+DEFAULT_MAX_KEYS = 1000
+# burst 超過後に N 件に 1 件通す。0 は全て抑制 (summary のみ)。
+# CRITICAL 以上は常に通す。
+DEFAULT_SAMPLE_EVERY: Mapping[int, int] = {
+    logging.DEBUG: 0,
+    logging.INFO: 0,
+    logging.WARNING: 100,
+    logging.ERROR: 10,
+}
+OVERFLOW_KEY = "__overflow__"
+
+_Key = tuple[str, int, str]
+
+
+class _KeyState:
+    __slots__ = ("seen", "suppressed")
+
+    def __init__(self) -> None:
+        self.seen = 0
+        self.suppressed = 0
+
+
+class LogRateLimitFilter(logging.Filter):
+    """Collapse repeated log records into counted summaries per interval.
+
+    summary は ``bind`` した handler へ直接渡す。summary record は
+    ``suppressed_count`` 属性 (OTLP log attribute としても export される) を持ち、
+    本 filter を素通りする。
+    """
+
+    def __init__(
+        self,
+        *,
+        interval_seconds: float = DEFAULT_INTERVAL_SECONDS,
+        burst: int = DEFAULT_BURST,
+        max_keys: int = DEFAULT_MAX_KEYS,
+        sample_every: Mapping[int, int] = DEFAULT_SAMPLE_EVERY,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        super().__init__()
+        self._interval = float(interval_seconds)
+        self._burst = max(0, int(burst))
+        self._max_keys = max(1, int(max_keys))
+        self._sample_levels = sorted(sample_every.items())
+        self._clock = clock
+        self._lock = Lock()
+        self._keys: dict[_Key, _KeyState] = {}
+        self._window_end = clock() + self._interval
+        self._handler: logging.Handler | None = None
+
+    def bind(self, handler: logging.Handler) -> None:
+        """Set the handler that receives summary records."""
+        self._handler = handler
+
+    def _sample_every(self, levelno: int) -> int:
+        if levelno >= logging.CRITICAL:
+            return 1
+        every = 0
+        for level, value in self._sample_levels:
+            if level <= levelno:
+                every = value
+        return every
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if getattr(record, "suppressed_count", None) is not None:
+            return True
+        now = self._clock()
+        msg = record.msg if isinstance(record.msg, str) else type(record.msg).__name__
+        key: _Key = (record.name, record.levelno, msg)
+        summaries: list[logging.LogRecord] = []
+        with self._lock:
+            if now >= self._window_end:
+                summaries = self._roll(now)
+            state = self._keys.get(key)
+            if state is None:
+                if len(self._keys) >= self._max_keys:
+                    key = (OVERFLOW_KEY, record.levelno, "")
+                    state = self._keys.get(key)
+                if state is None:
+                    state = self._keys[key] = _KeyState()
+            state.seen += 1
+            over = state.seen - self._burst
+            allow = over <= 0
+            if not allow:
+                every = self._sample_every(record.levelno)
+                allow = every > 0 and over % every == 0
+                if not allow:
+                    state.suppressed += 1
+        self._emit(summaries)
+        return allow
+
+    def flush(self) -> None:
+        """Emit pending summaries immediately (e.g. before shutdown)."""
+        with self._lock:
+            summaries = self._roll(self._clock())
+        self._emit(summaries)
+
+    def _roll(self, now: float) -> list[logging.LogRecord]:
+        summaries = [
+            self._summary_record(key, state.suppressed)
+            for key, state in self._keys.items()
+            if state.suppressed
+        ]
+        self._keys = {}
+        self._window_end = now + self._interval
+        return summaries
+
+    def _summary_record(self, key: _Key, suppressed: int) -> logging.LogRecord:
+        name, levelno, template = key
+        record = logging.LogRecord(
+            name=name,
+            level=levelno,
+            pathname=__file__,
+            lineno=0,
+            msg="Suppressed %d repeated log records within %.0fs: %s",
+            args=(suppressed, self._interval, template),
+            exc_info=None,
+        )
+        record.suppressed_count = suppressed
+        return record
+
+    def _emit(self, summaries: list[logging.LogRecord]) -> None:
+        handler = self._handler
+        if handler is None:
+            return
+        for record in summaries:
+            try:
+                handler.handle(record)
+            except Exception:  # noqa: BLE001
+                handler.handleError(record)
@@ -0,0 +1,176 @@
+"""Console logging configuration (text / JSON, sync / queue-based).
+
+既定 (``LOG_FORMAT=text``, ``LOG_ASYNC=false``) は従来どおり
+``logging.basicConfig`` の format string で同期出力する。出力先はどの mode でも
+basicConfig と同じ stderr (ContainerLogV2 の収集対象を変えない)。
+
+- ``LOG_FORMAT=json``: 1 行 1 JSON object で出力し、trace ID / span ID /
+  request ID を含める
+- ``LOG_ASYNC=true``: root logger には ``QueueHandler`` だけを付け、format と
+  write は ``QueueListener`` の thread で行う。event loop thread 側の
+  コストは trace / request ID の取得と queue への put のみ
+
+queue は有界で、溢れた record は破棄して件数を数え、listener の停止時に
+warning として出力する (出力先の詰まりで event loop を止めない)。OTLP log handler (``app`` logger) は対象外。
+"""
+
+import json
+import logging
+import queue
+from contextvars import ContextVar
+from datetime import UTC, datetime
+from logging.handlers import QueueHandler, QueueListener
+from typing import Any
+
+from opentelemetry import trace
+
+LOGGER = logging.getLogger(__name__)
+TEXT_FORMAT = "%(asctime)s - %(name)s - %(levelname)s - %(message)s"
+DEFAULT_QUEUE_SIZE = 10000
+
+# request_id_middleware が request ごとに設定する。log record への付与に使う。
+request_id_var: ContextVar[str | None] = ContextVar("request_id", default=None)
+
+
+def _annotate(record: logging.LogRecord) -> None:
+    """Attach request / trace IDs from the caller's context to the record.
+
+    LoggingInstrumentor (set_logging_format=True) が otelTraceID 等を付けて
+    いない場合は current span から補う。listener thread では context が
+    失われるため、enqueue 前に呼び出し元 thread で実行する。
+    """
+    if not hasattr(record, "request_id"):
+        record.request_id = request_id_var.get()
+    trace_id = getattr(record, "otelTraceID", None)
+    if trace_id is None or trace_id == "0":
+        span_context = trace.get_current_span().get_span_context()
+        if span_context.is_valid:
+            record.otelTraceID = format(span_context.trace_id, "032x")
+            record.otelSpanID = format(span_context.span_id, "016x")
+
+
+class JsonFormatter(logging.Formatter):
+    """Render a record as a single-line JSON object."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        if not hasattr(record, "request_id"):
+            _annotate(record)
+        payload: dict[str, Any] = {
+            "timestamp": datetime.fromtimestamp(record.created, UTC).isoformat(),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        trace_id = getattr(record, "otelTraceID", None)
+        if trace_id and trace_id != "0":
+            payload["trace_id"] = trace_id
+            payload["span_id"] = getattr(record, "otelSpanID", None)
+        request_id = getattr(record, "request_id", None)
+        if request_id:
+            payload["request_id"] = request_id
+        if record.exc_info:
+            payload["exception"] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            payload["exception"] = record.exc_text
+        return json.dumps(payload, ensure_ascii=False, default=str)
+
+
+class ContextQueueHandler(QueueHandler):
+    """QueueHandler that defers formatting to the listener thread.
+
+    標準の ``QueueHandler.prepare`` は呼び出し元 thread で message を format
+    するため、ここでは context 由来の ID の付与だけを行い、record をそのまま
+    queue に入れる。args に渡した mutable object を log 直後に変更すると
+    出力に反映されうる点は許容する。
+    """
+
+    def __init__(self, q: queue.Queue[logging.LogRecord | None]) -> None:
+        super().__init__(q)
+        self.records = q
+        self.dropped = 0
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        _annotate(record)
+        return record
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+class ContextQueueListener(QueueListener):
+    """QueueListener that detaches its ``ContextQueueHandler`` on ``stop``.
+
+    stop 後も root に queue handler が残ると、以降の record は誰も drain しない
+    queue に溜まるだけになる。stop では root から queue handler を外し、
+    listener の handler を root に直接付けて同期出力に戻す。queue が溢れて
+    破棄した件数はその後に warning として出力する。
+    """
+
+    def __init__(
+        self, queue_handler: ContextQueueHandler, *handlers: logging.Handler
+    ) -> None:
+        super().__init__(queue_handler.queue, *handlers, respect_handler_level=True)
+        self.queue_handler = queue_handler
+
+    def enqueue_sentinel(self) -> None:
+        # 既定の put_nowait は queue が満杯だと queue.Full で stop を中断する。
+        # listener thread が drain するので空きを待ってよい (sentinel は None)
+        self.queue_handler.records.put(None)
+
+    def stop(self) -> None:
+        root = logging.getLogger()
+        root.removeHandler(self.queue_handler)
+        super().stop()
+        for handler in self.handlers:
+            root.addHandler(handler)
+        if self.queue_handler.dropped:
+            LOGGER.warning(
+                "console log queue was full; dropped %d records",
+                self.queue_handler.dropped,
+            )
+
+
+def _formatter(log_format: str) -> logging.Formatter:
+    if log_format.lower() == "json":
+        return JsonFormatter()
+    return logging.Formatter(TEXT_FORMAT)
+
+
+def configure_logging(
+    level: str,
+    *,
+    log_format: str = "text",
+    use_queue: bool = False,
+    queue_size: int = DEFAULT_QUEUE_SIZE,
+) -> QueueListener | None:
+    """Configure root console logging and return the listener when queued.
+
+    返した listener は shutdown 時に ``stop()`` して残りの record を書き出す
+    (以降の record は root に直接付け直した handler で同期出力する)。
+    """
+    log_level = getattr(logging, level.upper(), logging.INFO)
+    if not use_queue and log_format.lower() != "json":
+        logging.basicConfig(level=log_level, format=TEXT_FORMAT)
+        return None
+
+    stream_handler = logging.StreamHandler()
+    stream_handler.setFormatter(_formatter(log_format))
+    if not use_queue:
+        logging.basicConfig(level=log_level, handlers=[stream_handler])
+        return None
+
+    record_queue: queue.Queue[logging.LogRecord | None] = queue.Queue(
+        maxsize=queue_size
+    )
+    queue_handler = ContextQueueHandler(record_queue)
+    logging.basicConfig(level=log_level, handlers=[queue_handler])
+    # basicConfig は root に handler が既にあると何もしない (lifespan の再実行等)。
+    # その場合は listener を起動しない
+    if queue_handler not in logging.getLogger().handlers:
+        return None
+    listener = ContextQueueListener(queue_handler, stream_handler)
+    listener.start()
+    return listener
@@ -9,19 +9,26 @@ from time import monotonic
 from typing import Any
 from uuid import uuid4
 
-from fastapi import Depends, FastAPI, Request
-from fastapi.responses import JSONResponse
+from fastapi import Depends, FastAPI, HTTPException, Query, Request
+from fastapi.responses import JSONResponse, PlainTextResponse
 from opentelemetry import trace
 
+from app import profiler
 from app.config import Settings
+from app.logging_config import configure_logging, request_id_var
 from app.models import ErrorResponse, HealthResponse, LivenessResponse, MainResponse
 from app.redis_client import RedisClient
 from app.telemetry import (
     decrement_active_requests,
     increment_active_requests,
+    record_red_request,
+    record_redis_metrics,
+    record_redis_status_only,
     record_span_error,
     setup_telemetry,
     shutdown_telemetry,
+    start_runtime_metrics,
+    stop_runtime_metrics,
 )
 
 
@@ -96,12 +103,21 @@ async def lifespan(app: FastAPI) -> AsyncIterator[None]:
     Note: Uvicorn automatically handles SIGINT/SIGTERM signals for graceful shutdown.
     """
     global redis_client
-    logging.basicConfig(
-        level=getattr(logging, settings.log_level.upper()),
-        format="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
+    log_listener = configure_logging(
+        settings.log_level,
+        log_format=settings.log_format,
+        use_queue=settings.log_async,
     )
     logger = logging.getLogger(__name__)
     logger.info("Starting AKS Chaos Lab")
+    start_runtime_metrics()
+    if settings.profiling_enabled:
+        profiler.install_signal_handler(
+            asyncio.get_running_loop(),
+            seconds=settings.profiling_default_seconds,
+            interval_seconds=settings.profiling_interval_ms / 1000,
+            output_dir=settings.profiling_output_dir,
+        )
 
     # Setup Redis
     if settings.redis_enabled and settings.redis_host:
@@ -139,11 +155,18 @@ async def lifespan(app: FastAPI) -> AsyncIterator[None]:
     with suppress(Exception):
         app.state.redis_client = None
 
+    await stop_runtime_metrics()
+    if settings.profiling_enabled:
+        profiler.remove_signal_handler(asyncio.get_running_loop())
+
     logger.info("Application shutdown complete")
     # Flush OTLP logs pipeline so the final shutdown logs are exported before
     # the process exits (BatchLogRecordProcessor would otherwise queue them).
     with suppress(Exception):
         shutdown_telemetry()
+    # Drain queued console records (LOG_ASYNC=true) before the process exits.
+    if log_listener is not None:
+        log_listener.stop()
 
 
 app = FastAPI(title="AKS Chaos Lab", lifespan=lifespan)
@@ -179,12 +202,38 @@ async def active_requests_middleware(request: Request, call_next):
             decrement_active_requests()
 
 
+@app.middleware("http")
+async def red_metrics_middleware(request: Request, call_next):
+    """Feed the in-process RED aggregator with route template and status.
+
+    route template は routing 後に ``scope["route"]`` から取る (生 path だと
+    path parameter で series が増えるため)。例外は exception handler が 500
+    を返すため 500 として記録する。probe endpoint は active_requests と同じく除外。
+    """
+    if _is_active_requests_excluded(request.url.path):
+        return await call_next(request)
+    start = monotonic()
+    status_code = 500
+    try:
+        response = await call_next(request)
+        status_code = response.status_code
+        return response
+    finally:
+        route = request.scope.get("route")
+        record_red_request(
+            getattr(route, "path", None),
+            status_code,
+            (monotonic() - start) * 1000,
+        )
+
+
 @app.middleware("http")
 async def request_id_middleware(request: Request, call_next):
     """Ensure X-Request-ID is present and propagate to response and tracing.
 
     - If header is absent, generate a UUIDv4.
     - Store into request.state for handlers, echo in response header.
+    - Expose via request_id_var so structured console logs carry it.
     - Annotate current span attribute for correlation.
     """
     req_id = request.headers.get("X-Request-ID") or str(uuid4())
@@ -198,7 +247,12 @@ async def request_id_middleware(request: Request, call_next):
         if span and span.is_recording():
             span.set_attribute("http.request_id", req_id)
 
-    response = await call_next(request)
+    # console log (LOG_FORMAT=json) に request ID を載せるため context に保持
+    token = request_id_var.set(req_id)
+    try:
+        response = await call_next(request)
+    finally:
+        request_id_var.reset(token)
     response.headers["X-Request-ID"] = req_id
     return response
 
@@ -248,19 +302,13 @@ async def root(
             logging.getLogger(__name__).error("Redis operation failed: %s", e)
             redis_error = str(e)
 
-    # Emit custom metrics (best-effort)
-    with suppress(Exception):
-        from app.telemetry import (
-            record_redis_status_only,
-        )  # local import to avoid cycles
-
-        connected = (
-            client is not None
-            and redis_error is None
-            and runtime_settings.redis_enabled
-        )
-        # latency 未測定パスのため status のみ更新 (histogram に 0ms 偽値を入れない)
-        record_redis_status_only(connected=connected)
+    # Emit custom metrics (record_* は setup 時に束ねた instrument のみ参照する)
+    # latency 未測定パスのため status のみ更新 (histogram に 0ms 偽値を入れない)
+    record_redis_status_only(
+        connected=client is not None
+        and redis_error is None
+        and runtime_settings.redis_enabled
+    )
 
     if runtime_settings.redis_enabled and redis_error:
         error_response = ErrorResponse(
@@ -287,6 +335,36 @@ async def livez() -> LivenessResponse:
     return LivenessResponse(status="alive", timestamp=datetime.now(UTC).isoformat())
 
 
+@app.get("/debug/profile", response_model=None)
+async def debug_profile(
+    seconds: float | None = Query(None, gt=0),
+    fmt: str = Query("collapsed", alias="format", pattern="^(collapsed|speedscope)$"),
+    runtime_settings: Settings = Depends(get_settings),
+) -> PlainTextResponse | JSONResponse:
+    """Capture a CPU sampling profile for N seconds (PROFILING_ENABLED only).
+
+    無効時は存在しない route と同じ 404 を返す。sampling は worker thread で
+    行い、event loop は capture 中も request を処理し続ける。
+    """
+    if not runtime_settings.profiling_enabled:
+        raise HTTPException(status_code=404, detail="Not Found")
+    duration = min(
+        seconds or runtime_settings.profiling_default_seconds,
+        runtime_settings.profiling_max_seconds,
+    )
+    try:
+        result = await asyncio.to_thread(
+            profiler.capture,
+            duration,
+            interval_seconds=runtime_settings.profiling_interval_ms / 1000,
+        )
+    except profiler.ProfilerBusyError as e:
+        raise HTTPException(status_code=409, detail=str(e)) from e
+    if fmt == "speedscope":
+        return JSONResponse(content=result.to_speedscope())
+    return PlainTextResponse(result.to_collapsed())
+
+
 @app.get("/readyz", response_model=HealthResponse)
 @app.get("/health", response_model=HealthResponse)
 async def health(
@@ -318,10 +396,7 @@ async def health(
             redis={"connected": False, "latency_ms": 0},
             timestamp=datetime.now(UTC).isoformat(),
         )
-        with suppress(Exception):
-            from app.telemetry import record_redis_status_only
-
-            record_redis_status_only(connected=False)
+        record_redis_status_only(connected=False)
         _update_health_cache(resp, 200)
         return resp
 
@@ -343,10 +418,7 @@ async def health(
     )
     code = 200 if status == "healthy" else 503
     # Emit custom metrics with measured latency
-    with suppress(Exception):
-        from app.telemetry import record_redis_metrics
-
-        record_redis_metrics(connected=redis_connected, latency_ms=redis_latency_ms)
+    record_redis_metrics(connected=redis_connected, latency_ms=redis_latency_ms)
     _update_health_cache(resp, code)
     if code != 200:
         return JSONResponse(status_code=code, content=resp.model_dump())
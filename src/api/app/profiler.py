@@ -0,0 +1,186 @@
+"""On-demand sampling profiler (collapsed stack / speedscope output).
+
+StressChaos 中に ``root()`` / middleware / telemetry hook のどこで CPU を
+使っているかを、image を作り直さずに確認するための opt-in profiler。
+
+- 無効時 (既定) は thread も hook も作らないため overhead はゼロ
+- 有効時も capture 要求があった N 秒間だけ sampler thread が
+  ``sys._current_frames()`` を一定間隔で読む (同時 capture は 1 つまで)
+- 出力は flamegraph.pl / speedscope が読める collapsed stack 形式、
+  または speedscope JSON 形式
+"""
+
+import asyncio
+import json
+import logging
+import os
+import signal
+import sys
+import threading
+import time
+from collections import Counter
+from contextlib import suppress
+from dataclasses import dataclass
+from datetime import UTC, datetime
+from types import FrameType
+
+logger = logging.getLogger(__name__)
+
+MAX_STACK_DEPTH = 128
+MIN_INTERVAL_SECONDS = 0.001
+PROFILE_SIGNAL = signal.SIGUSR1
+
+_capture_lock = threading.Lock()
+
+
+class ProfilerBusyError(RuntimeError):
+    """Raised when another capture is already in progress."""
+
+
+@dataclass(frozen=True)
+class ProfileResult:
+    """Aggregated stack samples (root → leaf) and their counts."""
+
+    stacks: dict[tuple[str, ...], int]
+    samples: int
+    duration_seconds: float
+    interval_seconds: float
+
+    def to_collapsed(self) -> str:
+        """Render Brendan Gregg's collapsed stack format (``a;b;c count``)."""
+        lines = [
+            f"{';'.join(stack)} {count}"
+            for stack, count in sorted(self.stacks.items(), key=lambda kv: -kv[1])
+        ]
+        return "\n".join(lines) + ("\n" if lines else "")
+
+    def to_speedscope(self, name: str = "chaos-app") -> dict[str, object]:
+        """Render the speedscope ``sampled`` file format."""
+        frame_index: dict[str, int] = {}
+        samples: list[list[int]] = []
+        weights: list[int] = []
+        for stack, count in self.stacks.items():
+            samples.append([frame_index.setdefault(f, len(frame_index)) for f in stack])
+            weights.append(count)
+        return {
+            "$schema": "https://www.speedscope.app/file-format-schema.json",
+            "shared": {"frames": [{"name": f} for f in frame_index]},
+            "profiles": [
+                {
+                    "type": "sampled",
+                    "name": name,
+                    "unit": "none",
+                    "startValue": 0,
+                    "endValue": sum(weights),
+                    "samples": samples,
+                    "weights": weights,
+                }
+            ],
+            "name": name,
+            "exporter": "chaos-app profiler",
+        }
+
+
+def _frame_label(frame: FrameType) -> str:
+    code = frame.f_code
+    return (
+        f"{code.co_qualname} "
+        f"({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+    )
+
+
+def _collapse(frame: FrameType | None, thread_name: str) -> tuple[str, ...]:
+    labels: list[str] = []
+    while frame is not None and len(labels) < MAX_STACK_DEPTH:
+        labels.append(_frame_label(frame))
+        frame = frame.f_back
+    labels.append(thread_name)
+    labels.reverse()
+    return tuple(labels)
+
+
+def capture(seconds: float, *, interval_seconds: float = 0.01) -> ProfileResult:
+    """Sample all thread stacks for ``seconds`` and aggregate them.
+
+    呼び出し元 thread 自身は sample 対象から除く。別の capture 実行中は
+    ``ProfilerBusyError`` を送出する。
+    """
+    if not _capture_lock.acquire(blocking=False):
+        raise ProfilerBusyError("profile capture already in progress")
+    try:
+        interval = max(MIN_INTERVAL_SECONDS, interval_seconds)
+        own_ident = threading.get_ident()
+        stacks: Counter[tuple[str, ...]] = Counter()
+        samples = 0
+        started = time.monotonic()
+        deadline = started + seconds
+        while time.monotonic() < deadline:
+            names = {t.ident: t.name for t in threading.enumerate()}
+            for ident, frame in sys._current_frames().items():
+                if ident == own_ident:
+                    continue
+                stacks[_collapse(frame, names.get(ident, f"thread-{ident}"))] += 1
+            samples += 1
+            time.sleep(interval)
+        return ProfileResult(
+            stacks=dict(stacks),
+            samples=samples,
+            duration_seconds=time.monotonic() - started,
+            interval_seconds=interval,
+        )
+    finally:
+        _capture_lock.release()
+
+
+def write_profile(result: ProfileResult, output_dir: str, fmt: str) -> str:
+    """Write a capture to ``output_dir`` and return the file path."""
+    os.makedirs(output_dir, exist_ok=True)
+    stamp = datetime.now(UTC).strftime("%Y%m%dT%H%M%SZ")
+    if fmt == "speedscope":
+        path = os.path.join(output_dir, f"profile-{stamp}.speedscope.json")
+        body = json.dumps(result.to_speedscope())
+    else:
+        path = os.path.join(output_dir, f"profile-{stamp}.collapsed")
+        body = result.to_collapsed()
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(body)
+    return path
+
+
+def install_signal_handler(
+    loop: asyncio.AbstractEventLoop,
+    *,
+    seconds: float,
+    interval_seconds: float,
+    output_dir: str,
+) -> bool:
+    """Capture a profile to ``output_dir`` on SIGUSR1 (``kill -USR1 1``).
+
+    handler 自体は loop 上で thread を起動するだけで、sampling は daemon
+    thread で行う。登録できない環境 (Windows 等) では False を返す。
+    """
+
+    def _run() -> None:
+        try:
+            result = capture(seconds, interval_seconds=interval_seconds)
+            path = write_profile(result, output_dir, "collapsed")
+            logger.info("Profile captured: %s (%d samples)", path, result.samples)
+        except ProfilerBusyError:
+            logger.warning("Profile capture skipped: already in progress")
+        except Exception as e:  # noqa: BLE001
+            logger.warning("Profile capture failed: %s", e)
+
+    def _on_signal() -> None:
+        threading.Thread(target=_run, name="profiler-capture", daemon=True).start()
+
+    try:
+        loop.add_signal_handler(PROFILE_SIGNAL, _on_signal)
+    except (NotImplementedError, RuntimeError, ValueError) as e:
+        logger.warning("Profiler signal handler not installed: %s", e)
+        return False
+    return True
+
+
+def remove_signal_handler(loop: asyncio.AbstractEventLoop) -> None:
+    with suppress(NotImplementedError, RuntimeError, ValueError):
+        loop.remove_signal_handler(PROFILE_SIGNAL)
@@ -0,0 +1,186 @@
+"""In-process RED (rate / errors / duration) aggregation per route.
+
+trace sampling (既定 10%) からは route 別 error ratio を正確に出せないため、
+全 request をプロセス内で事前集計し、export interval ごとに
+ObservableCounter callback 経由で出力する。
+
+- key は ``(route template, status class)``。path parameter を展開した
+  生 URL は使わず、未 match の request は ``UNMATCHED_ROUTE`` に寄せる
+- series 数は ``max_series`` で上限を設け、超過分は ``OVERFLOW_ROUTE`` に合算
+- duration は固定 bucket の累積 histogram (list[int]) で保持し、
+  request ごとの record は bisect + 加算のみ
+"""
+
+from bisect import bisect_left
+from collections.abc import Mapping, Sequence
+from dataclasses import dataclass
+from threading import Lock
+
+# ms。Envoy / Prometheus の既定 bucket に近い粒度
+DEFAULT_DURATION_BOUNDARIES_MS: tuple[float, ...] = (
+    5.0,
+    10.0,
+    25.0,
+    50.0,
+    100.0,
+    250.0,
+    500.0,
+    1000.0,
+    2500.0,
+    5000.0,
+    10000.0,
+)
+DEFAULT_MAX_SERIES = 200
+UNMATCHED_ROUTE = "__unmatched__"
+OVERFLOW_ROUTE = "__overflow__"
+_STATUS_CLASSES = ("1xx", "2xx", "3xx", "4xx", "5xx")
+
+
+def status_class(status_code: int) -> str:
+    """Map an HTTP status code to its class label (unknown codes → 5xx)."""
+    index = status_code // 100 - 1
+    if 0 <= index < len(_STATUS_CLASSES):
+        return _STATUS_CLASSES[index]
+    return "5xx"
+
+
+class FixedBucketHistogram:
+    """Compact cumulative histogram with fixed explicit boundaries.
+
+    ``counts[i]`` は ``boundaries[i-1] < value <= boundaries[i]`` の件数
+    (最後の要素は +Inf bucket)。呼び出し側で排他制御する前提。
+    """
+
+    __slots__ = ("boundaries", "count", "counts", "sum")
+
+    def __init__(self, boundaries: Sequence[float]) -> None:
+        self.boundaries = tuple(boundaries)
+        self.counts = [0] * (len(self.boundaries) + 1)
+        self.count = 0
+        self.sum = 0.0
+
+    def record(self, value: float) -> None:
+        self.counts[bisect_left(self.boundaries, value)] += 1
+        self.count += 1
+        self.sum += value
+
+    def cumulative_counts(self) -> list[tuple[str, int]]:
+        """Return Prometheus-style ``(le, count)`` pairs including ``+Inf``."""
+        pairs: list[tuple[str, int]] = []
+        running = 0
+        for boundary, count in zip(self.boundaries, self.counts, strict=False):
+            running += count
+            pairs.append((f"{boundary:g}", running))
+        pairs.append(("+Inf", running + self.counts[-1]))
+        return pairs
+
+
+@dataclass(frozen=True)
+class RedSeriesSnapshot:
+    route: str
+    status_class: str
+    requests: int
+    errors: int
+    duration_sum_ms: float
+    duration_buckets: tuple[tuple[str, int], ...]
+    # export 用 attribute。series 作成時に 1 度だけ作り、以降は同じ object を返す
+    attributes: Mapping[str, str]
+    bucket_attributes: tuple[Mapping[str, str], ...]
+
+
+class _RedSeries:
+    __slots__ = (
+        "attributes",
+        "bucket_attributes",
+        "errors",
+        "histogram",
+        "requests",
+        "route",
+        "status_class",
+    )
+
+    def __init__(self, route: str, cls: str, boundaries: Sequence[float]) -> None:
+        self.route = route
+        self.status_class = cls
+        self.requests = 0
+        self.errors = 0
+        self.histogram = FixedBucketHistogram(boundaries)
+        self.attributes = {"http.route": route, "http.status_class": cls}
+        self.bucket_attributes = tuple(
+            {**self.attributes, "le": le}
+            for le, _count in self.histogram.cumulative_counts()
+        )
+
+
+class RedAggregator:
+    """Thread-safe RED aggregator keyed by (route template, status class).
+
+    値はプロセス起動からの累積で保持する。ObservableCounter は累積値を
+    観測すれば SDK が DELTA temporality に変換するため、export ごとの
+    reset は不要 (export 失敗時も欠損しない)。
+
+    series は ``route -> [status class index ごとの slot]`` で引くため、
+    既存 series への record は key tuple 等の object を生成しない。
+    """
+
+    def __init__(
+        self,
+        *,
+        boundaries: Sequence[float] = DEFAULT_DURATION_BOUNDARIES_MS,
+        max_series: int = DEFAULT_MAX_SERIES,
+    ) -> None:
+        if max_series <= len(_STATUS_CLASSES):
+            raise ValueError(f"max_series must be > {len(_STATUS_CLASSES)}")
+        self._boundaries = tuple(boundaries)
+        self._max_series = max_series
+        self._routes: dict[str, list[_RedSeries | None]] = {}
+        self._series_count = 0
+        self._lock = Lock()
+
+    def record(self, route: str | None, status_code: int, duration_ms: float) -> None:
+        index = status_code // 100 - 1
+        if not 0 <= index < len(_STATUS_CLASSES):
+            index = len(_STATUS_CLASSES) - 1
+        with self._lock:
+            slots = self._routes.get(route or UNMATCHED_ROUTE)
+            series = slots[index] if slots is not None else None
+            if series is None:
+                series = self._create(route or UNMATCHED_ROUTE, index)
+            series.requests += 1
+            if status_code >= 500:
+                series.errors += 1
+            series.histogram.record(duration_ms)
+
+    def _create(self, route: str, index: int) -> _RedSeries:
+        # overflow series 分の枠を残して上限を判定する
+        if self._series_count >= self._max_series - len(_STATUS_CLASSES):
+            route = OVERFLOW_ROUTE
+        slots = self._routes.setdefault(route, [None] * len(_STATUS_CLASSES))
+        series = slots[index]
+        if series is None:
+            series = _RedSeries(route, _STATUS_CLASSES[index], self._boundaries)
+            slots[index] = series
+            self._series_count += 1
+        return series
+
+    def series_count(self) -> int:
+        with self._lock:
+            return self._series_count
+
+    def snapshot(self) -> list[RedSeriesSnapshot]:
+        with self._lock:
+            return [
+                RedSeriesSnapshot(
+                    route=series.route,
+                    status_class=series.status_class,
+                    requests=series.requests,
+                    errors=series.errors,
+                    duration_sum_ms=series.histogram.sum,
+                    duration_buckets=tuple(series.histogram.cumulative_counts()),
+                    attributes=series.attributes,
+                    bucket_attributes=series.bucket_attributes,
+                )
+                for slots in self._routes.values()
+                for series in slots
+                if series is not None
+            ]
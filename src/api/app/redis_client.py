@@ -16,6 +16,7 @@ from contextlib import suppress
 from typing import Any, cast
 
 import redis.asyncio as aioredis
+from opentelemetry import trace
 from redis.asyncio.client import Redis
 from redis.asyncio.retry import Retry
 from redis.backoff import ExponentialBackoff
@@ -27,6 +28,8 @@ from app.config import Settings
 from app.telemetry import record_redis_metrics
 
 logger = logging.getLogger(__name__)
+# ProxyTracer のため setup_telemetry より前の import でも後から provider に追従する
+_tracer = trace.get_tracer(__name__)
 
 
 class RedisClient:
@@ -134,17 +137,23 @@ class RedisClient:
         return int(cast(int, val))
 
     async def ping(self) -> bool:
-        """Ping Redis and record metrics."""
+        """Ping Redis and record metrics.
+
+        /health・/readyz は FastAPIInstrumentor の対象外で親 span が無いため、
+        ``redis.ping`` span 内で latency を record して histogram exemplar に
+        trace ID が載るようにする。
+        """
         if not self._client:
             raise RuntimeError("Redis client is not connected")
-        start = time.time()
-        try:
-            res = await self._client.ping()  # ty: ignore[invalid-await]
-            latency_ms = int((time.time() - start) * 1000)
-            with suppress(Exception):
-                record_redis_metrics(True, latency_ms)
-            return bool(res)
-        except Exception:
-            with suppress(Exception):
-                record_redis_metrics(False, -1)
-            raise
+        with _tracer.start_as_current_span("redis.ping"):
+            start = time.time()
+            try:
+                res = await self._client.ping()  # ty: ignore[invalid-await]
+                latency_ms = int((time.time() - start) * 1000)
+                with suppress(Exception):
+                    record_redis_metrics(True, latency_ms)
+                return bool(res)
+            except Exception:
+                with suppress(Exception):
+                    record_redis_metrics(False, -1)
+                raise
@@ -0,0 +1,135 @@
+"""Process runtime signals: event-loop lag, GC pause, task count, RSS / CPU.
+
+StressChaos で CPU が枯渇した際に「latency の原因が event loop 側か Redis 側か」
+を切り分けるための signal。値は本モジュールの ``RuntimeSampler`` が保持し、
+export は telemetry 側の Observable instrument callback が行う。
+
+- event-loop lag: ``interval`` ごとに sleep し、予定時刻からの遅延を測る。
+  interval は ``MIN_INTERVAL_SECONDS`` 未満にできない (overhead の上限)
+- GC pause: ``gc.callbacks`` の start / stop 間を計測し世代別に累積する
+- task 数: lag sampler の tick で event loop thread 上から数える
+- RSS / CPU: collection 時に ``/proc/self/statm`` と ``time.process_time`` を読む
+"""
+
+import asyncio
+import gc
+import os
+import resource
+import time
+from contextlib import suppress
+from threading import Lock
+from typing import Any
+
+DEFAULT_INTERVAL_SECONDS = 0.5
+MIN_INTERVAL_SECONDS = 0.05
+_GC_GENERATIONS = 3
+_STATM_PATH = "/proc/self/statm"
+
+
+def read_rss_bytes() -> int:
+    """Return current RSS in bytes (falls back to peak RSS off Linux)."""
+    with suppress(OSError, ValueError, IndexError):
+        with open(_STATM_PATH, encoding="ascii") as f:
+            resident_pages = int(f.read().split()[1])
+        return resident_pages * os.sysconf("SC_PAGE_SIZE")
+    # Linux 以外では現在値が取れないため ru_maxrss (KiB) を代用する
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+class RuntimeSampler:
+    """Collect event-loop lag, GC pause and asyncio task count.
+
+    lag / task 数は event loop thread、GC は GC を起こした thread、読み出しは
+    SDK の metric collection thread から行われる。GC callback は任意の箇所
+    (lock 保持中を含む) で割り込むため lock を取らず、list 要素の単純更新に
+    留める (多少の race は metric として許容する)。
+    """
+
+    def __init__(self, interval_seconds: float = DEFAULT_INTERVAL_SECONDS) -> None:
+        self.interval_seconds = max(MIN_INTERVAL_SECONDS, float(interval_seconds))
+        self._lock = Lock()
+        self._lag_max: float | None = None
+        self._task_count: int | None = None
+        self._task: asyncio.Task[None] | None = None
+
+        self._gc_started_at: float | None = None
+        self._gc_pause_total = [0.0] * _GC_GENERATIONS
+        self._gc_collections = [0] * _GC_GENERATIONS
+        self._gc_pause_max = 0.0
+
+    # --- event loop -------------------------------------------------------
+
+    def start(self) -> None:
+        """Start the lag sampler task on the running loop and hook GC."""
+        if self._task is None:
+            self._task = asyncio.get_running_loop().create_task(
+                self._sample_loop(), name="runtime-metrics-sampler"
+            )
+        if self._gc_callback not in gc.callbacks:
+            gc.callbacks.append(self._gc_callback)
+
+    async def stop(self) -> None:
+        with suppress(ValueError):
+            gc.callbacks.remove(self._gc_callback)
+        task, self._task = self._task, None
+        if task is not None:
+            task.cancel()
+            with suppress(asyncio.CancelledError):
+                await task
+
+    async def _sample_loop(self) -> None:
+        loop = asyncio.get_running_loop()
+        interval = self.interval_seconds
+        while True:
+            expected = loop.time() + interval
+            await asyncio.sleep(interval)
+            self.record_lag(loop.time() - expected)
+            with suppress(RuntimeError):
+                self.record_task_count(len(asyncio.all_tasks(loop)))
+
+    def record_lag(self, lag_seconds: float) -> None:
+        lag = max(0.0, lag_seconds)
+        with self._lock:
+            if self._lag_max is None or lag > self._lag_max:
+                self._lag_max = lag
+
+    def record_task_count(self, count: int) -> None:
+        self._task_count = count
+
+    def take_lag_max(self) -> float | None:
+        """Return the max lag (seconds) since the previous call and reset it."""
+        with self._lock:
+            value, self._lag_max = self._lag_max, None
+        return value
+
+    @property
+    def task_count(self) -> int | None:
+        return self._task_count
+
+    # --- GC ---------------------------------------------------------------
+
+    def _gc_callback(self, phase: str, info: dict[str, Any]) -> None:
+        if phase == "start":
+            self._gc_started_at = time.perf_counter()
+            return
+        started_at, self._gc_started_at = self._gc_started_at, None
+        if started_at is None:
+            return
+        pause = time.perf_counter() - started_at
+        generation = int(info.get("generation", 0)) % _GC_GENERATIONS
+        self._gc_pause_total[generation] += pause
+        self._gc_collections[generation] += 1
+        if pause > self._gc_pause_max:
+            self._gc_pause_max = pause
+
+    def gc_totals(self) -> list[tuple[int, float, int]]:
+        """Return cumulative ``(generation, pause_seconds, collections)``."""
+        return [
+            (gen, self._gc_pause_total[gen], self._gc_collections[gen])
+            for gen in range(_GC_GENERATIONS)
+        ]
+
+    def take_gc_pause_max(self) -> float:
+        """Return the longest GC pause (seconds) since the previous call."""
+        value, self._gc_pause_max = self._gc_pause_max, 0.0
+        return value
@@ -0,0 +1,625 @@
+"""Disk-backed spill buffer for OTLP exports during collector outages.
+
+DNSChaos / NetworkChaos で collector 経路が落ちている間、OTLP exporter の
+export 失敗 batch はそのまま破棄される。本モジュールは失敗 batch を OTLP
+protobuf request として emptyDir 上の memory-mapped segment file に追記し、
+export が回復した時点で古い順に replay する。
+
+- 追記専用 (append-only) の固定長 segment を mmap して書き込む
+- 合計サイズ上限を超えたら最も古い segment から破棄する (oldest-first eviction)
+- segment header に read/write offset を持つため、container 再起動後も
+  emptyDir に残った未送信 record を続きから replay できる
+- replay は exporter 自身ではなく OTLP/HTTP endpoint への直接 POST で行う。
+  SDK exporter の private API (送信済み bytes の再送) に依存しないため。
+  endpoint / headers / TLS / 圧縮 / timeout は exporter と同じ
+  ``OTEL_EXPORTER_OTLP_*`` 環境変数から解決する
+- replay は export 成功を契機に専用 thread で行い、1 回あたりの所要時間に
+  上限を設ける。collector が flapping していても exporter thread は止まらない
+- exporter が retry / backoff している間に BatchSpanProcessor /
+  BatchLogRecordProcessor の queue が満杯になると、SDK は古い record を黙って
+  捨てる。``SpillingBatchSpanProcessor`` / ``SpillingBatchLogRecordProcessor``
+  は queue の空きを数え、満杯のときは record を queue に入れず直接 spill する
+"""
+
+import gzip
+import logging
+import mmap
+import os
+import ssl
+import struct
+import time
+import urllib.parse
+import urllib.request
+import zlib
+from collections.abc import Callable, Sequence
+from contextlib import suppress
+from pathlib import Path
+from threading import Event, Lock, Thread
+from typing import Any
+
+from opentelemetry.exporter.otlp.proto.common._log_encoder import encode_logs
+from opentelemetry.exporter.otlp.proto.common.metrics_encoder import encode_metrics
+from opentelemetry.exporter.otlp.proto.common.trace_encoder import encode_spans
+from opentelemetry.sdk._logs import ReadableLogRecord, ReadWriteLogRecord
+from opentelemetry.sdk._logs.export import (
+    BatchLogRecordProcessor,
+    LogRecordExporter,
+    LogRecordExportResult,
+)
+from opentelemetry.sdk.environment_variables import (
+    OTEL_BLRP_MAX_QUEUE_SIZE,
+    OTEL_BSP_MAX_QUEUE_SIZE,
+)
+from opentelemetry.sdk.metrics.export import (
+    MetricExporter,
+    MetricExportResult,
+    MetricsData,
+)
+from opentelemetry.sdk.resources import Resource
+from opentelemetry.sdk.trace import ReadableSpan
+from opentelemetry.sdk.trace.export import (
+    BatchSpanProcessor,
+    SpanExporter,
+    SpanExportResult,
+)
+
+logger = logging.getLogger(__name__)
+
+# Segment layout: 16-byte header followed by length-prefixed records.
+#   magic(4) | version(u16) | reserved(u16) | write_offset(u32) | read_offset(u32)
+#   record := length(u32) | payload(length bytes)
+_MAGIC = b"OTSP"
+_VERSION = 1
+_HEADER = struct.Struct("<4sHHII")
+_RECORD_LENGTH = struct.Struct("<I")
+_SEGMENT_SUFFIX = ".seg"
+
+# 1 回の replay (export 成功 1 回) に使う最大時間。残りは次の成功時に続きから送る。
+DEFAULT_REPLAY_BUDGET_SECONDS = 5.0
+# SDK の OTLP/HTTP exporter と同じ既定値 (秒)。
+DEFAULT_OTLP_TIMEOUT_SECONDS = 10.0
+# SDK の BatchSpanProcessor / BatchLogRecordProcessor と同じ既定 queue 長。
+DEFAULT_MAX_QUEUE_SIZE = 2048
+
+Sender = Callable[[bytes], bool]
+
+
+class _Segment:
+    """One fixed-size memory-mapped segment file."""
+
+    def __init__(self, path: Path, size: int, *, create: bool) -> None:
+        self.path = path
+        self.size = size
+        flags = os.O_RDWR | (os.O_CREAT if create else 0)
+        fd = os.open(path, flags, 0o600)
+        try:
+            if create:
+                os.ftruncate(fd, size)
+            else:
+                self.size = os.fstat(fd).st_size
+            self._mm = mmap.mmap(fd, self.size)
+        finally:
+            os.close(fd)
+        if create:
+            self.write_offset = _HEADER.size
+            self.read_offset = _HEADER.size
+            self._store_header()
+        else:
+            magic, version, _, write_offset, read_offset = _HEADER.unpack_from(
+                self._mm, 0
+            )
+            if (
+                magic != _MAGIC
+                or version != _VERSION
+                or not _HEADER.size <= read_offset <= write_offset <= self.size
+            ):
+                self._mm.close()
+                raise ValueError(f"corrupt spill segment: {path}")
+            self.write_offset = write_offset
+            self.read_offset = read_offset
+
+    def _store_header(self) -> None:
+        _HEADER.pack_into(
+            self._mm, 0, _MAGIC, _VERSION, 0, self.write_offset, self.read_offset
+        )
+
+    def has_room(self, payload_len: int) -> bool:
+        return self.write_offset + _RECORD_LENGTH.size + payload_len <= self.size
+
+    def append(self, payload: bytes) -> None:
+        offset = self.write_offset
+        _RECORD_LENGTH.pack_into(self._mm, offset, len(payload))
+        start = offset + _RECORD_LENGTH.size
+        self._mm[start : start + len(payload)] = payload
+        self.write_offset = start + len(payload)
+        self._store_header()
+
+    def peek(self) -> bytes | None:
+        if self.read_offset >= self.write_offset:
+            return None
+        (length,) = _RECORD_LENGTH.unpack_from(self._mm, self.read_offset)
+        start = self.read_offset + _RECORD_LENGTH.size
+        return bytes(self._mm[start : start + length])
+
+    def advance(self) -> None:
+        (length,) = _RECORD_LENGTH.unpack_from(self._mm, self.read_offset)
+        self.read_offset += _RECORD_LENGTH.size + length
+        self._store_header()
+
+    def pending_records(self) -> int:
+        count = 0
+        offset = self.read_offset
+        while offset < self.write_offset:
+            (length,) = _RECORD_LENGTH.unpack_from(self._mm, offset)
+            offset += _RECORD_LENGTH.size + length
+            count += 1
+        return count
+
+    @property
+    def drained(self) -> bool:
+        return self.read_offset >= self.write_offset
+
+    def close(self) -> None:
+        with suppress(Exception):
+            self._mm.flush()
+        with suppress(Exception):
+            self._mm.close()
+
+
+class SpillBuffer:
+    """Bounded, append-only on-disk FIFO of serialized export requests.
+
+    Thread-safe. ``append`` never blocks on I/O beyond a page-cache write;
+    ``replay`` hands records to ``send`` oldest-first and stops at the first
+    failure so ordering is preserved across outages. ``send`` runs without
+    the lock held, so a slow collector never blocks ``append``; only one
+    ``replay`` may run at a time (``SpillReplayer`` owns it).
+    """
+
+    def __init__(
+        self, directory: str | os.PathLike[str], *, max_bytes: int, segment_bytes: int
+    ) -> None:
+        if segment_bytes <= _HEADER.size + _RECORD_LENGTH.size:
+            raise ValueError("segment_bytes is too small")
+        if max_bytes < segment_bytes:
+            raise ValueError("max_bytes must be at least segment_bytes")
+        self._dir = Path(directory)
+        self._dir.mkdir(parents=True, exist_ok=True)
+        self._segment_bytes = segment_bytes
+        self._max_segments = max_bytes // segment_bytes
+        self._lock = Lock()
+        self._segments: list[_Segment] = []
+        self._next_seq = 0
+        self.evicted_records = 0
+        self.dropped_records = 0
+        self._recover()
+
+    def _recover(self) -> None:
+        for path in sorted(self._dir.glob(f"*{_SEGMENT_SUFFIX}")):
+            try:
+                seq = int(path.stem)
+                segment = _Segment(path, self._segment_bytes, create=False)
+            except (ValueError, OSError, struct.error) as e:
+                logger.warning("Discarding unreadable spill segment %s: %s", path, e)
+                with suppress(OSError):
+                    path.unlink()
+                continue
+            self._segments.append(segment)
+            self._next_seq = max(self._next_seq, seq + 1)
+        self._evict_overflow()
+
+    def _new_segment(self) -> _Segment:
+        path = self._dir / f"{self._next_seq:012d}{_SEGMENT_SUFFIX}"
+        self._next_seq += 1
+        segment = _Segment(path, self._segment_bytes, create=True)
+        self._segments.append(segment)
+        self._evict_overflow()
+        return segment
+
+    def _drop_segment(self, segment: _Segment) -> None:
+        self._segments.remove(segment)
+        segment.close()
+        with suppress(OSError):
+            segment.path.unlink()
+
+    def _evict_overflow(self) -> None:
+        while len(self._segments) > self._max_segments:
+            oldest = self._segments[0]
+            self.evicted_records += oldest.pending_records()
+            self._drop_segment(oldest)
+
+    def append(self, payload: bytes) -> bool:
+        """Append one record; returns False if it cannot fit in a segment."""
+        with self._lock:
+            if _HEADER.size + _RECORD_LENGTH.size + len(payload) > self._segment_bytes:
+                self.dropped_records += 1
+                return False
+            tail = self._segments[-1] if self._segments else None
+            if tail is None or not tail.has_room(len(payload)):
+                tail = self._new_segment()
+            tail.append(payload)
+            return True
+
+    def _head(self) -> tuple[_Segment | None, bytes | None]:
+        while self._segments:
+            head = self._segments[0]
+            payload = head.peek()
+            if payload is not None:
+                return head, payload
+            if head is self._segments[-1]:
+                break
+            self._drop_segment(head)
+        return None, None
+
+    def replay(
+        self,
+        send: Sender,
+        *,
+        max_records: int | None = None,
+        deadline: float | None = None,
+    ) -> int:
+        """Send spilled records in order; return the sent count.
+
+        Stops at the first failure, after ``max_records`` records, or once
+        ``time.monotonic()`` passes ``deadline``.
+        """
+        sent = 0
+        while max_records is None or sent < max_records:
+            if deadline is not None and time.monotonic() >= deadline:
+                break
+            with self._lock:
+                head, payload = self._head()
+            if head is None or payload is None or not send(payload):
+                break
+            with self._lock:
+                # 送信中に append が segment ごと evict した (または close した)
+                # 場合、送った record は既に無いので読み位置を進めない
+                if self._segments and self._segments[0] is head:
+                    head.advance()
+            sent += 1
+        with self._lock:
+            # 完全に送信済みの先頭 segment は次回 append を待たずに片付ける
+            while len(self._segments) > 1 and self._segments[0].drained:
+                self._drop_segment(self._segments[0])
+        return sent
+
+    def pending(self) -> int:
+        with self._lock:
+            return sum(segment.pending_records() for segment in self._segments)
+
+    def close(self) -> None:
+        with self._lock:
+            for segment in self._segments:
+                segment.close()
+            self._segments = []
+
+
+def _otlp_endpoint(signal: str) -> str:
+    """Resolve the OTLP/HTTP endpoint the same way the SDK exporters do."""
+    per_signal = os.getenv(f"OTEL_EXPORTER_OTLP_{signal.upper()}_ENDPOINT")
+    if per_signal:
+        return per_signal
+    base = os.getenv("OTEL_EXPORTER_OTLP_ENDPOINT", "http://localhost:4318")
+    return f"{base.rstrip('/')}/v1/{signal}"
+
+
+def _otlp_env(signal: str, name: str) -> str | None:
+    """Per-signal ``OTEL_EXPORTER_OTLP_<SIGNAL>_<NAME>``, else the shared one."""
+    return os.getenv(f"OTEL_EXPORTER_OTLP_{signal.upper()}_{name}") or os.getenv(
+        f"OTEL_EXPORTER_OTLP_{name}"
+    )
+
+
+def _otlp_headers(signal: str) -> dict[str, str]:
+    raw = _otlp_env(signal, "HEADERS") or ""
+    headers: dict[str, str] = {}
+    for item in raw.split(","):
+        name, sep, value = item.partition("=")
+        if sep and name.strip():
+            headers[urllib.parse.unquote(name.strip())] = urllib.parse.unquote(
+                value.strip()
+            )
+    return headers
+
+
+def _otlp_ssl_context(signal: str) -> ssl.SSLContext | None:
+    """CA / client certificate の設定がある場合だけ専用の SSL context を作る。"""
+    ca_file = _otlp_env(signal, "CERTIFICATE")
+    client_certificate = _otlp_env(signal, "CLIENT_CERTIFICATE")
+    if not ca_file and not client_certificate:
+        return None
+    context = ssl.create_default_context(cafile=ca_file)
+    if client_certificate:
+        context.load_cert_chain(client_certificate, _otlp_env(signal, "CLIENT_KEY"))
+    return context
+
+
+class OtlpHttpReplaySender:
+    """POST serialized OTLP protobuf requests to the signal's endpoint.
+
+    SDK の OTLP/HTTP exporter と同じ環境変数 (``ENDPOINT`` / ``HEADERS`` /
+    ``CERTIFICATE`` / ``CLIENT_CERTIFICATE`` / ``CLIENT_KEY`` /
+    ``COMPRESSION`` / ``TIMEOUT``) で送信する。
+    """
+
+    def __init__(self, signal: str, *, timeout: float | None = None) -> None:
+        self._endpoint = _otlp_endpoint(signal)
+        self._headers = {
+            **_otlp_headers(signal),
+            "Content-Type": "application/x-protobuf",
+        }
+        compression = (_otlp_env(signal, "COMPRESSION") or "none").strip().lower()
+        self._compression = compression if compression in ("gzip", "deflate") else None
+        if self._compression:
+            self._headers["Content-Encoding"] = self._compression
+        self._timeout = (
+            timeout
+            if timeout is not None
+            else float(_otlp_env(signal, "TIMEOUT") or DEFAULT_OTLP_TIMEOUT_SECONDS)
+        )
+        self._context = _otlp_ssl_context(signal)
+
+    def _encode(self, payload: bytes) -> bytes:
+        if self._compression == "gzip":
+            return gzip.compress(payload)
+        if self._compression == "deflate":
+            return zlib.compress(payload)
+        return payload
+
+    def __call__(self, payload: bytes) -> bool:
+        request = urllib.request.Request(  # noqa: S310
+            self._endpoint,
+            data=self._encode(payload),
+            headers=self._headers,
+            method="POST",
+        )
+        try:
+            with urllib.request.urlopen(  # noqa: S310
+                request, timeout=self._timeout, context=self._context
+            ) as response:
+                response.read()
+                return 200 <= int(response.status) < 300
+        except Exception as e:  # noqa: BLE001
+            logger.debug("OTLP spill replay failed: %s", e)
+            return False
+
+
+class SpillReplayer:
+    """Replay a ``SpillBuffer`` from a background thread.
+
+    exporter は export 成功時に ``notify`` で起こすだけで、replay の送信を
+    待たない。1 回の replay は ``budget_seconds`` で打ち切る。
+    """
+
+    def __init__(
+        self,
+        buffer: SpillBuffer,
+        send: Sender,
+        *,
+        budget_seconds: float = DEFAULT_REPLAY_BUDGET_SECONDS,
+    ) -> None:
+        self._buffer = buffer
+        self._send = send
+        self._budget_seconds = budget_seconds
+        self._wake = Event()
+        self._closed = False
+        self._thread = Thread(target=self._run, name="otel-spill-replay", daemon=True)
+        self._thread.start()
+
+    def notify(self) -> None:
+        self._wake.set()
+
+    def _run(self) -> None:
+        while True:
+            self._wake.wait()
+            self._wake.clear()
+            if self._closed:
+                return
+            try:
+                self._buffer.replay(
+                    self._send, deadline=time.monotonic() + self._budget_seconds
+                )
+            except Exception as e:  # noqa: BLE001
+                logger.debug("OTLP spill replay failed: %s", e)
+
+    def close(self, timeout: float = DEFAULT_REPLAY_BUDGET_SECONDS) -> None:
+        self._closed = True
+        self._wake.set()
+        self._thread.join(timeout)
+
+
+def _spill(buffer: SpillBuffer, encode: Callable[[], bytes], signal: str) -> None:
+    try:
+        buffer.append(encode())
+    except Exception as e:  # noqa: BLE001
+        logger.debug("Failed to spill %s batch: %s", signal, e)
+
+
+class _QueueSlots:
+    """Free slots of a batch processor queue, counted outside the SDK.
+
+    SDK の queue 長は private なので、processor への投入時に ``take`` し、
+    exporter が batch を受け取った時点で ``release`` して上限を追跡する。
+    """
+
+    def __init__(self, capacity: int) -> None:
+        self._capacity = capacity
+        self._used = 0
+        self._lock = Lock()
+
+    def take(self) -> bool:
+        with self._lock:
+            if self._used >= self._capacity:
+                return False
+            self._used += 1
+            return True
+
+    def release(self, count: int) -> None:
+        with self._lock:
+            self._used = max(0, self._used - count)
+
+
+def _max_queue_size(max_queue_size: int | None, env_name: str) -> int:
+    if max_queue_size is not None:
+        return max_queue_size
+    try:
+        return int(os.environ.get(env_name, DEFAULT_MAX_QUEUE_SIZE))
+    except ValueError:
+        return DEFAULT_MAX_QUEUE_SIZE
+
+
+class SpillingSpanExporter(SpanExporter):
+    """SpanExporter wrapper that spills failed batches and replays on recovery."""
+
+    def __init__(
+        self, inner: SpanExporter, buffer: SpillBuffer, replayer: SpillReplayer
+    ) -> None:
+        self._inner = inner
+        self._buffer = buffer
+        self._replayer = replayer
+        # SpillingBatchSpanProcessor が設定する
+        self.queue_slots: _QueueSlots | None = None
+
+    def export(self, spans: Sequence[Any]) -> SpanExportResult:
+        if self.queue_slots is not None:
+            self.queue_slots.release(len(spans))
+        result = self._inner.export(spans)
+        if result == SpanExportResult.SUCCESS:
+            self._replayer.notify()
+        else:
+            self.spill(spans)
+        return result
+
+    def spill(self, spans: Sequence[Any]) -> None:
+        _spill(self._buffer, lambda: encode_spans(spans).SerializeToString(), "traces")
+
+    def shutdown(self) -> None:
+        self._inner.shutdown()
+
+    def force_flush(self, timeout_millis: int = 30000) -> bool:
+        return self._inner.force_flush(timeout_millis)
+
+
+class SpillingMetricExporter(MetricExporter):
+    """MetricExporter wrapper preserving the inner temporality/aggregation."""
+
+    def __init__(
+        self, inner: MetricExporter, buffer: SpillBuffer, replayer: SpillReplayer
+    ) -> None:
+        super().__init__(
+            preferred_temporality=getattr(inner, "_preferred_temporality", None),
+            preferred_aggregation=getattr(inner, "_preferred_aggregation", None),
+        )
+        self._inner = inner
+        self._buffer = buffer
+        self._replayer = replayer
+
+    def export(
+        self,
+        metrics_data: MetricsData,
+        timeout_millis: float = 10_000,
+        **kwargs: Any,
+    ) -> MetricExportResult:
+        result = self._inner.export(
+            metrics_data, timeout_millis=timeout_millis, **kwargs
+        )
+        if result == MetricExportResult.SUCCESS:
+            self._replayer.notify()
+        else:
+            _spill(
+                self._buffer,
+                lambda: encode_metrics(metrics_data).SerializeToString(),
+                "metrics",
+            )
+        return result
+
+    def force_flush(self, timeout_millis: float = 10_000) -> bool:
+        return self._inner.force_flush(timeout_millis)
+
+    def shutdown(self, timeout_millis: float = 30_000, **kwargs: Any) -> None:
+        self._inner.shutdown(timeout_millis=timeout_millis, **kwargs)
+
+
+class SpillingLogExporter(LogRecordExporter):
+    """LogRecordExporter wrapper that spills failed batches."""
+
+    def __init__(
+        self, inner: LogRecordExporter, buffer: SpillBuffer, replayer: SpillReplayer
+    ) -> None:
+        self._inner = inner
+        self._buffer = buffer
+        self._replayer = replayer
+        # SpillingBatchLogRecordProcessor が設定する
+        self.queue_slots: _QueueSlots | None = None
+
+    def export(self, batch: Sequence[Any]) -> LogRecordExportResult:
+        if self.queue_slots is not None:
+            self.queue_slots.release(len(batch))
+        result = self._inner.export(batch)
+        if result == LogRecordExportResult.SUCCESS:
+            self._replayer.notify()
+        else:
+            self.spill(batch)
+        return result
+
+    def spill(self, batch: Sequence[Any]) -> None:
+        _spill(self._buffer, lambda: encode_logs(batch).SerializeToString(), "logs")
+
+    def shutdown(self) -> None:
+        self._inner.shutdown()
+
+    def force_flush(self, timeout_millis: int = 30000) -> bool:
+        return self._inner.force_flush(timeout_millis)
+
+
+class SpillingBatchSpanProcessor(BatchSpanProcessor):
+    """BatchSpanProcessor that spills spans instead of dropping them on overflow."""
+
+    def __init__(
+        self,
+        exporter: SpillingSpanExporter,
+        max_queue_size: int | None = None,
+        **kwargs: Any,
+    ) -> None:
+        capacity = _max_queue_size(max_queue_size, OTEL_BSP_MAX_QUEUE_SIZE)
+        super().__init__(exporter, max_queue_size=capacity, **kwargs)
+        self._spilling_exporter = exporter
+        self._slots = exporter.queue_slots = _QueueSlots(capacity)
+
+    def on_end(self, span: ReadableSpan) -> None:
+        if span.context is None or not span.context.trace_flags.sampled:
+            return
+        if self._slots.take():
+            super().on_end(span)
+        else:
+            self._spilling_exporter.spill([span])
+
+
+class SpillingBatchLogRecordProcessor(BatchLogRecordProcessor):
+    """BatchLogRecordProcessor that spills records instead of dropping them."""
+
+    def __init__(
+        self,
+        exporter: SpillingLogExporter,
+        max_queue_size: int | None = None,
+        **kwargs: Any,
+    ) -> None:
+        capacity = _max_queue_size(max_queue_size, OTEL_BLRP_MAX_QUEUE_SIZE)
+        super().__init__(exporter, max_queue_size=capacity, **kwargs)
+        self._spilling_exporter = exporter
+        self._slots = exporter.queue_slots = _QueueSlots(capacity)
+
+    def on_emit(self, log_record: ReadWriteLogRecord) -> None:
+        if self._slots.take():
+            super().on_emit(log_record)
+            return
+        self._spilling_exporter.spill(
+            [
+                ReadableLogRecord(
+                    log_record=log_record.log_record,
+                    resource=log_record.resource or Resource.create({}),
+                    instrumentation_scope=log_record.instrumentation_scope,
+                    limits=log_record.limits,
+                )
+            ]
+        )
@@ -1,5 +1,7 @@
 import logging
 import os
+import time
+from collections.abc import Callable
 from contextlib import suppress
 from threading import Lock
 from typing import Any
@@ -16,7 +18,11 @@ from opentelemetry.instrumentation.redis import RedisInstrumentor
 from opentelemetry.metrics import CallbackOptions, Observation
 from opentelemetry.sdk._logs import LoggerProvider
 from opentelemetry.sdk._logs.export import BatchLogRecordProcessor
-from opentelemetry.sdk.metrics import MeterProvider
+from opentelemetry.sdk.metrics import (
+    AlwaysOffExemplarFilter,
+    MeterProvider,
+    TraceBasedExemplarFilter,
+)
 from opentelemetry.sdk.metrics._internal.instrument import (
     Counter,
     Histogram,
@@ -29,6 +35,7 @@ from opentelemetry.sdk.metrics.export import (
     AggregationTemporality,
     PeriodicExportingMetricReader,
 )
+from opentelemetry.sdk.metrics.view import View
 from opentelemetry.sdk.resources import Resource
 from opentelemetry.sdk.trace import TracerProvider
 from opentelemetry.sdk.trace.export import BatchSpanProcessor
@@ -41,6 +48,21 @@ from opentelemetry.sdk.trace.sampling import (
 )
 from opentelemetry.trace import Status, StatusCode
 
+from app.exemplars import bucketed_reservoir_factory
+from app.log_sampling import LogRateLimitFilter
+from app.red_metrics import RedAggregator
+from app.runtime_metrics import RuntimeSampler, read_rss_bytes
+from app.spill import (
+    OtlpHttpReplaySender,
+    SpillBuffer,
+    SpillingBatchLogRecordProcessor,
+    SpillingBatchSpanProcessor,
+    SpillingLogExporter,
+    SpillingMetricExporter,
+    SpillingSpanExporter,
+    SpillReplayer,
+)
+
 logger = logging.getLogger(__name__)
 
 
@@ -135,6 +157,30 @@ _tracer: trace.Tracer | None = None
 _redis_status_gauge: Any = None
 _redis_latency_hist: Any = None
 
+
+class _BoundTelemetry:
+    """Instruments and flags bound once at setup for hot-path recording.
+
+    record_* helper は本 object の属性参照だけで判定・記録する。request ごとに
+    Settings を構築したり、instrument を lookup したりしない。
+    """
+
+    __slots__ = ("custom_metrics", "redis_latency_record")
+
+    def __init__(
+        self,
+        *,
+        custom_metrics: bool = False,
+        redis_latency_record: Callable[[int], None] | None = None,
+    ) -> None:
+        self.custom_metrics = custom_metrics
+        self.redis_latency_record = redis_latency_record
+
+
+# setup_telemetry 完了時に差し替える。未 setup / 無効時は全 record が no-op。
+_DISABLED = _BoundTelemetry()
+_bound: _BoundTelemetry = _DISABLED
+
 # Connection status backing state for ObservableGauge callback.
 # 1=connected, 0=disconnected, -1=unknown (起動直後で record* 未呼出)。
 # ObservableGauge は export interval ごとに callback を呼ぶため、
@@ -158,6 +204,18 @@ _active_requests_count: int = 0
 _active_requests_lock: Lock = Lock()
 _active_requests_gauge: Any = None
 
+# In-process RED aggregator (custom_metrics_enabled 時のみ作成)。
+# request ごとの record は aggregator の dict 更新のみで、export interval ごとに
+# ObservableCounter callback が累積値を観測する (SDK が DELTA に変換)。
+_red_aggregator: RedAggregator | None = None
+_red_instruments: list[Any] = []
+
+# Runtime sampler (event-loop lag / GC pause / task 数)。instrument は
+# setup_telemetry で作成し、loop 依存の sampler task は lifespan で
+# start_runtime_metrics / stop_runtime_metrics から起動・停止する。
+_runtime_sampler: RuntimeSampler | None = None
+_runtime_instruments: list[Any] = []
+
 # OTLP logs pipeline state.
 # - _logger_provider: SDK LoggerProvider, set up only when logs endpoint is configured.
 # - _log_handler: LoggingHandler manually attached to the "app" logger so that
@@ -168,6 +226,19 @@ _active_requests_gauge: Any = None
 #   将来 uvicorn.error 等が必要になったら明示 allowlist 方式で拡張する。
 _logger_provider: Any = None
 _log_handler: Any = None
+# _log_handler に付ける dedup / rate limit filter (LOG_RATE_LIMIT_ENABLED 時)。
+# shutdown 時に未出力の summary を flush するため参照を保持する。
+_log_rate_limiter: LogRateLimitFilter | None = None
+
+# Disk spill buffers (TELEMETRY_SPILL_ENABLED=true の時のみ signal ごとに作成)。
+# shutdown / reset 時に mmap を閉じるため参照を保持する。
+_spill_buffers: list[SpillBuffer] = []
+# buffer ごとの replay thread。buffer より先に停止する。
+_spill_replayers: list[SpillReplayer] = []
+# spill buffer に書き込む TracerProvider / MeterProvider。SDK の atexit hook は
+# buffer を閉じた後に走り得るため無効化し、shutdown_telemetry で buffer より先に
+# shutdown する。
+_spill_providers: list[Any] = []
 
 # Standard OpenTelemetry Once pattern for preventing duplicate initialization
 _setup_once = _Once()
@@ -196,6 +267,261 @@ def _active_requests_callback(_options: CallbackOptions) -> list[Observation]:
     return [Observation(value)]
 
 
+def _red_requests_callback(_options: CallbackOptions) -> list[Observation]:
+    if _red_aggregator is None:
+        return []
+    return [Observation(s.requests, s.attributes) for s in _red_aggregator.snapshot()]
+
+
+def _red_errors_callback(_options: CallbackOptions) -> list[Observation]:
+    """5xx 件数を route 単位で観測する (status class 次元は requests 側で持つ)。"""
+    if _red_aggregator is None:
+        return []
+    per_route: dict[str, int] = {}
+    for s in _red_aggregator.snapshot():
+        per_route[s.route] = per_route.get(s.route, 0) + s.errors
+    return [
+        Observation(errors, {"http.route": route})
+        for route, errors in per_route.items()
+    ]
+
+
+def _red_duration_sum_callback(_options: CallbackOptions) -> list[Observation]:
+    if _red_aggregator is None:
+        return []
+    return [
+        Observation(s.duration_sum_ms, s.attributes) for s in _red_aggregator.snapshot()
+    ]
+
+
+def _red_duration_bucket_callback(_options: CallbackOptions) -> list[Observation]:
+    if _red_aggregator is None:
+        return []
+    return [
+        Observation(count, attributes)
+        for s in _red_aggregator.snapshot()
+        for (_le, count), attributes in zip(
+            s.duration_buckets, s.bucket_attributes, strict=True
+        )
+    ]
+
+
+def _setup_red_metrics(meter: metrics.Meter, settings: Any) -> None:
+    """Create the RED aggregator and its observable instruments."""
+    global _red_aggregator
+    _red_aggregator = RedAggregator(max_series=int(settings.red_metrics_max_series))
+    specs = (
+        ("chaos_app.red.requests", "{request}", _red_requests_callback),
+        ("chaos_app.red.errors", "{request}", _red_errors_callback),
+        ("chaos_app.red.duration.sum", "ms", _red_duration_sum_callback),
+        ("chaos_app.red.duration.bucket", "{request}", _red_duration_bucket_callback),
+    )
+    for name, unit, callback in specs:
+        with suppress(Exception):
+            _red_instruments.append(
+                meter.create_observable_counter(
+                    name=name,
+                    description=(
+                        "In-process RED aggregate by route template and status "
+                        "class (excludes probe endpoints)"
+                    ),
+                    unit=unit,
+                    callbacks=[callback],
+                )
+            )
+
+
+def _event_loop_lag_callback(_options: CallbackOptions) -> list[Observation]:
+    """Max event-loop lag (ms) since the previous export; empty before start."""
+    if _runtime_sampler is None:
+        return []
+    lag = _runtime_sampler.take_lag_max()
+    if lag is None:
+        return []
+    return [Observation(lag * 1000)]
+
+
+def _gc_pause_time_callback(_options: CallbackOptions) -> list[Observation]:
+    if _runtime_sampler is None:
+        return []
+    return [
+        Observation(pause * 1000, {"gc.generation": gen})
+        for gen, pause, _count in _runtime_sampler.gc_totals()
+    ]
+
+
+def _gc_collections_callback(_options: CallbackOptions) -> list[Observation]:
+    if _runtime_sampler is None:
+        return []
+    return [
+        Observation(count, {"gc.generation": gen})
+        for gen, _pause, count in _runtime_sampler.gc_totals()
+    ]
+
+
+def _gc_pause_max_callback(_options: CallbackOptions) -> list[Observation]:
+    if _runtime_sampler is None:
+        return []
+    return [Observation(_runtime_sampler.take_gc_pause_max() * 1000)]
+
+
+def _asyncio_tasks_callback(_options: CallbackOptions) -> list[Observation]:
+    count = _runtime_sampler.task_count if _runtime_sampler is not None else None
+    if count is None:
+        return []
+    return [Observation(count)]
+
+
+def _memory_rss_callback(_options: CallbackOptions) -> list[Observation]:
+    return [Observation(read_rss_bytes())]
+
+
+def _cpu_time_callback(_options: CallbackOptions) -> list[Observation]:
+    return [Observation(time.process_time())]
+
+
+def _setup_runtime_metrics(meter: metrics.Meter, settings: Any) -> None:
+    """Create the runtime sampler and its observable instruments."""
+    global _runtime_sampler
+    _runtime_sampler = RuntimeSampler(settings.runtime_metrics_interval_ms / 1000)
+    specs = (
+        (
+            meter.create_observable_gauge,
+            "chaos_app.runtime.event_loop.lag_max",
+            "ms",
+            "Max asyncio event-loop scheduling lag within the export interval",
+            _event_loop_lag_callback,
+        ),
+        (
+            meter.create_observable_counter,
+            "chaos_app.runtime.gc.pause_time",
+            "ms",
+            "Cumulative garbage collector pause time by generation",
+            _gc_pause_time_callback,
+        ),
+        (
+            meter.create_observable_counter,
+            "chaos_app.runtime.gc.collections",
+            "{collection}",
+            "Number of garbage collections by generation",
+            _gc_collections_callback,
+        ),
+        (
+            meter.create_observable_gauge,
+            "chaos_app.runtime.gc.pause_max",
+            "ms",
+            "Longest garbage collector pause within the export interval",
+            _gc_pause_max_callback,
+        ),
+        (
+            meter.create_observable_gauge,
+            "chaos_app.runtime.asyncio.tasks",
+            "{task}",
+            "Number of asyncio tasks on the event loop",
+            _asyncio_tasks_callback,
+        ),
+        (
+            meter.create_observable_gauge,
+            "chaos_app.runtime.memory.rss",
+            "By",
+            "Resident set size of the API process",
+            _memory_rss_callback,
+        ),
+        (
+            meter.create_observable_counter,
+            "chaos_app.runtime.cpu.time",
+            "s",
+            "CPU time (user + system) consumed by the API process",
+            _cpu_time_callback,
+        ),
+    )
+    for create, name, unit, description, callback in specs:
+        with suppress(Exception):
+            _runtime_instruments.append(
+                create(
+                    name=name,
+                    description=description,
+                    unit=unit,
+                    callbacks=[callback],
+                )
+            )
+
+
+# Exemplar 付与対象の latency histogram。HTTP は FastAPIInstrumentor が
+# 旧 semconv (http.server.duration) / 新 semconv (http.server.request.duration)
+# のどちらで出すかが OTEL_SEMCONV_STABILITY_OPT_IN に依存するため両方を対象にする。
+_EXEMPLAR_HISTOGRAMS: tuple[str, ...] = (
+    "redis_connection_latency_ms",
+    "http.server.duration",
+    "http.server.request.duration",
+)
+
+
+def _exemplar_config(settings: Any) -> dict[str, Any]:
+    """Build MeterProvider kwargs for exemplar filter and bounded reservoirs.
+
+    OTEL_METRICS_EXEMPLAR_FILTER が設定されている場合は SDK の解釈に任せ、
+    filter は明示しない (OTEL_TRACES_SAMPLER と同じ優先順位)。
+    """
+    per_bucket = int(settings.telemetry_exemplars_per_bucket)
+    if per_bucket <= 0:
+        return {"exemplar_filter": AlwaysOffExemplarFilter()}
+    config: dict[str, Any] = {
+        "views": [
+            View(
+                instrument_name=name,
+                exemplar_reservoir_factory=bucketed_reservoir_factory(per_bucket),
+            )
+            for name in _EXEMPLAR_HISTOGRAMS
+        ]
+    }
+    if not os.getenv("OTEL_METRICS_EXEMPLAR_FILTER"):
+        config["exemplar_filter"] = TraceBasedExemplarFilter()
+    return config
+
+
+def _with_spill(exporter: Any, signal: str, settings: Any) -> Any:
+    """Wrap an OTLP exporter with the disk spill buffer when enabled.
+
+    spill 用ディレクトリを作れない (read-only / 権限不足) 場合は警告のみで
+    元の exporter を返し、telemetry 自体の初期化は継続する。
+    """
+    if not settings.telemetry_spill_enabled:
+        return exporter
+    wrappers = {
+        "traces": SpillingSpanExporter,
+        "metrics": SpillingMetricExporter,
+        "logs": SpillingLogExporter,
+    }
+    try:
+        sender = OtlpHttpReplaySender(signal)
+        buffer = SpillBuffer(
+            os.path.join(settings.telemetry_spill_dir, signal),
+            max_bytes=settings.telemetry_spill_max_bytes,
+            segment_bytes=settings.telemetry_spill_segment_bytes,
+        )
+    except Exception as e:  # noqa: BLE001
+        logger.warning("Telemetry spill buffer disabled for %s: %s", signal, e)
+        return exporter
+    replayer = SpillReplayer(buffer, sender)
+    _spill_buffers.append(buffer)
+    _spill_replayers.append(replayer)
+    return wrappers[signal](exporter, buffer, replayer)
+
+
+def _span_processor(exporter: Any) -> BatchSpanProcessor:
+    """spill 有効時は queue 溢れの span も破棄せず spill する processor を使う。"""
+    if isinstance(exporter, SpillingSpanExporter):
+        return SpillingBatchSpanProcessor(exporter)
+    return BatchSpanProcessor(exporter)
+
+
+def _log_processor(exporter: Any) -> BatchLogRecordProcessor:
+    if isinstance(exporter, SpillingLogExporter):
+        return SpillingBatchLogRecordProcessor(exporter)
+    return BatchLogRecordProcessor(exporter)
+
+
 def setup_telemetry(app: Any) -> None:
     """Configure vendor-neutral OpenTelemetry with OTLP exporter.
 
@@ -211,6 +537,16 @@ def setup_telemetry(app: Any) -> None:
       MeterReader の export 周期を制御し、低トラフィック時の signal 鮮度を
       確保する。
     - Instruments FastAPI (excludes health), Redis, and logging
+    - CUSTOM_METRICS_ENABLED=true のとき route template x status class の
+      RED metrics (chaos_app.red.*) をプロセス内で事前集計して export
+    - LOG_RATE_LIMIT_ENABLED=true のとき OTLP log handler に dedup / rate limit
+      filter を付け、繰り返し record を interval ごとの summary に集約
+    - RUNTIME_METRICS_ENABLED=true のとき event-loop lag / GC pause / task 数 /
+      RSS / CPU を chaos_app.runtime.* として export (sampler は lifespan で起動)
+    - Exemplars: sampled span 内で record された latency histogram の
+      bucket ごとに最大 TELEMETRY_EXEMPLARS_PER_BUCKET 件の trace ID を付与
+    - TELEMETRY_SPILL_ENABLED=true のとき、export 失敗 batch を
+      TELEMETRY_SPILL_DIR 配下の disk spill buffer に退避し回復後に replay
     - Uses Once pattern to prevent duplicate initialization (thread-safe)
     """
 
@@ -253,30 +589,44 @@ def setup_telemetry(app: Any) -> None:
             provider_kwargs: dict[str, Any] = {"resource": resource}
             if sampler is not None:
                 provider_kwargs["sampler"] = sampler
-            tracer_provider = TracerProvider(**provider_kwargs)
-            tracer_provider.add_span_processor(BatchSpanProcessor(OTLPSpanExporter()))
+            spill_enabled = bool(settings.telemetry_spill_enabled)
+            tracer_provider = TracerProvider(
+                shutdown_on_exit=not spill_enabled, **provider_kwargs
+            )
+            tracer_provider.add_span_processor(
+                _span_processor(_with_spill(OTLPSpanExporter(), "traces", settings))
+            )
             trace.set_tracer_provider(tracer_provider)
 
             # MeterProvider with OTLP/HTTP exporter
             # Delta temporality required for Application Insights OTLP
             export_interval_ms = int(settings.telemetry_export_interval_ms)
             metric_reader = PeriodicExportingMetricReader(
-                OTLPMetricExporter(
-                    preferred_temporality={
-                        Counter: AggregationTemporality.DELTA,
-                        UpDownCounter: AggregationTemporality.DELTA,
-                        Histogram: AggregationTemporality.DELTA,
-                        ObservableCounter: AggregationTemporality.DELTA,
-                        ObservableUpDownCounter: AggregationTemporality.DELTA,
-                        ObservableGauge: AggregationTemporality.DELTA,
-                    }
+                _with_spill(
+                    OTLPMetricExporter(
+                        preferred_temporality={
+                            Counter: AggregationTemporality.DELTA,
+                            UpDownCounter: AggregationTemporality.DELTA,
+                            Histogram: AggregationTemporality.DELTA,
+                            ObservableCounter: AggregationTemporality.DELTA,
+                            ObservableUpDownCounter: AggregationTemporality.DELTA,
+                            ObservableGauge: AggregationTemporality.DELTA,
+                        }
+                    ),
+                    "metrics",
+                    settings,
                 ),
                 export_interval_millis=export_interval_ms,
             )
             meter_provider = MeterProvider(
-                resource=resource, metric_readers=[metric_reader]
+                resource=resource,
+                metric_readers=[metric_reader],
+                shutdown_on_exit=not spill_enabled,
+                **_exemplar_config(settings),
             )
             metrics.set_meter_provider(meter_provider)
+            if spill_enabled:
+                _spill_providers.extend((tracer_provider, meter_provider))
 
             global _meter, _tracer
             _meter = metrics.get_meter("aks-chaos-lab", "0.1.0")
@@ -313,6 +663,14 @@ def setup_telemetry(app: Any) -> None:
                     callbacks=[_active_requests_callback],
                 )
 
+            # RED metrics: 全 request を事前集計し、sampling に依存しない
+            # route 別 error ratio / latency 分布を export する。
+            if settings.custom_metrics_enabled:
+                _setup_red_metrics(_meter, settings)
+
+            if settings.runtime_metrics_enabled:
+                _setup_runtime_metrics(_meter, settings)
+
             # LoggerProvider with OTLP/HTTP exporter — only when a logs endpoint
             # is configured (separate guard from traces/metrics).
             # OTLPLogExporter は OTEL_EXPORTER_OTLP_LOGS_ENDPOINT > unified
@@ -326,7 +684,7 @@ def setup_telemetry(app: Any) -> None:
                 global _logger_provider, _log_handler
                 _logger_provider = LoggerProvider(resource=resource)
                 _logger_provider.add_log_record_processor(
-                    BatchLogRecordProcessor(OTLPLogExporter())
+                    _log_processor(_with_spill(OTLPLogExporter(), "logs", settings))
                 )
                 set_logger_provider(_logger_provider)
 
@@ -340,8 +698,28 @@ def setup_telemetry(app: Any) -> None:
                 _log_handler = LoggingHandler(
                     level=handler_level, logger_provider=_logger_provider
                 )
+                if settings.log_rate_limit_enabled:
+                    global _log_rate_limiter
+                    _log_rate_limiter = LogRateLimitFilter(
+                        interval_seconds=settings.log_rate_limit_interval_seconds,
+                        burst=settings.log_rate_limit_burst,
+                        max_keys=settings.log_rate_limit_max_keys,
+                    )
+                    _log_rate_limiter.bind(_log_handler)
+                    _log_handler.addFilter(_log_rate_limiter)
                 logging.getLogger("app").addHandler(_log_handler)
 
+            # hot path 用に flag と bound method を 1 回だけ束ねる
+            global _bound
+            _bound = _BoundTelemetry(
+                custom_metrics=settings.custom_metrics_enabled,
+                redis_latency_record=(
+                    _redis_latency_hist.record
+                    if _redis_latency_hist is not None
+                    else None
+                ),
+            )
+
             logger.info("Telemetry configured (OTel SDK + OTLP exporter)")
             _telemetry_active = True
         except Exception as e:  # noqa: BLE001
@@ -404,16 +782,22 @@ def reset_telemetry() -> None:
     Note: This follows OpenTelemetry testing patterns and should only
     be used in test environments to reset Once guards.
     """
-    global _setup_once, _instrumentation_once
+    global _setup_once, _instrumentation_once, _bound
     global _redis_status_gauge, _redis_latency_hist, _redis_connected_state
     global _active_requests_gauge, _active_requests_count
-    global _logger_provider, _log_handler
+    global _logger_provider, _log_handler, _log_rate_limiter
+    global _red_aggregator, _runtime_sampler
     _setup_once = _Once()
     _instrumentation_once = _Once()
+    _bound = _DISABLED
     _redis_status_gauge = None
     _redis_latency_hist = None
     _redis_connected_state = -1
     _active_requests_gauge = None
+    _red_aggregator = None
+    _red_instruments.clear()
+    _runtime_sampler = None
+    _runtime_instruments.clear()
     with _active_requests_lock:
         _active_requests_count = 0
     # Detach OTLP log handler we attached to the "app" logger (identity remove
@@ -422,10 +806,24 @@ def reset_telemetry() -> None:
         with suppress(Exception):
             logging.getLogger("app").removeHandler(_log_handler)
     _log_handler = None
+    _log_rate_limiter = None
     _logger_provider = None
+    _spill_providers.clear()
+    _close_spill_buffers()
     logger.debug("Telemetry state reset for testing")
 
 
+def _close_spill_buffers() -> None:
+    for replayer in _spill_replayers:
+        with suppress(Exception):
+            replayer.close()
+    _spill_replayers.clear()
+    for buffer in _spill_buffers:
+        with suppress(Exception):
+            buffer.close()
+    _spill_buffers.clear()
+
+
 def shutdown_telemetry() -> None:
     """Flush and shut down the OTLP logs pipeline (best-effort).
 
@@ -433,15 +831,46 @@ def shutdown_telemetry() -> None:
     application log (例: "Application shutdown complete") を BatchLogRecordProcessor
     の export 前に process が終わるとロストする。lifespan shutdown の最後に
     本関数を呼ぶことで force_flush + shutdown を明示的に走らせる。
-    Traces / metrics の SDK 側 atexit フックは別経路で動くため対象外。
+    Traces / metrics は SDK 側 atexit フックで shutdown するが、spill 有効時は
+    spill buffer に書き込む provider を先に shutdown してから buffer を閉じる。
     """
     global _logger_provider
-    if _logger_provider is None:
+    if _log_rate_limiter is not None:
+        with suppress(Exception):
+            _log_rate_limiter.flush()
+    if _logger_provider is not None:
+        with suppress(Exception):
+            _logger_provider.force_flush()
+        with suppress(Exception):
+            _logger_provider.shutdown()
+    for provider in _spill_providers:
+        with suppress(Exception):
+            provider.shutdown()
+    _spill_providers.clear()
+    # 未送信の spill record は emptyDir に残し、同一 Pod 内の再起動後に replay する
+    _close_spill_buffers()
+
+
+def start_runtime_metrics() -> None:
+    """Start the event-loop lag sampler and GC hooks on the running loop.
+
+    lifespan startup から呼ぶ。telemetry 無効時や RUNTIME_METRICS_ENABLED=false
+    の場合は sampler が作成されていないため no-op。
+    """
+    if _runtime_sampler is None:
+        return
+    try:
+        _runtime_sampler.start()
+    except Exception as e:  # noqa: BLE001
+        logger.warning("Failed to start runtime metrics sampler: %s", e)
+
+
+async def stop_runtime_metrics() -> None:
+    """Cancel the lag sampler task and unhook GC callbacks (best-effort)."""
+    if _runtime_sampler is None:
         return
     with suppress(Exception):
-        _logger_provider.force_flush()
-    with suppress(Exception):
-        _logger_provider.shutdown()
+        await _runtime_sampler.stop()
 
 
 def increment_active_requests() -> None:
@@ -475,25 +904,38 @@ def decrement_active_requests() -> None:
             _active_requests_count -= 1
 
 
+def record_red_request(route: str | None, status_code: int, duration_ms: float) -> None:
+    """Record one HTTP request into the in-process RED aggregator.
+
+    aggregator は setup 時に custom_metrics_enabled を見て作成済みのため、
+    request ごとに Settings を構築しない。未作成 (telemetry 無効) なら no-op。
+    """
+    aggregator = _red_aggregator
+    if aggregator is None:
+        return
+    try:
+        aggregator.record(route, status_code, duration_ms)
+    except Exception as e:  # noqa: BLE001
+        logger.debug("record_red_request failed: %s", e)
+
+
 def record_redis_metrics(connected: bool, latency_ms: int) -> None:
     """Record Redis connection metrics (status + latency).
 
     実 latency を測定したパスから呼ぶ。アイドル時や latency 未測定パスでは
     record_redis_status_only を使い、histogram に 0ms 等の偽値を入れない。
-    instrument は setup_telemetry でキャッシュ済みのものを再利用する。
+    判定と記録は setup 時に束ねた ``_bound`` のみを参照する。
     """
-    # Lazy import to avoid circular dependency
-    from app.config import Settings
-
-    settings = Settings()
-    if not settings.custom_metrics_enabled or not _meter:
+    bound = _bound
+    if not bound.custom_metrics:
         return
     try:
         global _redis_connected_state
         _redis_connected_state = 1 if connected else 0
 
-        if connected and latency_ms >= 0 and _redis_latency_hist is not None:
-            _redis_latency_hist.record(latency_ms)
+        record = bound.redis_latency_record
+        if connected and latency_ms >= 0 and record is not None:
+            record(latency_ms)
     except Exception as e:  # noqa: BLE001
         logger.debug("record_redis_metrics failed: %s", e)
 
@@ -505,13 +947,7 @@ def record_redis_status_only(connected: bool) -> None:
     のとき、0ms 偽値を histogram に書き込むと P50/P95 が大きく歪むため、
     histogram には触れず ObservableGauge の backing state のみ更新する。
     """
-    from app.config import Settings
-
-    settings = Settings()
-    if not settings.custom_metrics_enabled or not _meter:
+    if not _bound.custom_metrics:
         return
-    try:
-        global _redis_connected_state
-        _redis_connected_state = 1 if connected else 0
-    except Exception as e:  # noqa: BLE001
-        logger.debug("record_redis_status_only failed: %s", e)
+    global _redis_connected_state
+    _redis_connected_state = 1 if connected else 0
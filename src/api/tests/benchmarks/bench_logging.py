@@ -0,0 +1,85 @@
+"""Microbenchmark: event-loop-side cost per log line by logging mode.
+
+Usage (from src/api):
+    uv run python tests/benchmarks/bench_logging.py
+
+呼び出し元 thread (本番では event loop thread) が ``logger.error`` 1 回に
+使う時間を比較する。出力先は一時ファイル (実 write syscall あり)。
+queue mode の listener thread 側の時間 (drain) は参考値として別に出す。
+"""
+
+import logging
+import queue
+import tempfile
+import time
+from logging.handlers import QueueListener
+
+from app.logging_config import TEXT_FORMAT, ContextQueueHandler, JsonFormatter
+
+LINES = 50_000
+
+
+def _logger(handler: logging.Handler) -> logging.Logger:
+    logger = logging.Logger("bench", logging.INFO)
+    logger.propagate = False
+    logger.addHandler(handler)
+    return logger
+
+
+def _emit(logger: logging.Logger) -> float:
+    error = ConnectionError("Connection refused")
+    start = time.perf_counter()
+    for i in range(LINES):
+        logger.error("Redis operation failed: %s (request %d)", error, i)
+    return time.perf_counter() - start
+
+
+def bench_sync(formatter: logging.Formatter) -> float:
+    with tempfile.TemporaryFile("w+") as stream:
+        handler = logging.StreamHandler(stream)
+        handler.setFormatter(formatter)
+        return _emit(_logger(handler))
+
+
+def bench_queue(*, concurrent: bool) -> tuple[float, float]:
+    """Return (caller time, listener drain time).
+
+    concurrent=False は listener を emit 後に起動し、enqueue だけのコストを測る。
+    tight loop では listener thread と GIL を奪い合うため、concurrent=True の
+    値は event loop が I/O 待ちで空く実運用より悲観的になる。
+    """
+    with tempfile.TemporaryFile("w+") as stream:
+        handler = logging.StreamHandler(stream)
+        handler.setFormatter(JsonFormatter())
+        record_queue: queue.Queue[logging.LogRecord | None] = queue.Queue(maxsize=LINES)
+        listener = QueueListener(record_queue, handler)
+        if concurrent:
+            listener.start()
+        elapsed = _emit(_logger(ContextQueueHandler(record_queue)))
+        drain_start = time.perf_counter()
+        if not concurrent:
+            listener.start()
+        listener.stop()
+        return elapsed, time.perf_counter() - drain_start
+
+
+def main() -> None:
+    results = {
+        "sync_text": bench_sync(logging.Formatter(TEXT_FORMAT)),
+        "sync_json": bench_sync(JsonFormatter()),
+    }
+    results["queue_json"], drain = bench_queue(concurrent=False)
+    results["queue_json_busy"], _ = bench_queue(concurrent=True)
+    baseline = results["sync_text"]
+    for name, elapsed in results.items():
+        per_line_us = elapsed / LINES * 1e6
+        saved_us = (baseline - elapsed) / LINES * 1e6
+        print(
+            f"{name:16s} {per_line_us:6.2f} us/line  "
+            f"saved vs sync_text {saved_us:+6.2f} us"
+        )
+    print(f"queue_json listener drain (off caller thread): {drain * 1000:.0f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,111 @@
+"""Microbenchmark: in-process RED aggregator vs span-derived metrics.
+
+Usage (from src/api):
+    uv run python tests/benchmarks/bench_red_metrics.py
+
+request 1 件あたりのコストを比較する。
+
+- red_aggregator: RedAggregator.record (本番 middleware と同じ経路)
+- sdk_histogram: OTel SDK の同期 Histogram + Counter に attribute 付きで record
+- span_derived: span を作成し、終了時に SpanProcessor で metrics を導出する
+  (spanmetrics connector 相当を in-process で行った場合の下限)
+"""
+
+import timeit
+
+from opentelemetry.sdk.metrics import MeterProvider
+from opentelemetry.sdk.metrics.export import InMemoryMetricReader
+from opentelemetry.sdk.trace import ReadableSpan, SpanProcessor, TracerProvider
+from opentelemetry.sdk.trace.sampling import ALWAYS_ON
+
+from app.red_metrics import RedAggregator
+
+ROUTES = ("/", "/items/{id}", "/users/{id}/orders", "/health")
+ITERATIONS = 200_000
+
+
+class _SpanMetricsProcessor(SpanProcessor):
+    def __init__(self, meter_provider: MeterProvider) -> None:
+        meter = meter_provider.get_meter("bench")
+        self._requests = meter.create_counter("requests")
+        self._duration = meter.create_histogram("duration", unit="ms")
+
+    def on_end(self, span: ReadableSpan) -> None:
+        assert span.attributes is not None
+        attributes = {
+            "http.route": span.attributes["http.route"],
+            "http.status_class": "2xx",
+        }
+        self._requests.add(1, attributes)
+        self._duration.record(
+            (span.end_time - span.start_time) / 1e6,  # ty: ignore[unsupported-operator]
+            attributes,
+        )
+
+
+def bench_red_aggregator() -> float:
+    agg = RedAggregator()
+    i = 0
+
+    def op() -> None:
+        nonlocal i
+        i += 1
+        agg.record(ROUTES[i & 3], 200, float(i & 255))
+
+    return timeit.timeit(op, number=ITERATIONS)
+
+
+def bench_sdk_histogram() -> float:
+    provider = MeterProvider(metric_readers=[InMemoryMetricReader()])
+    meter = provider.get_meter("bench")
+    requests = meter.create_counter("requests")
+    duration = meter.create_histogram("duration", unit="ms")
+    i = 0
+
+    def op() -> None:
+        nonlocal i
+        i += 1
+        attributes = {"http.route": ROUTES[i & 3], "http.status_class": "2xx"}
+        requests.add(1, attributes)
+        duration.record(float(i & 255), attributes)
+
+    elapsed = timeit.timeit(op, number=ITERATIONS)
+    provider.shutdown()
+    return elapsed
+
+
+def bench_span_derived() -> float:
+    meter_provider = MeterProvider(metric_readers=[InMemoryMetricReader()])
+    tracer_provider = TracerProvider(sampler=ALWAYS_ON)
+    tracer_provider.add_span_processor(_SpanMetricsProcessor(meter_provider))
+    tracer = tracer_provider.get_tracer("bench")
+    i = 0
+
+    def op() -> None:
+        nonlocal i
+        i += 1
+        with tracer.start_as_current_span(
+            "GET", attributes={"http.route": ROUTES[i & 3]}
+        ):
+            pass
+
+    elapsed = timeit.timeit(op, number=ITERATIONS)
+    tracer_provider.shutdown()
+    meter_provider.shutdown()
+    return elapsed
+
+
+def main() -> None:
+    results = {
+        "red_aggregator": bench_red_aggregator(),
+        "sdk_histogram": bench_sdk_histogram(),
+        "span_derived": bench_span_derived(),
+    }
+    baseline = results["red_aggregator"]
+    for name, elapsed in results.items():
+        per_op_ns = elapsed / ITERATIONS * 1e9
+        print(f"{name:16s} {per_op_ns:8.0f} ns/op  x{elapsed / baseline:5.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+"""Microbenchmark: per-request telemetry helper cost before / after binding.
+
+Usage (from src/api):
+    uv run python tests/benchmarks/bench_telemetry_hot_path.py
+
+root() が request ごとに呼ぶ telemetry helper のコストを比較する。
+
+- legacy: 関数内 import + ``Settings()`` 構築 + ``_meter`` 判定 + histogram record
+  (setup 時 binding 導入前の record_redis_metrics と同じ手順)
+- bound: setup 時に束ねた ``_BoundTelemetry`` 経由の record_redis_metrics /
+  record_redis_status_only / record_red_request
+
+併せて tracemalloc で bound 経路の 1 request あたりの確保 block 数を出す
+(SDK 側の exemplar / bucket 更新を除き 0 を期待する)。
+"""
+
+import timeit
+import tracemalloc
+from unittest.mock import patch
+
+from opentelemetry.sdk.metrics import MeterProvider
+from opentelemetry.sdk.metrics.export import InMemoryMetricReader
+
+import app.telemetry as tm
+from app.red_metrics import RedAggregator
+
+ITERATIONS = 50_000
+
+
+def _histogram():  # noqa: ANN202
+    provider = MeterProvider(metric_readers=[InMemoryMetricReader()])
+    return provider, provider.get_meter("bench").create_histogram("latency")
+
+
+def bench_legacy() -> float:
+    provider, hist = _histogram()
+
+    def op() -> None:
+        from app.config import Settings  # noqa: PLC0415
+
+        if not Settings().custom_metrics_enabled:
+            return
+        if tm._meter is None and hist is None:
+            return
+        hist.record(5)
+        from app.telemetry import record_redis_status_only  # noqa: PLC0415
+
+        record_redis_status_only(connected=True)
+
+    elapsed = timeit.timeit(op, number=ITERATIONS)
+    provider.shutdown()
+    return elapsed
+
+
+def _bound_op() -> None:
+    tm.record_redis_metrics(connected=True, latency_ms=5)
+    tm.record_redis_status_only(connected=True)
+    tm.record_red_request("/", 200, 5.0)
+
+
+def bench_bound() -> tuple[float, float]:
+    provider, hist = _histogram()
+    bound = tm._BoundTelemetry(custom_metrics=True, redis_latency_record=hist.record)
+    with (
+        patch.object(tm, "_bound", bound),
+        patch.object(tm, "_red_aggregator", RedAggregator()),
+    ):
+        op = _bound_op
+        elapsed = timeit.timeit(op, number=ITERATIONS)
+
+        # warm-up 後の確保数 (series 作成等の初回確保を除く)
+        op()
+        tracemalloc.start()
+        before = tracemalloc.take_snapshot()
+        for _ in range(1000):
+            op()
+        after = tracemalloc.take_snapshot()
+        tracemalloc.stop()
+    filters = [tracemalloc.Filter(True, tm.__file__)]
+    diff = after.filter_traces(filters).compare_to(
+        before.filter_traces(filters), "lineno"
+    )
+    blocks_per_op = sum(max(0, d.count_diff) for d in diff) / 1000
+    provider.shutdown()
+    return elapsed, blocks_per_op
+
+
+def main() -> None:
+    legacy = bench_legacy()
+    bound, blocks_per_op = bench_bound()
+    for name, elapsed in (("legacy", legacy), ("bound", bound)):
+        per_op_ns = elapsed / ITERATIONS * 1e9
+        print(f"{name:8s} {per_op_ns:8.0f} ns/op  x{elapsed / bound:5.1f}")
+    print(f"bound allocations in app.telemetry: {blocks_per_op:.3f} blocks/op")
+
+
+if __name__ == "__main__":
+    main()
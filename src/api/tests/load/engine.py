@@ -0,0 +1,600 @@
+"""Open-model load generator driven by declarative scenario files.
+
+Usage (from src/api):
+    uv run python tests/load/engine.py tests/load/scenarios/baseline.toml \
+        --host http://<host-or-ip>
+
+A scenario (TOML, versioned under `tests/load/scenarios/`) declares:
+
+- `[arrival]`: session arrival rate over time: `constant`, `ramp`, `step` or
+  `spike`, with Poisson (`process = "poisson"`, default) or evenly spaced
+  (`"uniform"`) arrivals.
+- `[[endpoints]]`: the request mix; each request picks an endpoint by weight.
+- `[session]`: requests per arriving session and the think time between them
+  (`none`, `constant`, `uniform` or `exponential`).
+
+Arrivals follow the schedule whatever the API latency is (open model): a slow
+API gets more requests in flight instead of fewer arrivals, unlike Locust
+users that wait for each response. One asyncio loop with a shared aiohttp
+connection pool drives every session, so a single process generates
+thousands of requests per second.
+
+`mode` decides how requests inside a session are scheduled:
+
+- `session` (default): each request follows the previous response plus the
+  think time, and arrivals beyond `max_in_flight` open sessions are counted
+  as dropped rather than delayed.
+- `open-loop`: every request is due at a fixed point on the timeline (the
+  session arrival plus the think times, independent of responses) and no
+  arrival is dropped; `max_in_flight` only caps the connection pool.
+
+Latency is recorded from the intended send time, not from when the request
+actually left: a request that waited behind a stalled response or for a free
+connection is charged that wait, so a stall is not hidden by the requests it
+delayed (coordinated omission). The time from the actual send is kept as the
+service time. Both go to HDR histograms, reported as p50 / p99 / p99.9 per
+endpoint.
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import math
+import os
+import random
+import sys
+import time
+import tomllib
+from collections import Counter
+from collections.abc import Awaitable, Callable, Iterator, Mapping
+from dataclasses import dataclass, field, replace
+from pathlib import Path
+from typing import Any
+
+import aiohttp
+
+SCENARIO_DIR = Path(__file__).resolve().parent / "scenarios"
+ARRIVAL_MODELS = ("constant", "ramp", "step", "spike")
+ARRIVAL_PROCESSES = ("poisson", "uniform")
+THINK_TIME_DISTRIBUTIONS = ("none", "constant", "uniform", "exponential")
+MODES = ("session", "open-loop")
+PERCENTILES = (50.0, 99.0, 99.9)
+# Latencies are recorded in microseconds, up to an hour, with 3 significant
+# digits (0.1% resolution).
+HDR_HIGHEST_MICROS = 3_600_000_000
+HDR_SIGNIFICANT_FIGURES = 3
+# Step length used to skip over intervals where the arrival rate is zero.
+IDLE_STEP_SECONDS = 0.1
+
+
+class ScenarioError(ValueError):
+    """The scenario file is missing a field or has an invalid value."""
+
+
+@dataclass(frozen=True)
+class ArrivalProfile:
+    model: str
+    # constant: the rate; spike: the rate outside the spike
+    rate: float = 0.0
+    # ramp: start_rate -> end_rate over ramp_seconds, then end_rate
+    start_rate: float = 0.0
+    end_rate: float = 0.0
+    ramp_seconds: float = 0.0
+    # step: consecutive (seconds, rate) stages
+    steps: tuple[tuple[float, float], ...] = ()
+    # spike: spike_rate during [spike_at_seconds, + spike_seconds)
+    spike_rate: float = 0.0
+    spike_at_seconds: float = 0.0
+    spike_seconds: float = 0.0
+    process: str = "poisson"
+    # Multiplies every rate (`--rate-scale`).
+    scale: float = 1.0
+
+    def __post_init__(self) -> None:
+        if self.model not in ARRIVAL_MODELS:
+            raise ScenarioError(
+                f"arrival.model must be one of {ARRIVAL_MODELS}: {self.model!r}"
+            )
+        if self.process not in ARRIVAL_PROCESSES:
+            raise ScenarioError(
+                f"arrival.process must be one of {ARRIVAL_PROCESSES}: {self.process!r}"
+            )
+        if self.model == "step" and not self.steps:
+            raise ScenarioError("arrival.steps is required for the step model")
+        if self.max_rate <= 0:
+            raise ScenarioError("arrival rate must be positive at some point")
+
+    def rate_at(self, elapsed: float) -> float:
+        """Sessions per second at `elapsed` seconds into the run."""
+        if self.model == "constant":
+            rate = self.rate
+        elif self.model == "ramp":
+            if elapsed >= self.ramp_seconds:
+                rate = self.end_rate
+            else:
+                progress = elapsed / self.ramp_seconds
+                rate = self.start_rate + (self.end_rate - self.start_rate) * progress
+        elif self.model == "step":
+            rate = self.steps[-1][1]
+            stage_end = 0.0
+            for seconds, stage_rate in self.steps:
+                stage_end += seconds
+                if elapsed < stage_end:
+                    rate = stage_rate
+                    break
+        else:
+            spike_end = self.spike_at_seconds + self.spike_seconds
+            in_spike = self.spike_at_seconds <= elapsed < spike_end
+            rate = self.spike_rate if in_spike else self.rate
+        return rate * self.scale
+
+    @property
+    def max_rate(self) -> float:
+        rates = {
+            "constant": (self.rate,),
+            "ramp": (self.start_rate, self.end_rate),
+            "step": tuple(rate for _, rate in self.steps),
+            "spike": (self.rate, self.spike_rate),
+        }[self.model]
+        return max(rates) * self.scale
+
+    @property
+    def natural_duration(self) -> float | None:
+        """Length implied by the profile itself (step stages), if any."""
+        if self.model == "step":
+            return sum(seconds for seconds, _ in self.steps)
+        return None
+
+
+@dataclass(frozen=True)
+class ThinkTime:
+    distribution: str = "none"
+    # constant: the delay; exponential: the mean
+    seconds: float = 0.0
+    # uniform: [min_seconds, max_seconds]
+    min_seconds: float = 0.0
+    max_seconds: float = 0.0
+
+    def __post_init__(self) -> None:
+        if self.distribution not in THINK_TIME_DISTRIBUTIONS:
+            raise ScenarioError(
+                "session.think_time.distribution must be one of "
+                f"{THINK_TIME_DISTRIBUTIONS}: {self.distribution!r}"
+            )
+        if self.distribution == "uniform" and self.min_seconds > self.max_seconds:
+            raise ScenarioError("think_time.min_seconds exceeds max_seconds")
+
+    def sample(self, rng: random.Random) -> float:
+        if self.distribution == "constant":
+            return self.seconds
+        if self.distribution == "uniform":
+            return rng.uniform(self.min_seconds, self.max_seconds)
+        if self.distribution == "exponential" and self.seconds > 0:
+            return rng.expovariate(1 / self.seconds)
+        return 0.0
+
+
+@dataclass(frozen=True)
+class Endpoint:
+    name: str
+    path: str
+    method: str = "GET"
+    weight: float = 1.0
+
+
+@dataclass(frozen=True)
+class Scenario:
+    name: str
+    duration_seconds: float
+    arrival: ArrivalProfile
+    endpoints: tuple[Endpoint, ...]
+    description: str = ""
+    session_requests: int = 1
+    think_time: ThinkTime = field(default_factory=ThinkTime)
+    timeout_seconds: float = 10.0
+    max_in_flight: int = 1000
+    seed: int | None = None
+    mode: str = "session"
+
+    def __post_init__(self) -> None:
+        if self.mode not in MODES:
+            raise ScenarioError(f"mode must be one of {MODES}: {self.mode!r}")
+        if not self.endpoints:
+            raise ScenarioError("at least one [[endpoints]] entry is required")
+        if any(endpoint.weight <= 0 for endpoint in self.endpoints):
+            raise ScenarioError("endpoint weights must be positive")
+        if self.duration_seconds <= 0:
+            raise ScenarioError("duration_seconds must be positive")
+        if self.session_requests < 1 or self.max_in_flight < 1:
+            raise ScenarioError(
+                "session.requests and max_in_flight must be greater than zero"
+            )
+
+    @classmethod
+    def load(cls, path: Path) -> Scenario:
+        with path.open("rb") as scenario_file:
+            data = tomllib.load(scenario_file)
+        return cls.from_dict(data, default_name=path.stem)
+
+    @classmethod
+    def from_dict(cls, data: Mapping[str, Any], *, default_name: str = "") -> Scenario:
+        try:
+            arrival_data = dict(data["arrival"])
+            arrival_data["steps"] = tuple(
+                (float(seconds), float(rate))
+                for seconds, rate in arrival_data.get("steps", ())
+            )
+            arrival = ArrivalProfile(**arrival_data)
+            session = dict(data.get("session", {}))
+            think_time = ThinkTime(**session.pop("think_time", {}))
+            endpoints = tuple(Endpoint(**entry) for entry in data["endpoints"])
+            duration = data.get("duration_seconds", arrival.natural_duration)
+            if duration is None:
+                raise ScenarioError("duration_seconds is required")
+            return cls(
+                name=data.get("name", default_name),
+                description=data.get("description", ""),
+                duration_seconds=float(duration),
+                arrival=arrival,
+                endpoints=endpoints,
+                session_requests=int(session.pop("requests", 1)),
+                think_time=think_time,
+                timeout_seconds=float(data.get("timeout_seconds", 10.0)),
+                max_in_flight=int(data.get("max_in_flight", 1000)),
+                seed=data.get("seed"),
+                mode=data.get("mode", "session"),
+            )
+        except KeyError as exc:
+            raise ScenarioError(f"missing scenario field: {exc.args[0]}") from exc
+        except TypeError as exc:
+            raise ScenarioError(f"invalid scenario field: {exc}") from exc
+
+
+def resolve_scenario_path(name_or_path: str) -> Path:
+    """A scenario file path, or the name of a bundled scenario."""
+    path = Path(name_or_path)
+    if path.suffix == ".toml" or path.exists():
+        return path
+    return SCENARIO_DIR / f"{name_or_path}.toml"
+
+
+def bundled_scenarios() -> list[str]:
+    return sorted(path.stem for path in SCENARIO_DIR.glob("*.toml"))
+
+
+def arrival_times(
+    profile: ArrivalProfile, duration: float, rng: random.Random
+) -> Iterator[float]:
+    """Session start offsets in seconds, ascending, within `duration`."""
+    elapsed = 0.0
+    if profile.process == "uniform":
+        while elapsed < duration:
+            rate = profile.rate_at(elapsed)
+            if rate <= 0:
+                elapsed += IDLE_STEP_SECONDS
+                continue
+            yield elapsed
+            elapsed += 1 / rate
+        return
+    # Non-homogeneous Poisson process by thinning: draw candidates at the
+    # peak rate, keep each with probability rate(t) / peak.
+    peak = profile.max_rate
+    while True:
+        elapsed += rng.expovariate(peak)
+        if elapsed >= duration:
+            return
+        if rng.random() * peak < profile.rate_at(elapsed):
+            yield elapsed
+
+
+# --- results ---------------------------------------------------------------
+
+
+class HdrHistogram:
+    """HdrHistogram-style log-linear histogram of non-negative integers.
+
+    Values are counted in power-of-two buckets split into linear sub-buckets
+    sized for `significant_figures` decimal digits, so every value up to
+    `highest` is kept within that precision in a fixed counts array: recording
+    is O(1) and memory does not grow with the number of requests. The layout
+    follows the reference HdrHistogram (Gil Tene); values above `highest`
+    are clamped to it.
+    """
+
+    def __init__(
+        self,
+        highest: int = HDR_HIGHEST_MICROS,
+        significant_figures: int = HDR_SIGNIFICANT_FIGURES,
+    ) -> None:
+        if not 1 <= significant_figures <= 5:
+            raise ValueError("significant_figures must be between 1 and 5")
+        self.highest = highest
+        self.significant_figures = significant_figures
+        largest_single_unit = 2 * 10**significant_figures
+        self._half_count_magnitude = (largest_single_unit - 1).bit_length() - 1
+        self._half_count = 1 << self._half_count_magnitude
+        self._sub_bucket_mask = (1 << (self._half_count_magnitude + 1)) - 1
+        bucket_count = 1
+        smallest_untrackable = self._half_count << 1
+        while smallest_untrackable <= highest:
+            smallest_untrackable <<= 1
+            bucket_count += 1
+        self.counts = [0] * ((bucket_count + 1) * self._half_count)
+        self.total_count = 0
+        self.max_value = 0
+
+    def _bucket_index(self, value: int) -> int:
+        return (value | self._sub_bucket_mask).bit_length() - (
+            self._half_count_magnitude + 1
+        )
+
+    def _index(self, value: int) -> int:
+        bucket = self._bucket_index(value)
+        sub_bucket = value >> bucket
+        return ((bucket + 1) << self._half_count_magnitude) + (
+            sub_bucket - self._half_count
+        )
+
+    def _highest_equivalent(self, index: int) -> int:
+        """Largest value counted at `index`."""
+        bucket = (index >> self._half_count_magnitude) - 1
+        sub_bucket = (index & (self._half_count - 1)) + self._half_count
+        if bucket < 0:
+            sub_bucket -= self._half_count
+            bucket = 0
+        return ((sub_bucket + 1) << bucket) - 1
+
+    def record(self, value: int, count: int = 1) -> None:
+        if value < 0:
+            raise ValueError("HdrHistogram only tracks non-negative values")
+        value = min(value, self.highest)
+        self.counts[self._index(value)] += count
+        self.total_count += count
+        self.max_value = max(self.max_value, value)
+
+    def add(self, other: HdrHistogram) -> None:
+        if (other.highest, other.significant_figures) != (
+            self.highest,
+            self.significant_figures,
+        ):
+            raise ValueError("cannot add histograms with a different layout")
+        for index, count in enumerate(other.counts):
+            if count:
+                self.counts[index] += count
+        self.total_count += other.total_count
+        self.max_value = max(self.max_value, other.max_value)
+
+    def value_at_percentile(self, percentile: float) -> int | None:
+        """Smallest recorded value that `percentile`% of the values are at or
+        below (within the histogram precision), or None when empty."""
+        if not self.total_count:
+            return None
+        rank = max(1, math.ceil(percentile / 100 * self.total_count))
+        seen = 0
+        for index, count in enumerate(self.counts):
+            seen += count
+            if seen >= rank:
+                return min(self._highest_equivalent(index), self.max_value)
+        return self.max_value
+
+
+def _micros(seconds: float) -> int:
+    return max(0, round(seconds * 1_000_000))
+
+
+@dataclass
+class EndpointStats:
+    requests: int = 0
+    errors: int = 0
+    statuses: Counter[str] = field(default_factory=Counter)
+    # From the intended send time on the scenario timeline to the response.
+    latency: HdrHistogram = field(default_factory=HdrHistogram)
+    # From the actual send to the response.
+    service: HdrHistogram = field(default_factory=HdrHistogram)
+
+    def record(
+        self, status: int | None, intended: float, sent: float, done: float
+    ) -> None:
+        """Record one response; times are clock readings in seconds."""
+        self.requests += 1
+        self.statuses[str(status) if status is not None else "error"] += 1
+        if status is None or status >= 400:
+            self.errors += 1
+        self.latency.record(_micros(done - intended))
+        self.service.record(_micros(done - sent))
+
+    def percentile(self, q: float, *, corrected: bool = True) -> float | None:
+        """Latency percentile in ms: corrected (from the intended send time)
+        by default, the service time otherwise."""
+        histogram = self.latency if corrected else self.service
+        value = histogram.value_at_percentile(q)
+        return value / 1000 if value is not None else None
+
+
+@dataclass
+class LoadReport:
+    scenario: str
+    mode: str = "session"
+    elapsed_seconds: float = 0.0
+    sessions: int = 0
+    dropped: int = 0
+    endpoints: dict[str, EndpointStats] = field(default_factory=dict)
+
+    @property
+    def requests(self) -> int:
+        return sum(stats.requests for stats in self.endpoints.values())
+
+    @property
+    def errors(self) -> int:
+        return sum(stats.errors for stats in self.endpoints.values())
+
+    def to_dict(self) -> dict[str, Any]:
+        return {
+            "scenario": self.scenario,
+            "mode": self.mode,
+            "elapsed_seconds": round(self.elapsed_seconds, 3),
+            "sessions": self.sessions,
+            "dropped": self.dropped,
+            "requests": self.requests,
+            "errors": self.errors,
+            "endpoints": {
+                name: {
+                    "requests": stats.requests,
+                    "errors": stats.errors,
+                    "statuses": dict(stats.statuses),
+                    **{f"p{q:g}_ms": stats.percentile(q) for q in PERCENTILES},
+                    **{
+                        f"service_p{q:g}_ms": stats.percentile(q, corrected=False)
+                        for q in PERCENTILES
+                    },
+                }
+                for name, stats in self.endpoints.items()
+            },
+        }
+
+    def summary(self) -> str:
+        elapsed = max(self.elapsed_seconds, 1e-9)
+        lines = [
+            f"[load] scenario={self.scenario} mode={self.mode} "
+            f"elapsed={self.elapsed_seconds:.1f}s "
+            f"sessions={self.sessions} dropped={self.dropped} "
+            f"requests={self.requests} rps={self.requests / elapsed:.1f} "
+            f"errors={self.errors}",
+            f"{'endpoint':<16} {'reqs':>8} {'errors':>7} "
+            f"{'p50 ms':>9} {'p99 ms':>9} {'p99.9 ms':>9} {'svc p99':>9}  statuses",
+        ]
+        for name, stats in self.endpoints.items():
+            percentiles = " ".join(
+                f"{value:9.1f}" if value is not None else f"{'-':>9}"
+                for value in (
+                    *(stats.percentile(q) for q in PERCENTILES),
+                    stats.percentile(99.0, corrected=False),
+                )
+            )
+            statuses = ",".join(
+                f"{status}={count}" for status, count in sorted(stats.statuses.items())
+            )
+            lines.append(
+                f"{name:<16} {stats.requests:>8} {stats.errors:>7} "
+                f"{percentiles}  {statuses}"
+            )
+        return "\n".join(lines)
+
+
+# --- runner ----------------------------------------------------------------
+
+
+async def run_scenario(
+    scenario: Scenario,
+    base_url: str,
+    *,
+    clock: Callable[[], float] = time.perf_counter,
+    sleep: Callable[[float], Awaitable[None]] = asyncio.sleep,
+) -> LoadReport:
+    rng = random.Random(scenario.seed)
+    report = LoadReport(
+        scenario=scenario.name,
+        mode=scenario.mode,
+        endpoints={endpoint.name: EndpointStats() for endpoint in scenario.endpoints},
+    )
+    weights = [endpoint.weight for endpoint in scenario.endpoints]
+    base_url = base_url.rstrip("/")
+    open_loop = scenario.mode == "open-loop"
+    sessions: set[asyncio.Task[None]] = set()
+
+    async def session(http: aiohttp.ClientSession, intended: float) -> None:
+        for index in range(scenario.session_requests):
+            if index:
+                think = scenario.think_time.sample(rng)
+                # open-loop: due `think` after the previous request was due,
+                # whenever its response came back.
+                intended = (intended if open_loop else clock()) + think
+            delay = intended - clock()
+            if delay > 0:
+                await sleep(delay)
+            (endpoint,) = rng.choices(scenario.endpoints, weights)
+            sent = clock()
+            status: int | None = None
+            try:
+                async with http.request(
+                    endpoint.method, base_url + endpoint.path
+                ) as response:
+                    await response.read()
+                    status = response.status
+            except aiohttp.ClientError, TimeoutError:
+                status = None
+            report.endpoints[endpoint.name].record(status, intended, sent, clock())
+
+    connector = aiohttp.TCPConnector(limit=scenario.max_in_flight)
+    timeout = aiohttp.ClientTimeout(total=scenario.timeout_seconds)
+    async with aiohttp.ClientSession(connector=connector, timeout=timeout) as http:
+        start = clock()
+        for offset in arrival_times(scenario.arrival, scenario.duration_seconds, rng):
+            delay = start + offset - clock()
+            if delay > 0:
+                await sleep(delay)
+            report.sessions += 1
+            if not open_loop and len(sessions) >= scenario.max_in_flight:
+                report.dropped += 1
+                continue
+            task = asyncio.create_task(session(http, start + offset))
+            sessions.add(task)
+            task.add_done_callback(sessions.discard)
+        if sessions:
+            await asyncio.gather(*sessions)
+        report.elapsed_seconds = clock() - start
+    return report
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument(
+        "scenario",
+        help=f"scenario file or bundled name ({', '.join(bundled_scenarios())})",
+    )
+    parser.add_argument("--host", default=os.environ.get("BASE_URL"))
+    parser.add_argument("--duration", type=float, help="override duration_seconds")
+    parser.add_argument(
+        "--rate-scale", type=float, default=1.0, help="multiply every arrival rate"
+    )
+    parser.add_argument("--seed", type=int, help="override the scenario seed")
+    parser.add_argument("--mode", choices=MODES, help="override the scenario mode")
+    parser.add_argument("--json", type=Path, help="also write the report as JSON")
+    args = parser.parse_args(argv)
+    if not args.host:
+        parser.error("--host or BASE_URL is required")
+
+    try:
+        scenario = Scenario.load(resolve_scenario_path(args.scenario))
+    except (OSError, ScenarioError, tomllib.TOMLDecodeError) as exc:
+        print(f"error: {args.scenario}: {exc}", file=sys.stderr)
+        return 1
+    overrides: dict[str, Any] = {
+        "arrival": replace(scenario.arrival, scale=args.rate_scale)
+    }
+    if args.duration is not None:
+        overrides["duration_seconds"] = args.duration
+    if args.seed is not None:
+        overrides["seed"] = args.seed
+    if args.mode is not None:
+        overrides["mode"] = args.mode
+    scenario = replace(scenario, **overrides)
+
+    print(
+        f"[load] scenario={scenario.name} mode={scenario.mode} "
+        f"model={scenario.arrival.model} "
+        f"peak={scenario.arrival.max_rate:g} sessions/s "
+        f"duration={scenario.duration_seconds:g}s host={args.host}",
+        file=sys.stderr,
+    )
+    report = asyncio.run(run_scenario(scenario, args.host))
+    print(report.summary())
+    if args.json:
+        args.json.write_text(json.dumps(report.to_dict(), indent=2) + "\n")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,121 @@
+from opentelemetry import trace
+from opentelemetry.context import Context
+from opentelemetry.sdk.metrics import MeterProvider, TraceBasedExemplarFilter
+from opentelemetry.sdk.metrics.export import InMemoryMetricReader
+from opentelemetry.sdk.metrics.view import ExponentialBucketHistogramAggregation, View
+from opentelemetry.sdk.trace import TracerProvider
+from opentelemetry.trace import NonRecordingSpan, SpanContext, TraceFlags
+
+from app.exemplars import BucketedExemplarReservoir, bucketed_reservoir_factory
+
+
+def _sampled_context(trace_id: int, span_id: int = 1) -> Context:
+    span = NonRecordingSpan(
+        SpanContext(
+            trace_id=trace_id,
+            span_id=span_id,
+            is_remote=False,
+            trace_flags=TraceFlags(TraceFlags.SAMPLED),
+        )
+    )
+    return trace.set_span_in_context(span)
+
+
+def test_reservoir_bounds_exemplars_per_bucket() -> None:
+    """同一 bucket に大量に入っても保持数は size_per_bucket 件で頭打ち。"""
+    reservoir = BucketedExemplarReservoir(size_per_bucket=2, boundaries=(10.0, 100.0))
+    for i in range(50):
+        reservoir.offer(5, i, {}, _sampled_context(i + 1))
+    reservoir.offer(10, 0, {}, _sampled_context(1000))
+    reservoir.offer(500, 0, {}, _sampled_context(2000))
+
+    exemplars = reservoir.collect({})
+    low = [e for e in exemplars if e.value <= 10]
+    assert len(low) == 2
+    assert {e.trace_id for e in exemplars if e.value > 100} == {2000}
+
+
+def test_reservoir_resets_on_collect() -> None:
+    """export interval ごとに reservoir を空にする。"""
+    reservoir = BucketedExemplarReservoir(size_per_bucket=1, boundaries=(10.0,))
+    reservoir.offer(1, 0, {}, _sampled_context(1))
+    assert len(reservoir.collect({})) == 1
+    assert reservoir.collect({}) == []
+
+
+def test_reservoir_ignores_measurements_without_span() -> None:
+    reservoir = BucketedExemplarReservoir(boundaries=(10.0,))
+    reservoir.offer(1, 0, {}, Context())
+    assert reservoir.collect({}) == []
+
+
+def test_reservoir_filters_point_attributes() -> None:
+    reservoir = BucketedExemplarReservoir(boundaries=())
+    reservoir.offer(1, 0, {"route": "/", "user": "a"}, _sampled_context(7, 9))
+    (exemplar,) = reservoir.collect({"route": "/"})
+    assert exemplar.filtered_attributes == {"user": "a"}
+    assert (exemplar.trace_id, exemplar.span_id) == (7, 9)
+
+
+def test_reservoir_accepts_exponential_histogram_size() -> None:
+    """exponential histogram が渡す size は無視して単一 bucket として動く。"""
+    reservoir = BucketedExemplarReservoir(size_per_bucket=2, size=4)
+    for i in range(10):
+        reservoir.offer(i, 0, {}, _sampled_context(i + 1))
+    assert len(reservoir.collect({})) == 2
+
+
+def test_exponential_histogram_view_builds_the_reservoir() -> None:
+    """base2 exponential histogram の View でも reservoir を構築できる。"""
+    reader = InMemoryMetricReader()
+    provider = MeterProvider(
+        metric_readers=[reader],
+        exemplar_filter=TraceBasedExemplarFilter(),
+        views=[
+            View(
+                instrument_name="http_request_duration_ms",
+                aggregation=ExponentialBucketHistogramAggregation(),
+                exemplar_reservoir_factory=bucketed_reservoir_factory(2),
+            )
+        ],
+    )
+    hist = provider.get_meter("test").create_histogram("http_request_duration_ms")
+    tracer = TracerProvider().get_tracer("test")
+
+    with tracer.start_as_current_span("GET /"):
+        for value in (1, 50, 5000):
+            hist.record(value)
+
+    data = reader.get_metrics_data()
+    assert data is not None
+    point = data.resource_metrics[0].scope_metrics[0].metrics[0].data.data_points[0]
+    assert len(point.exemplars) == 2
+    provider.shutdown()
+
+
+def test_histogram_exports_trace_ids_of_sampled_spans() -> None:
+    """View 経由で histogram data point に sampled span の trace ID が載る。"""
+    reader = InMemoryMetricReader()
+    provider = MeterProvider(
+        metric_readers=[reader],
+        exemplar_filter=TraceBasedExemplarFilter(),
+        views=[
+            View(
+                instrument_name="redis_connection_latency_ms",
+                exemplar_reservoir_factory=bucketed_reservoir_factory(2),
+            )
+        ],
+    )
+    hist = provider.get_meter("test").create_histogram("redis_connection_latency_ms")
+    tracer = TracerProvider().get_tracer("test")
+
+    with tracer.start_as_current_span("redis.ping") as span:
+        hist.record(42)
+        trace_id = span.get_span_context().trace_id
+    hist.record(43)  # span 外の測定値は exemplar にならない
+
+    data = reader.get_metrics_data()
+    assert data is not None
+    point = data.resource_metrics[0].scope_metrics[0].metrics[0].data.data_points[0]
+    assert [e.trace_id for e in point.exemplars] == [trace_id]
+    provider.shutdown()
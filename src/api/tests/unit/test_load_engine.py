@@ -0,0 +1,303 @@
+"""Tests for the scenario-driven load engine (tests/load/engine.py)."""
+
+import asyncio
+import math
+import random
+from collections import Counter
+from collections.abc import AsyncIterator
+
+import pytest
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+
+from tests.load.engine import (
+    ArrivalProfile,
+    EndpointStats,
+    HdrHistogram,
+    Scenario,
+    ScenarioError,
+    ThinkTime,
+    arrival_times,
+    bundled_scenarios,
+    resolve_scenario_path,
+    run_scenario,
+)
+
+
+def _scenario(**overrides: object) -> dict[str, object]:
+    data: dict[str, object] = {
+        "name": "test",
+        "duration_seconds": 0.5,
+        "seed": 7,
+        "arrival": {"model": "constant", "rate": 40.0, "process": "uniform"},
+        "endpoints": [
+            {"name": "root", "path": "/", "weight": 3},
+            {"name": "fail", "path": "/fail", "weight": 1},
+        ],
+    }
+    data.update(overrides)
+    return data
+
+
+def _percentile_ms(stats: EndpointStats, q: float, *, corrected: bool = True) -> float:
+    value = stats.percentile(q, corrected=corrected)
+    assert value is not None
+    return value
+
+
+def test_bundled_scenarios_load() -> None:
+    assert set(bundled_scenarios()) >= {"smoke", "baseline", "stress", "spike"}
+    for name in bundled_scenarios():
+        scenario = Scenario.load(resolve_scenario_path(name))
+        assert scenario.name == name
+        assert scenario.duration_seconds > 0
+
+
+@pytest.mark.parametrize(
+    ("arrival", "expected"),
+    [
+        ({"model": "constant", "rate": 5}, [5, 5, 5]),
+        (
+            {"model": "ramp", "start_rate": 0, "end_rate": 10, "ramp_seconds": 20},
+            [0, 5, 10],
+        ),
+        ({"model": "step", "steps": [[10, 1], [10, 2], [10, 3]]}, [1, 2, 3]),
+        (
+            {
+                "model": "spike",
+                "rate": 2,
+                "spike_rate": 50,
+                "spike_at_seconds": 5,
+                "spike_seconds": 10,
+            },
+            [2, 50, 2],
+        ),
+    ],
+)
+def test_arrival_rate_profiles(
+    arrival: dict[str, object], expected: list[float]
+) -> None:
+    profile = Scenario.from_dict(
+        _scenario(arrival=arrival, duration_seconds=30)
+    ).arrival
+    assert [profile.rate_at(t) for t in (0.0, 10.0, 25.0)] == expected
+
+
+def test_step_duration_defaults_to_the_sum_of_steps() -> None:
+    data = _scenario(arrival={"model": "step", "steps": [[10, 1], [20, 2]]})
+    del data["duration_seconds"]
+    assert Scenario.from_dict(data).duration_seconds == 30
+
+
+def test_poisson_arrivals_follow_the_rate_profile() -> None:
+    profile = ArrivalProfile(
+        model="step", steps=((50.0, 20.0), (50.0, 60.0)), process="poisson"
+    )
+    times = list(arrival_times(profile, 100.0, random.Random(1)))
+
+    first = sum(1 for t in times if t < 50)
+    assert times == sorted(times)
+    assert first == pytest.approx(1000, rel=0.1)
+    assert len(times) - first == pytest.approx(3000, rel=0.1)
+
+
+def test_uniform_arrivals_are_evenly_spaced_and_scaled() -> None:
+    profile = ArrivalProfile(model="constant", rate=4.0, process="uniform", scale=2.5)
+    times = list(arrival_times(profile, 0.95, random.Random()))
+    assert times == pytest.approx([index / 10 for index in range(10)])
+
+
+def test_think_time_distributions() -> None:
+    rng = random.Random(3)
+    assert ThinkTime().sample(rng) == 0.0
+    assert ThinkTime("constant", seconds=1.5).sample(rng) == 1.5
+    uniform = ThinkTime("uniform", min_seconds=1, max_seconds=2)
+    assert all(1 <= uniform.sample(rng) <= 2 for _ in range(100))
+    samples = [ThinkTime("exponential", seconds=2.0).sample(rng) for _ in range(5000)]
+    assert sum(samples) / len(samples) == pytest.approx(2.0, rel=0.1)
+
+
+@pytest.mark.parametrize(
+    "overrides",
+    [
+        {"arrival": {"model": "sine", "rate": 1}},
+        {"arrival": {"model": "constant", "rate": 0}},
+        {"arrival": {"model": "step"}},
+        {"endpoints": []},
+        {"endpoints": [{"name": "root", "path": "/", "weight": 0}]},
+        {"endpoints": [{"name": "root", "url": "/"}]},
+        {"session": {"think_time": {"distribution": "pareto"}}},
+        {"mode": "closed"},
+    ],
+)
+def test_invalid_scenarios_are_rejected(overrides: dict[str, object]) -> None:
+    with pytest.raises(ScenarioError):
+        Scenario.from_dict(_scenario(**overrides))
+
+
+@pytest.mark.parametrize("q", [0.0, 50.0, 90.0, 99.0, 99.9, 100.0])
+def test_hdr_histogram_percentiles_keep_three_significant_digits(q: float) -> None:
+    rng = random.Random(50)
+    values = [round(rng.lognormvariate(9.0, 1.5)) for _ in range(20000)]
+    histogram = HdrHistogram()
+    for value in values:
+        histogram.record(value)
+
+    ordered = sorted(values)
+    exact = ordered[max(0, math.ceil(q / 100 * len(ordered)) - 1)]
+    assert histogram.value_at_percentile(q) == pytest.approx(exact, rel=0.001)
+    assert histogram.total_count == len(values)
+
+
+def test_hdr_histogram_add_and_clamp() -> None:
+    first, second = HdrHistogram(highest=10_000), HdrHistogram(highest=10_000)
+    first.record(5)
+    second.record(7, count=3)
+    second.record(50_000)
+
+    first.add(second)
+
+    assert first.total_count == 5
+    assert first.value_at_percentile(20) == 5
+    assert first.value_at_percentile(80) == 7
+    assert first.value_at_percentile(100) == 10_000
+    assert HdrHistogram().value_at_percentile(50) is None
+    with pytest.raises(ValueError, match="layout"):
+        first.add(HdrHistogram())
+
+
+@pytest.fixture
+async def server() -> AsyncIterator[TestServer]:
+    stalled = False
+
+    async def ok(_request: web.Request) -> web.Response:
+        return web.Response(text="ok")
+
+    async def fail(_request: web.Request) -> web.Response:
+        return web.Response(status=503)
+
+    async def stall_once(_request: web.Request) -> web.Response:
+        nonlocal stalled
+        if not stalled:
+            stalled = True
+            await asyncio.sleep(0.5)
+        return web.Response(text="ok")
+
+    app = web.Application()
+    app.router.add_get("/", ok)
+    app.router.add_get("/fail", fail)
+    app.router.add_get("/stall", stall_once)
+    running = TestServer(app)
+    async with running:
+        yield running
+
+
+async def test_run_scenario_records_the_endpoint_mix(server: TestServer) -> None:
+    scenario = Scenario.from_dict(
+        _scenario(
+            session={
+                "requests": 2,
+                "think_time": {"distribution": "constant", "seconds": 0.01},
+            }
+        )
+    )
+
+    report = await run_scenario(scenario, str(server.make_url("/")))
+
+    assert report.sessions == 20
+    assert report.dropped == 0
+    assert report.requests == 40
+    assert report.mode == "session"
+    root, fail = report.endpoints["root"], report.endpoints["fail"]
+    assert root.requests + fail.requests == 40
+    assert root.requests > fail.requests > 0
+    assert root.statuses == Counter({"200": root.requests})
+    assert fail.errors == fail.requests
+    assert report.errors == fail.requests
+    assert set(report.to_dict()["endpoints"]["root"]) >= {
+        "p50_ms",
+        "p99_ms",
+        "p99.9_ms",
+        "service_p99_ms",
+    }
+    assert _percentile_ms(root, 99.9) >= _percentile_ms(root, 99.9, corrected=False)
+    assert "scenario=test" in report.summary()
+
+
+async def test_sessions_beyond_max_in_flight_are_dropped(server: TestServer) -> None:
+    scenario = Scenario.from_dict(
+        _scenario(
+            max_in_flight=1,
+            session={
+                "requests": 2,
+                "think_time": {"distribution": "constant", "seconds": 0.2},
+            },
+        )
+    )
+
+    report = await run_scenario(scenario, str(server.make_url("/")))
+
+    assert report.sessions == 20
+    assert 0 < report.dropped < 20
+    assert report.requests == 2 * (report.sessions - report.dropped)
+
+
+def _stalled_session(mode: str) -> Scenario:
+    # One session of ten requests due 10 ms apart; the first response stalls
+    # for 500 ms while the rest are served immediately.
+    return Scenario.from_dict(
+        _scenario(
+            mode=mode,
+            duration_seconds=0.05,
+            arrival={"model": "constant", "rate": 10.0, "process": "uniform"},
+            endpoints=[{"name": "stall", "path": "/stall"}],
+            session={
+                "requests": 10,
+                "think_time": {"distribution": "constant", "seconds": 0.01},
+            },
+        )
+    )
+
+
+async def test_open_loop_latency_includes_the_wait_behind_a_stall(
+    server: TestServer,
+) -> None:
+    report = await run_scenario(
+        _stalled_session("open-loop"), str(server.make_url("/"))
+    )
+
+    stats = report.endpoints["stall"]
+    assert stats.requests == 10
+    # Requests due during the stall are charged from their due time ...
+    assert _percentile_ms(stats, 50) >= 400
+    # ... while their service time alone hides it.
+    assert _percentile_ms(stats, 50, corrected=False) < 100
+    assert _percentile_ms(stats, 99.9, corrected=False) >= 500
+
+
+async def test_session_mode_schedules_after_each_response(server: TestServer) -> None:
+    report = await run_scenario(_stalled_session("session"), str(server.make_url("/")))
+
+    stats = report.endpoints["stall"]
+    assert stats.requests == 10
+    assert _percentile_ms(stats, 50) < 100
+    assert _percentile_ms(stats, 99.9) >= 500
+
+
+async def test_open_loop_never_drops_arrivals(server: TestServer) -> None:
+    scenario = Scenario.from_dict(
+        _scenario(
+            mode="open-loop",
+            max_in_flight=1,
+            session={
+                "requests": 2,
+                "think_time": {"distribution": "constant", "seconds": 0.2},
+            },
+        )
+    )
+
+    report = await run_scenario(scenario, str(server.make_url("/")))
+
+    assert report.sessions == 20
+    assert report.dropped == 0
+    assert report.requests == 40
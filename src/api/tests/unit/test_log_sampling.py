@@ -0,0 +1,89 @@
+import logging
+
+from app.log_sampling import OVERFLOW_KEY, LogRateLimitFilter
+
+
+class FakeClock:
+    def __init__(self) -> None:
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+class RecordingHandler(logging.Handler):
+    def __init__(self) -> None:
+        super().__init__()
+        self.records: list[logging.LogRecord] = []
+
+    def emit(self, record: logging.LogRecord) -> None:
+        self.records.append(record)
+
+
+def _record(msg: str, level: int = logging.ERROR, *args: object) -> logging.LogRecord:
+    return logging.LogRecord("app.main", level, __file__, 1, msg, args, None)
+
+
+def _handler(**kwargs: object) -> tuple[RecordingHandler, FakeClock]:
+    clock = FakeClock()
+    handler = RecordingHandler()
+    limiter = LogRateLimitFilter(clock=clock, **kwargs)  # ty: ignore[invalid-argument-type]
+    limiter.bind(handler)
+    handler.addFilter(limiter)
+    return handler, clock
+
+
+def test_repeated_records_collapse_into_summary() -> None:
+    """同一 template は burst 件だけ通し、残りは次 interval で summary になる。"""
+    handler, clock = _handler(burst=2, sample_every={logging.ERROR: 0})
+    for i in range(50):
+        handler.handle(_record("Redis operation failed: %s", logging.ERROR, i))
+    assert len(handler.records) == 2
+
+    clock.now = 11.0
+    handler.handle(_record("other"))
+
+    summary = [r for r in handler.records if hasattr(r, "suppressed_count")]
+    assert len(summary) == 1
+    assert summary[0].suppressed_count == 48
+    assert summary[0].levelno == logging.ERROR
+    assert "Redis operation failed" in summary[0].getMessage()
+
+
+def test_severity_sampling_keeps_every_nth_record() -> None:
+    handler, _clock = _handler(
+        burst=1, sample_every={logging.INFO: 0, logging.ERROR: 10}
+    )
+    for _ in range(31):
+        handler.handle(_record("err", logging.ERROR))
+        handler.handle(_record("info", logging.INFO))
+        handler.handle(_record("boom", logging.CRITICAL))
+
+    by_level = {
+        level: sum(1 for r in handler.records if r.levelno == level)
+        for level in (logging.INFO, logging.ERROR, logging.CRITICAL)
+    }
+    assert by_level == {logging.INFO: 1, logging.ERROR: 1 + 3, logging.CRITICAL: 31}
+
+
+def test_key_count_is_bounded_with_overflow() -> None:
+    handler, clock = _handler(burst=1, max_keys=2, sample_every={})
+    for i in range(10):
+        handler.handle(_record(f"unique message {i}"))
+    # 2 key + overflow key の先頭 1 件
+    assert len(handler.records) == 3
+
+    clock.now = 11.0
+    handler.filters[0].flush()  # ty: ignore[unresolved-attribute]
+    overflow = [r for r in handler.records if r.name == OVERFLOW_KEY]
+    assert overflow and overflow[0].suppressed_count == 7  # ty: ignore[unresolved-attribute]
+
+
+def test_flush_emits_pending_summary_without_new_record() -> None:
+    handler, _clock = _handler(burst=0, sample_every={})
+    limiter = handler.filters[0]
+    handler.handle(_record("x"))
+    handler.handle(_record("x"))
+    assert handler.records == []
+    limiter.flush()  # ty: ignore[unresolved-attribute]
+    assert [r.suppressed_count for r in handler.records] == [2]  # ty: ignore[unresolved-attribute]
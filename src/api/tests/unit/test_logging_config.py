@@ -0,0 +1,155 @@
+import json
+import logging
+import queue
+import threading
+import time
+from collections.abc import Iterator
+
+import pytest
+from opentelemetry.sdk.trace import TracerProvider
+
+from app.logging_config import (
+    ContextQueueHandler,
+    ContextQueueListener,
+    JsonFormatter,
+    configure_logging,
+    request_id_var,
+)
+
+
+def _record(msg: str = "hello %s", *args: object) -> logging.LogRecord:
+    return logging.LogRecord("app.main", logging.INFO, __file__, 1, msg, args, None)
+
+
+@pytest.fixture
+def isolated_root() -> Iterator[logging.Logger]:
+    """root logger の handler / level を test 後に元へ戻す。
+
+    pytest の log capture handler は call phase で root に付くため、
+    handler の除去は test 本体の先頭 (``_clear``) で行う。
+    """
+    root = logging.getLogger()
+    saved_handlers, saved_level = root.handlers[:], root.level
+    yield root
+    for handler in root.handlers:
+        if handler not in saved_handlers:
+            handler.close()
+    root.handlers = saved_handlers
+    root.setLevel(saved_level)
+
+
+def _clear(root: logging.Logger) -> None:
+    root.handlers = []
+
+
+def test_json_formatter_includes_trace_and_request_ids() -> None:
+    tracer = TracerProvider().get_tracer("test")
+    token = request_id_var.set("req-1")
+    try:
+        with tracer.start_as_current_span("span") as span:
+            line = JsonFormatter().format(_record("hello %s", "world"))
+            ctx = span.get_span_context()
+    finally:
+        request_id_var.reset(token)
+
+    payload = json.loads(line)
+    assert payload["message"] == "hello world"
+    assert payload["level"] == "INFO"
+    assert payload["logger"] == "app.main"
+    assert payload["request_id"] == "req-1"
+    assert payload["trace_id"] == format(ctx.trace_id, "032x")
+    assert payload["span_id"] == format(ctx.span_id, "016x")
+
+
+def test_json_formatter_omits_ids_outside_request() -> None:
+    payload = json.loads(JsonFormatter().format(_record("plain")))
+    assert "trace_id" not in payload
+    assert "request_id" not in payload
+
+
+def test_queue_handler_defers_formatting_and_captures_context() -> None:
+    """enqueue 時は format せず、context 由来の ID だけを record に付ける。"""
+    q: queue.Queue[logging.LogRecord | None] = queue.Queue()
+    handler = ContextQueueHandler(q)
+    token = request_id_var.set("req-2")
+    try:
+        handler.handle(_record("deferred %s", "value"))
+    finally:
+        request_id_var.reset(token)
+
+    record = q.get_nowait()
+    assert record is not None
+    assert not hasattr(record, "message")
+    assert record.args == ("value",)
+    assert record.request_id == "req-2"
+
+
+def test_queue_handler_drops_when_full() -> None:
+    handler = ContextQueueHandler(queue.Queue(maxsize=1))
+    handler.handle(_record())
+    handler.handle(_record())
+    assert handler.dropped == 1
+
+
+def test_configure_logging_queue_mode_writes_json_via_listener(
+    isolated_root: logging.Logger, capsys: pytest.CaptureFixture[str]
+) -> None:
+    _clear(isolated_root)
+    listener = configure_logging("INFO", log_format="json", use_queue=True)
+    assert listener is not None
+    assert isinstance(isolated_root.handlers[0], ContextQueueHandler)
+
+    logging.getLogger("app.test").info("queued %d", 42)
+    listener.stop()
+
+    line = capsys.readouterr().err.strip().splitlines()[-1]
+    assert json.loads(line)["message"] == "queued 42"
+
+    # stop 後は queue handler を外し、同期出力に戻る
+    assert not any(isinstance(h, ContextQueueHandler) for h in isolated_root.handlers)
+    logging.getLogger("app.test").info("after stop")
+    line = capsys.readouterr().err.strip().splitlines()[-1]
+    assert json.loads(line)["message"] == "after stop"
+
+
+def test_listener_stop_waits_for_room_and_reports_dropped_records(
+    isolated_root: logging.Logger,
+) -> None:
+    _clear(isolated_root)
+    release = threading.Event()
+    written: list[str] = []
+
+    class BlockingHandler(logging.Handler):
+        def emit(self, record: logging.LogRecord) -> None:
+            release.wait(5)
+            written.append(record.getMessage())
+
+    queue_handler = ContextQueueHandler(queue.Queue(maxsize=1))
+    isolated_root.addHandler(queue_handler)
+    listener = ContextQueueListener(queue_handler, BlockingHandler())
+    listener.start()
+    log = logging.getLogger("app.test")
+    log.warning("first")  # listener thread で emit 中に止まる
+    while not queue_handler.records.empty():
+        time.sleep(0.01)
+    log.warning("second")  # queue が満杯になる
+    log.warning("third")  # 破棄される
+
+    threading.Timer(0.1, release.set).start()
+    listener.stop()
+
+    assert written == [
+        "first",
+        "second",
+        "console log queue was full; dropped 1 records",
+    ]
+
+
+def test_configure_logging_default_keeps_text_format(
+    isolated_root: logging.Logger,
+) -> None:
+    _clear(isolated_root)
+    assert configure_logging("WARNING") is None
+    (handler,) = isolated_root.handlers
+    assert isinstance(handler, logging.StreamHandler)
+    assert isolated_root.level == logging.WARNING
@@ -1,6 +1,9 @@
+from unittest.mock import patch
+
 from fastapi.testclient import TestClient
 
 from app.main import _health_cache
+from app.red_metrics import UNMATCHED_ROUTE, RedAggregator
 
 
 def test_root_success(client: TestClient) -> None:
@@ -40,3 +43,21 @@ def test_readyz_schema(client: TestClient) -> None:
     assert "redis" in body
     assert isinstance(body["redis"].get("connected"), bool)
     assert isinstance(body["redis"].get("latency_ms"), int)
+
+
+def test_red_metrics_middleware_records_route_template(client: TestClient) -> None:
+    """RED aggregator は route template で集計し、probe endpoint を除外する。"""
+    aggregator = RedAggregator()
+    with patch("app.telemetry._red_aggregator", aggregator):
+        client.get("/")
+        client.get("/livez")
+        client.get("/does-not-exist")
+
+    by_key = {(s.route, s.status_class): s.requests for s in aggregator.snapshot()}
+    assert by_key == {("/", "2xx"): 1, (UNMATCHED_ROUTE, "4xx"): 1}
+
+
+def test_debug_profile_is_hidden_when_disabled(client: TestClient) -> None:
+    """PROFILING_ENABLED=false (既定) では profiler endpoint は 404。"""
+    r = client.get("/debug/profile", params={"seconds": 0.1})
+    assert r.status_code == 404
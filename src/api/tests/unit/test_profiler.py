@@ -0,0 +1,88 @@
+import asyncio
+import json
+import threading
+from pathlib import Path
+
+import pytest
+
+from app import profiler
+
+
+def _spin(stop: threading.Event) -> None:
+    while not stop.is_set():
+        sum(range(1000))
+
+
+@pytest.fixture
+def busy_thread():
+    stop = threading.Event()
+    thread = threading.Thread(target=_spin, args=(stop,), name="busy-worker")
+    thread.start()
+    yield thread
+    stop.set()
+    thread.join()
+
+
+def test_capture_collects_stacks_of_other_threads(busy_thread) -> None:
+    result = profiler.capture(0.1, interval_seconds=0.005)
+
+    assert result.samples > 0
+    busy = [stack for stack in result.stacks if stack[0] == "busy-worker"]
+    assert busy
+    assert any("_spin" in frame for stack in busy for frame in stack)
+    # capture を呼んだ thread 自身は含めない
+    assert all("capture" not in stack[-1] for stack in result.stacks)
+
+
+def test_collapsed_and_speedscope_output() -> None:
+    result = profiler.ProfileResult(
+        stacks={("main", "a", "b"): 3, ("main", "a"): 1},
+        samples=4,
+        duration_seconds=0.04,
+        interval_seconds=0.01,
+    )
+    assert result.to_collapsed() == "main;a;b 3\nmain;a 1\n"
+
+    doc = result.to_speedscope()
+    frames = [f["name"] for f in doc["shared"]["frames"]]  # ty: ignore[not-subscriptable]
+    profile = doc["profiles"][0]  # ty: ignore[not-subscriptable]
+    assert frames == ["main", "a", "b"]
+    assert profile["samples"] == [[0, 1, 2], [0, 1]]
+    assert profile["weights"] == [3, 1]
+    json.dumps(doc)
+
+
+def test_concurrent_capture_is_rejected() -> None:
+    assert profiler._capture_lock.acquire(blocking=False)
+    try:
+        with pytest.raises(profiler.ProfilerBusyError):
+            profiler.capture(0.01)
+    finally:
+        profiler._capture_lock.release()
+
+
+def test_write_profile_creates_file(tmp_path: Path) -> None:
+    result = profiler.ProfileResult({("main",): 1}, 1, 0.01, 0.01)
+    path = profiler.write_profile(result, str(tmp_path / "out"), "collapsed")
+    assert Path(path).read_text() == "main 1\n"
+
+
+def _written_profiles(directory: Path) -> list[Path]:
+    return list(directory.glob("profile-*.collapsed"))
+
+
+async def test_signal_handler_writes_profile(tmp_path: Path) -> None:
+    """SIGUSR1 で capture し、output_dir に collapsed stack を書き出す。"""
+    loop = asyncio.get_running_loop()
+    assert profiler.install_signal_handler(
+        loop, seconds=0.05, interval_seconds=0.01, output_dir=str(tmp_path)
+    )
+    try:
+        profiler.signal.raise_signal(profiler.PROFILE_SIGNAL)
+        for _ in range(100):
+            await asyncio.sleep(0.02)
+            if _written_profiles(tmp_path):
+                break
+    finally:
+        profiler.remove_signal_handler(loop)
+    assert _written_profiles(tmp_path)
@@ -0,0 +1,58 @@
+import pytest
+
+from app.red_metrics import (
+    OVERFLOW_ROUTE,
+    UNMATCHED_ROUTE,
+    FixedBucketHistogram,
+    RedAggregator,
+    status_class,
+)
+
+
+def test_status_class_maps_codes() -> None:
+    assert status_class(204) == "2xx"
+    assert status_class(404) == "4xx"
+    assert status_class(503) == "5xx"
+    assert status_class(999) == "5xx"
+
+
+def test_fixed_bucket_histogram_upper_bound_is_inclusive() -> None:
+    hist = FixedBucketHistogram((10.0, 100.0))
+    for value in (10, 11, 100, 1000):
+        hist.record(value)
+    assert hist.cumulative_counts() == [("10", 1), ("100", 3), ("+Inf", 4)]
+    assert hist.count == 4
+    assert hist.sum == 1121
+
+
+def test_red_aggregator_counts_requests_errors_and_duration() -> None:
+    agg = RedAggregator(boundaries=(50.0,))
+    agg.record("/items/{id}", 200, 10)
+    agg.record("/items/{id}", 200, 70)
+    agg.record("/items/{id}", 503, 5)
+    agg.record(None, 404, 1)
+
+    by_key = {(s.route, s.status_class): s for s in agg.snapshot()}
+    ok = by_key[("/items/{id}", "2xx")]
+    assert (ok.requests, ok.errors, ok.duration_sum_ms) == (2, 0, 80)
+    assert ok.duration_buckets == (("50", 1), ("+Inf", 2))
+    assert by_key[("/items/{id}", "5xx")].errors == 1
+    assert by_key[(UNMATCHED_ROUTE, "4xx")].requests == 1
+
+
+def test_red_aggregator_bounds_cardinality_with_overflow() -> None:
+    """series 上限を超えた route は overflow series に合算される。"""
+    agg = RedAggregator(max_series=8)
+    for i in range(20):
+        agg.record(f"/r{i}", 200, 1)
+        agg.record(f"/r{i}", 500, 1)
+
+    assert agg.series_count() <= 8
+    overflow = [s for s in agg.snapshot() if s.route == OVERFLOW_ROUTE]
+    assert sum(s.requests for s in overflow) == 40 - (8 - 5)
+    assert {s.status_class for s in overflow} == {"2xx", "5xx"}
+
+
+def test_red_aggregator_rejects_too_small_series_limit() -> None:
+    with pytest.raises(ValueError):
+        RedAggregator(max_series=5)
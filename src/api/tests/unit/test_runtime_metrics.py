@@ -0,0 +1,56 @@
+import asyncio
+import gc
+import time
+
+from app.runtime_metrics import MIN_INTERVAL_SECONDS, RuntimeSampler, read_rss_bytes
+
+
+def test_interval_is_clamped_to_minimum() -> None:
+    """sampling overhead の上限として interval は下限値に clamp される。"""
+    assert RuntimeSampler(0.001).interval_seconds == MIN_INTERVAL_SECONDS
+
+
+def test_lag_max_is_reset_after_read() -> None:
+    sampler = RuntimeSampler()
+    assert sampler.take_lag_max() is None
+    sampler.record_lag(0.01)
+    sampler.record_lag(0.2)
+    sampler.record_lag(-0.5)
+    assert sampler.take_lag_max() == 0.2
+    assert sampler.take_lag_max() is None
+
+
+async def test_sampler_detects_blocked_event_loop() -> None:
+    """loop を同期処理で塞ぐと lag と task 数が観測される。"""
+    sampler = RuntimeSampler(MIN_INTERVAL_SECONDS)
+    sampler.start()
+    try:
+        await asyncio.sleep(0)
+        time.sleep(0.15)  # noqa: ASYNC251 — event loop を意図的に block する
+        await asyncio.sleep(MIN_INTERVAL_SECONDS * 2)
+    finally:
+        await sampler.stop()
+
+    lag = sampler.take_lag_max()
+    assert lag is not None and lag >= 0.05
+    assert sampler.task_count is not None and sampler.task_count >= 1
+
+
+async def test_gc_pause_is_accumulated_while_started() -> None:
+    sampler = RuntimeSampler()
+    sampler.start()
+    try:
+        gc.collect(2)
+    finally:
+        await sampler.stop()
+    gc.collect(2)  # stop 後は hook されない
+
+    totals = {gen: (pause, count) for gen, pause, count in sampler.gc_totals()}
+    assert totals[2][1] == 1
+    assert totals[2][0] > 0
+    assert sampler.take_gc_pause_max() > 0
+    assert sampler.take_gc_pause_max() == 0
+
+
+def test_read_rss_bytes_is_positive() -> None:
+    assert read_rss_bytes() > 0
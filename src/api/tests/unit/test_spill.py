@@ -0,0 +1,357 @@
+import gzip
+import threading
+import time
+from pathlib import Path
+from typing import Any
+from unittest.mock import MagicMock
+
+import pytest
+from opentelemetry.sdk.metrics.export import MetricExportResult
+from opentelemetry.sdk.trace.export import SpanExportResult
+
+from app.spill import (
+    OtlpHttpReplaySender,
+    SpillBuffer,
+    SpillingBatchLogRecordProcessor,
+    SpillingBatchSpanProcessor,
+    SpillingLogExporter,
+    SpillingMetricExporter,
+    SpillingSpanExporter,
+    SpillReplayer,
+)
+
+SEGMENT = 256
+
+
+def _buffer(path: Path, *, max_bytes: int = SEGMENT * 4) -> SpillBuffer:
+    return SpillBuffer(path, max_bytes=max_bytes, segment_bytes=SEGMENT)
+
+
+def _drain(buffer: SpillBuffer) -> list[bytes]:
+    sent: list[bytes] = []
+
+    def send(payload: bytes) -> bool:
+        sent.append(payload)
+        return True
+
+    while buffer.replay(send):
+        pass
+    return sent
+
+
+def test_spill_buffer_replays_in_append_order_across_segments(tmp_path: Path) -> None:
+    """複数 segment にまたがる record も追記順に replay される。"""
+    buffer = _buffer(tmp_path)
+    payloads = [f"record-{i:02d}".encode() * 4 for i in range(12)]
+    for payload in payloads:
+        assert buffer.append(payload) is True
+
+    assert len(list(tmp_path.glob("*.seg"))) > 1
+    assert _drain(buffer) == payloads
+    assert buffer.pending() == 0
+    buffer.close()
+
+
+def test_spill_buffer_stops_replay_at_first_failure(tmp_path: Path) -> None:
+    """送信失敗で replay を止め、次回は同じ record から再開する。"""
+    buffer = _buffer(tmp_path)
+    for i in range(3):
+        buffer.append(f"r{i}".encode())
+
+    calls: list[bytes] = []
+
+    def flaky(payload: bytes) -> bool:
+        calls.append(payload)
+        return len(calls) == 1
+
+    assert buffer.replay(flaky) == 1
+    assert buffer.pending() == 2
+    assert _drain(buffer) == [b"r1", b"r2"]
+    buffer.close()
+
+
+def test_spill_buffer_evicts_oldest_segment_when_full(tmp_path: Path) -> None:
+    """合計サイズ上限を超えると最も古い segment から破棄する。"""
+    buffer = _buffer(tmp_path, max_bytes=SEGMENT * 2)
+    payloads = [bytes([i]) * 100 for i in range(6)]
+    for payload in payloads:
+        buffer.append(payload)
+
+    assert len(list(tmp_path.glob("*.seg"))) == 2
+    assert buffer.evicted_records == 2
+    assert _drain(buffer) == payloads[2:]
+    buffer.close()
+
+
+def test_spill_buffer_rejects_record_larger_than_segment(tmp_path: Path) -> None:
+    buffer = _buffer(tmp_path)
+    assert buffer.append(b"x" * SEGMENT) is False
+    assert buffer.dropped_records == 1
+    assert buffer.pending() == 0
+    buffer.close()
+
+
+def test_spill_buffer_recovers_pending_records_after_reopen(tmp_path: Path) -> None:
+    """container 再起動を想定し、既存 segment の未送信分から replay を再開する。"""
+    buffer = _buffer(tmp_path)
+    for i in range(4):
+        buffer.append(f"r{i}".encode())
+    buffer.replay(lambda _payload: True, max_records=1)
+    buffer.close()
+
+    reopened = _buffer(tmp_path)
+    assert _drain(reopened) == [b"r1", b"r2", b"r3"]
+    reopened.close()
+
+
+def test_spill_buffer_discards_corrupt_segment(tmp_path: Path) -> None:
+    (tmp_path / "000000000000.seg").write_bytes(b"garbage")
+    buffer = _buffer(tmp_path)
+    assert buffer.pending() == 0
+    assert not (tmp_path / "000000000000.seg").exists()
+    buffer.close()
+
+
+def test_spill_buffer_validates_sizes(tmp_path: Path) -> None:
+    with pytest.raises(ValueError):
+        SpillBuffer(tmp_path, max_bytes=SEGMENT, segment_bytes=8)
+    with pytest.raises(ValueError):
+        SpillBuffer(tmp_path, max_bytes=SEGMENT - 1, segment_bytes=SEGMENT)
+
+
+def test_spilling_span_exporter_spills_failed_batch_and_replays_on_success(
+    tmp_path: Path,
+) -> None:
+    """export 失敗 batch を spill し、次の成功時に replay thread を起こす。"""
+    inner = MagicMock()
+    inner.export.return_value = SpanExportResult.FAILURE
+    buffer = _buffer(tmp_path)
+    replayer = MagicMock()
+    exporter = SpillingSpanExporter(inner, buffer, replayer)
+
+    assert exporter.export([]) == SpanExportResult.FAILURE
+    assert buffer.pending() == 1
+    replayer.notify.assert_not_called()
+
+    inner.export.return_value = SpanExportResult.SUCCESS
+    assert exporter.export([]) == SpanExportResult.SUCCESS
+    replayer.notify.assert_called_once()
+    # exporter thread 自身は replay の送信を行わない
+    assert buffer.pending() == 1
+    buffer.close()
+
+
+def _blocking_inner(result: Any) -> tuple[MagicMock, threading.Event, threading.Event]:
+    """最初の export で止まる inner exporter (retry / backoff 中を模す)。"""
+    exporting, release = threading.Event(), threading.Event()
+    inner = MagicMock()
+
+    def export(batch: Any) -> Any:
+        exporting.set()
+        release.wait(5)
+        return result
+
+    inner.export.side_effect = export
+    return inner, exporting, release
+
+
+def test_spilling_span_processor_spills_instead_of_dropping_on_full_queue(
+    tmp_path: Path,
+) -> None:
+    """export が止まっている間に queue が満杯になった span は破棄せず spill する。"""
+    from opentelemetry.sdk.trace import TracerProvider
+
+    inner, exporting, release = _blocking_inner(SpanExportResult.SUCCESS)
+    buffer = SpillBuffer(tmp_path, max_bytes=1 << 16, segment_bytes=1 << 14)
+    processor = SpillingBatchSpanProcessor(
+        SpillingSpanExporter(inner, buffer, MagicMock()),
+        max_queue_size=2,
+        max_export_batch_size=2,
+        schedule_delay_millis=60_000,
+    )
+    provider = TracerProvider()
+    provider.add_span_processor(processor)
+    tracer = provider.get_tracer("test")
+
+    for name in ("s1", "s2"):
+        tracer.start_span(name).end()
+    assert exporting.wait(5)
+    for name in ("s3", "s4", "s5"):
+        tracer.start_span(name).end()
+    assert buffer.pending() == 1
+
+    release.set()
+    processor.shutdown()
+    exported = [
+        span.name for call in inner.export.call_args_list for span in call.args[0]
+    ]
+    assert exported == ["s1", "s2", "s3", "s4"]
+    buffer.close()
+
+
+def test_spilling_log_processor_spills_instead_of_dropping_on_full_queue(
+    tmp_path: Path,
+) -> None:
+    from opentelemetry.proto.collector.logs.v1.logs_service_pb2 import (
+        ExportLogsServiceRequest,
+    )
+    from opentelemetry.sdk._logs import LoggerProvider
+    from opentelemetry.sdk._logs.export import LogRecordExportResult
+
+    inner, exporting, release = _blocking_inner(LogRecordExportResult.SUCCESS)
+    buffer = SpillBuffer(tmp_path, max_bytes=1 << 16, segment_bytes=1 << 14)
+    processor = SpillingBatchLogRecordProcessor(
+        SpillingLogExporter(inner, buffer, MagicMock()),
+        max_queue_size=1,
+        max_export_batch_size=1,
+        schedule_delay_millis=60_000,
+    )
+    provider = LoggerProvider()
+    provider.add_log_record_processor(processor)
+    log = provider.get_logger("test")
+
+    log.emit(body="l1")
+    assert exporting.wait(5)
+    log.emit(body="l2")
+    log.emit(body="l3")
+
+    (payload,) = _drain(buffer)
+    request = ExportLogsServiceRequest.FromString(payload)
+    (record,) = request.resource_logs[0].scope_logs[0].log_records
+    assert record.body.string_value == "l3"
+
+    release.set()
+    processor.shutdown()
+    assert inner.export.call_count == 2
+    buffer.close()
+
+
+def test_spill_replayer_drains_buffer_in_background(tmp_path: Path) -> None:
+    buffer = _buffer(tmp_path)
+    for i in range(3):
+        buffer.append(f"r{i}".encode())
+    sent: list[bytes] = []
+    done = threading.Event()
+
+    def send(payload: bytes) -> bool:
+        sent.append(payload)
+        if len(sent) == 3:
+            done.set()
+        return True
+
+    replayer = SpillReplayer(buffer, send)
+    replayer.notify()
+    assert done.wait(5)
+    replayer.close()
+
+    assert sent == [b"r0", b"r1", b"r2"]
+    assert buffer.pending() == 0
+    buffer.close()
+
+
+def test_spill_buffer_replay_stops_at_deadline(tmp_path: Path) -> None:
+    buffer = _buffer(tmp_path)
+    for i in range(3):
+        buffer.append(f"r{i}".encode())
+
+    def slow(_payload: bytes) -> bool:
+        time.sleep(0.05)
+        return True
+
+    assert buffer.replay(slow, deadline=time.monotonic()) == 0
+    assert buffer.replay(slow, deadline=time.monotonic() + 0.01) == 1
+    assert buffer.pending() == 2
+    buffer.close()
+
+
+def test_spill_buffer_append_is_not_blocked_by_a_slow_send(tmp_path: Path) -> None:
+    """replay の送信中も lock を持たないため、append は待たされない。"""
+    buffer = _buffer(tmp_path)
+    buffer.append(b"r0")
+    appended: list[bool] = []
+
+    def send(_payload: bytes) -> bool:
+        writer = threading.Thread(target=lambda: appended.append(buffer.append(b"r1")))
+        writer.start()
+        writer.join(1)
+        return True
+
+    assert buffer.replay(send, max_records=1) == 1
+    assert appended == [True]
+    assert _drain(buffer) == [b"r1"]
+    buffer.close()
+
+
+def test_spilling_metric_exporter_keeps_inner_temporality(tmp_path: Path) -> None:
+    """PeriodicExportingMetricReader が参照する temporality を引き継ぐ。"""
+    from opentelemetry.exporter.otlp.proto.http.metric_exporter import (
+        OTLPMetricExporter,
+    )
+    from opentelemetry.sdk.metrics import Histogram
+    from opentelemetry.sdk.metrics.export import AggregationTemporality
+
+    inner = OTLPMetricExporter(
+        preferred_temporality={Histogram: AggregationTemporality.DELTA}
+    )
+    buffer = _buffer(tmp_path)
+    exporter = SpillingMetricExporter(inner, buffer, MagicMock())
+    assert exporter._preferred_temporality is not None
+    assert exporter._preferred_temporality[Histogram] == AggregationTemporality.DELTA
+    buffer.close()
+
+
+def test_spilling_metric_exporter_spills_failed_export(tmp_path: Path) -> None:
+    from opentelemetry.sdk.metrics.export import MetricsData
+
+    inner = MagicMock()
+    inner._preferred_temporality = {}
+    inner._preferred_aggregation = {}
+    inner.export.return_value = MetricExportResult.FAILURE
+    buffer = _buffer(tmp_path)
+    exporter = SpillingMetricExporter(inner, buffer, MagicMock())
+
+    exporter.export(MetricsData(resource_metrics=[]))
+    assert buffer.pending() == 1
+    buffer.close()
+
+
+def test_replay_sender_resolves_signal_endpoint_and_headers(
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    monkeypatch.setenv("OTEL_EXPORTER_OTLP_ENDPOINT", "http://collector:4318/")
+    monkeypatch.delenv("OTEL_EXPORTER_OTLP_LOGS_ENDPOINT", raising=False)
+    monkeypatch.setenv("OTEL_EXPORTER_OTLP_HEADERS", "x-tenant=chaos%20lab")
+    sender = OtlpHttpReplaySender("logs")
+    assert sender._endpoint == "http://collector:4318/v1/logs"
+    assert sender._headers["x-tenant"] == "chaos lab"
+    assert sender._headers["Content-Type"] == "application/x-protobuf"
+
+
+def test_replay_sender_uses_exporter_tls_compression_and_timeout(
+    monkeypatch: pytest.MonkeyPatch, tmp_path: Path
+) -> None:
+    """exporter と同じ OTEL_EXPORTER_OTLP_* の TLS / 圧縮 / timeout で送る。"""
+    ca_file = str(tmp_path / "ca.pem")
+    monkeypatch.setenv("OTEL_EXPORTER_OTLP_CERTIFICATE", ca_file)
+    monkeypatch.setenv("OTEL_EXPORTER_OTLP_TRACES_COMPRESSION", "gzip")
+    monkeypatch.setenv("OTEL_EXPORTER_OTLP_TIMEOUT", "3")
+    context = MagicMock()
+    create_context = MagicMock(return_value=context)
+    monkeypatch.setattr("app.spill.ssl.create_default_context", create_context)
+    calls: list[dict[str, Any]] = []
+
+    def urlopen(request: Any, **kwargs: Any) -> MagicMock:
+        calls.append({"request": request, **kwargs})
+        response = MagicMock()
+        response.__enter__.return_value.status = 200
+        return response
+
+    monkeypatch.setattr("app.spill.urllib.request.urlopen", urlopen)
+
+    assert OtlpHttpReplaySender("traces")(b"payload") is True
+    create_context.assert_called_once_with(cafile=ca_file)
+    (call,) = calls
+    assert call["context"] is context
+    assert call["timeout"] == 3.0
+    assert call["request"].get_header("Content-encoding") == "gzip"
+    assert gzip.decompress(call["request"].data) == b"payload"
@@ -1,4 +1,5 @@
 import logging
+from pathlib import Path
 from unittest.mock import MagicMock, patch
 
 import pytest
@@ -6,6 +7,7 @@ import pytest
 from app.telemetry import (
     ErrorAwareSampler,
     _active_requests_callback,
+    _BoundTelemetry,
     _Once,
     _redis_status_callback,
     decrement_active_requests,
@@ -155,31 +157,35 @@ def test_record_span_error_with_non_recording_span() -> None:
 
 
 def test_record_redis_metrics_no_meter() -> None:
-    """record_redis_metrics returns early when meter is None."""
+    """record_redis_metrics is a no-op before setup_telemetry binds instruments."""
     reset_telemetry()
-    with patch("app.telemetry._meter", None):
-        record_redis_metrics(connected=True, latency_ms=5)
+    record_redis_metrics(connected=True, latency_ms=5)
+    import app.telemetry as tm
+
+    assert tm._redis_connected_state == -1
 
 
 def test_record_redis_metrics_disabled() -> None:
     """record_redis_metrics returns early when custom_metrics_enabled is False."""
     reset_telemetry()
-    with patch("app.telemetry._meter", MagicMock()):
-        with patch("app.config.Settings") as mock_settings:
-            mock_settings.return_value.custom_metrics_enabled = False
-            record_redis_metrics(connected=True, latency_ms=5)
+    mock_hist = MagicMock()
+    with patch(
+        "app.telemetry._bound",
+        _BoundTelemetry(custom_metrics=False, redis_latency_record=mock_hist.record),
+    ):
+        record_redis_metrics(connected=True, latency_ms=5)
+    mock_hist.record.assert_not_called()
+
+
+def _bound_with(mock_hist: MagicMock) -> _BoundTelemetry:
+    return _BoundTelemetry(custom_metrics=True, redis_latency_record=mock_hist.record)
 
 
 def test_record_redis_metrics_success() -> None:
     """record_redis_metrics records latency on cached histogram and updates state."""
     reset_telemetry()
     mock_hist = MagicMock()
-    with (
-        patch("app.telemetry._meter", MagicMock()),
-        patch("app.telemetry._redis_latency_hist", mock_hist),
-        patch("app.config.Settings") as mock_settings,
-    ):
-        mock_settings.return_value.custom_metrics_enabled = True
+    with patch("app.telemetry._bound", _bound_with(mock_hist)):
         record_redis_metrics(connected=True, latency_ms=5)
     mock_hist.record.assert_called_once_with(5)
     # backing state は ObservableGauge callback 用
@@ -193,12 +199,7 @@ def test_record_redis_metrics_disconnected() -> None:
     """record_redis_metrics records 0 to backing state and skips histogram."""
     reset_telemetry()
     mock_hist = MagicMock()
-    with (
-        patch("app.telemetry._meter", MagicMock()),
-        patch("app.telemetry._redis_latency_hist", mock_hist),
-        patch("app.config.Settings") as mock_settings,
-    ):
-        mock_settings.return_value.custom_metrics_enabled = True
+    with patch("app.telemetry._bound", _bound_with(mock_hist)):
         record_redis_metrics(connected=False, latency_ms=-1)
     mock_hist.record.assert_not_called()
     import app.telemetry as tm
@@ -211,12 +212,7 @@ def test_record_redis_status_only_does_not_write_histogram() -> None:
     """record_redis_status_only updates backing state without touching histogram."""
     reset_telemetry()
     mock_hist = MagicMock()
-    with (
-        patch("app.telemetry._meter", MagicMock()),
-        patch("app.telemetry._redis_latency_hist", mock_hist),
-        patch("app.config.Settings") as mock_settings,
-    ):
-        mock_settings.return_value.custom_metrics_enabled = True
+    with patch("app.telemetry._bound", _bound_with(mock_hist)):
         record_redis_status_only(connected=True)
         record_redis_status_only(connected=False)
     mock_hist.record.assert_not_called()
@@ -229,11 +225,7 @@ def test_record_redis_status_only_does_not_write_histogram() -> None:
 def test_record_redis_status_only_disabled() -> None:
     """record_redis_status_only returns early when custom_metrics_enabled is False."""
     reset_telemetry()
-    with (
-        patch("app.telemetry._meter", MagicMock()),
-        patch("app.config.Settings") as mock_settings,
-    ):
-        mock_settings.return_value.custom_metrics_enabled = False
+    with patch("app.telemetry._bound", _BoundTelemetry(custom_metrics=False)):
         record_redis_status_only(connected=True)
     import app.telemetry as tm
 
@@ -242,6 +234,49 @@ def test_record_redis_status_only_disabled() -> None:
     reset_telemetry()
 
 
+def test_record_helpers_do_not_build_settings_per_call() -> None:
+    """hot path では Settings を構築しない (setup 時に束ねた値のみ参照)。"""
+    reset_telemetry()
+    with (
+        patch("app.telemetry._bound", _bound_with(MagicMock())),
+        patch("app.config.Settings") as mock_settings,
+    ):
+        record_redis_metrics(connected=True, latency_ms=1)
+        record_redis_status_only(connected=True)
+    mock_settings.assert_not_called()
+    reset_telemetry()
+
+
+def test_setup_telemetry_binds_hot_path_instruments() -> None:
+    """setup 完了時に custom metrics flag と latency histogram が束ねられる。"""
+    reset_telemetry()
+    env = {
+        "TELEMETRY_ENABLED": "true",
+        "OTEL_EXPORTER_OTLP_TRACES_ENDPOINT": "http://localhost:4318/v1/traces",
+    }
+    with (
+        patch.dict("os.environ", env, clear=False),
+        patch("app.telemetry.BatchSpanProcessor"),
+        patch("app.telemetry.OTLPSpanExporter"),
+        patch("app.telemetry.OTLPMetricExporter"),
+        patch("app.telemetry.PeriodicExportingMetricReader"),
+        patch("app.telemetry.FastAPIInstrumentor") as mock_fai,
+        patch("app.telemetry.RedisInstrumentor") as mock_ri,
+        patch("app.telemetry.LoggingInstrumentor") as mock_li,
+    ):
+        mock_fai.instrument_app = MagicMock()
+        mock_ri.return_value.instrument = MagicMock()
+        mock_li.return_value.instrument = MagicMock()
+        setup_telemetry(DummyApp())
+
+        import app.telemetry as tm
+
+        assert tm._bound.custom_metrics is True
+        assert tm._bound.redis_latency_record is not None
+    reset_telemetry()
+    assert tm._bound is tm._DISABLED
+
+
 def test_redis_status_callback_returns_empty_when_unknown() -> None:
     """ObservableGauge callback yields nothing while state is -1 (unknown)."""
     reset_telemetry()
@@ -252,11 +287,7 @@ def test_redis_status_callback_returns_empty_when_unknown() -> None:
 def test_redis_status_callback_returns_state_when_known() -> None:
     """ObservableGauge callback yields current state once recorded."""
     reset_telemetry()
-    with (
-        patch("app.telemetry._meter", MagicMock()),
-        patch("app.config.Settings") as mock_settings,
-    ):
-        mock_settings.return_value.custom_metrics_enabled = True
+    with patch("app.telemetry._bound", _BoundTelemetry(custom_metrics=True)):
         record_redis_status_only(connected=True)
     obs = _redis_status_callback(MagicMock())
     assert len(obs) == 1
@@ -502,7 +533,11 @@ def test_setup_telemetry_creates_logger_provider_with_logs_endpoint() -> None:
         assert not any(h is tm._log_handler for h in root_logger.handlers)
         # Handler level reflects LOG_LEVEL=INFO.
         assert tm._log_handler.level == logging.INFO
+        # Dedup / rate limit filter is attached to the OTLP handler by default.
+        assert tm._log_rate_limiter is not None
+        assert tm._log_rate_limiter in tm._log_handler.filters
     reset_telemetry()
+    assert tm._log_rate_limiter is None
 
 
 def test_setup_telemetry_creates_logger_provider_with_unified_endpoint() -> None:
@@ -763,3 +798,120 @@ def test_shutdown_telemetry_noop_when_not_initialized() -> None:
     reset_telemetry()
     # Should not raise and should not require any provider
     shutdown_telemetry()
+
+
+# --- Disk spill buffer -----------------------------------------------------
+
+
+def test_setup_telemetry_wraps_exporters_with_spill_buffer(tmp_path: Path) -> None:
+    """TELEMETRY_SPILL_ENABLED=true で span / metric exporter が spill wrapper になり、
+    span は queue 溢れも spill する processor に渡る。"""
+    from app.spill import SpillingMetricExporter, SpillingSpanExporter
+
+    reset_telemetry()
+    env = {
+        "TELEMETRY_ENABLED": "true",
+        "OTEL_EXPORTER_OTLP_TRACES_ENDPOINT": "http://localhost:4318/v1/traces",
+        "TELEMETRY_SPILL_ENABLED": "true",
+        "TELEMETRY_SPILL_DIR": str(tmp_path),
+    }
+    with (
+        patch.dict("os.environ", env, clear=False),
+        patch("app.telemetry.BatchSpanProcessor") as mock_bsp,
+        patch("app.telemetry.SpillingBatchSpanProcessor") as mock_sbsp,
+        patch("app.telemetry.OTLPSpanExporter"),
+        patch("app.telemetry.OTLPMetricExporter"),
+        patch("app.telemetry.PeriodicExportingMetricReader") as mock_reader,
+        patch("app.telemetry.FastAPIInstrumentor") as mock_fai,
+        patch("app.telemetry.RedisInstrumentor") as mock_ri,
+        patch("app.telemetry.LoggingInstrumentor") as mock_li,
+    ):
+        mock_fai.instrument_app = MagicMock()
+        mock_ri.return_value.instrument = MagicMock()
+        mock_li.return_value.instrument = MagicMock()
+        setup_telemetry(DummyApp())
+
+        mock_bsp.assert_not_called()
+        assert isinstance(mock_sbsp.call_args.args[0], SpillingSpanExporter)
+        assert isinstance(mock_reader.call_args.args[0], SpillingMetricExporter)
+        assert (tmp_path / "traces").is_dir()
+        assert (tmp_path / "metrics").is_dir()
+    import app.telemetry as tm
+
+    assert len(tm._spill_providers) == 2
+    reset_telemetry()
+    assert tm._spill_buffers == []
+    assert tm._spill_providers == []
+
+
+def test_shutdown_telemetry_closes_spill_buffers_after_providers() -> None:
+    """spill に書き込む provider を shutdown してから buffer を閉じる。"""
+    reset_telemetry()
+    import app.telemetry as tm
+
+    calls: list[str] = []
+    provider = MagicMock()
+    provider.shutdown.side_effect = lambda: calls.append("provider")
+    buffer = MagicMock()
+    buffer.close.side_effect = lambda: calls.append("buffer")
+    tm._spill_providers.append(provider)
+    tm._spill_buffers.append(buffer)
+
+    shutdown_telemetry()
+
+    assert calls == ["provider", "buffer"]
+    assert tm._spill_providers == []
+    assert tm._spill_buffers == []
+    reset_telemetry()
+
+
+def test_setup_telemetry_does_not_wrap_exporters_by_default() -> None:
+    """spill は opt-in。既定では OTLP exporter をそのまま使う。"""
+    reset_telemetry()
+    env = {
+        "TELEMETRY_ENABLED": "true",
+        "OTEL_EXPORTER_OTLP_TRACES_ENDPOINT": "http://localhost:4318/v1/traces",
+    }
+    with (
+        patch.dict("os.environ", env, clear=False),
+        patch("app.telemetry.BatchSpanProcessor") as mock_bsp,
+        patch("app.telemetry.OTLPSpanExporter") as mock_exp,
+        patch("app.telemetry.OTLPMetricExporter"),
+        patch("app.telemetry.PeriodicExportingMetricReader"),
+        patch("app.telemetry.FastAPIInstrumentor") as mock_fai,
+        patch("app.telemetry.RedisInstrumentor") as mock_ri,
+        patch("app.telemetry.LoggingInstrumentor") as mock_li,
+    ):
+        mock_fai.instrument_app = MagicMock()
+        mock_ri.return_value.instrument = MagicMock()
+        mock_li.return_value.instrument = MagicMock()
+        setup_telemetry(DummyApp())
+
+        assert mock_bsp.call_args.args[0] is mock_exp.return_value
+    reset_telemetry()
+
+
+def test_exemplar_config_uses_bounded_reservoir_views() -> None:
+    """既定では trace-based filter + latency histogram 用 View を構成する。"""
+    from opentelemetry.sdk.metrics import TraceBasedExemplarFilter
+
+    from app.config import Settings
+    from app.telemetry import _EXEMPLAR_HISTOGRAMS, _exemplar_config
+
+    with patch.dict("os.environ", {}, clear=False) as env:
+        env.pop("OTEL_METRICS_EXEMPLAR_FILTER", None)
+        config = _exemplar_config(Settings(telemetry_exemplars_per_bucket=3))
+
+    assert isinstance(config["exemplar_filter"], TraceBasedExemplarFilter)
+    assert [v._instrument_name for v in config["views"]] == list(_EXEMPLAR_HISTOGRAMS)
+
+
+def test_exemplar_config_disabled_with_zero() -> None:
+    from opentelemetry.sdk.metrics import AlwaysOffExemplarFilter
+
+    from app.config import Settings
+    from app.telemetry import _exemplar_config
+
+    config = _exemplar_config(Settings(telemetry_exemplars_per_bucket=0))
+    assert isinstance(config["exemplar_filter"], AlwaysOffExemplarFilter)
+    assert "views" not in config
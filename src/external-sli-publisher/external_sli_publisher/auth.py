@@ -0,0 +1,94 @@
+"""Process-wide credential, token and client cache.
+
+The Functions host keeps the Python worker alive between timer ticks, so the
+credential, the Azure Monitor token and the state store are created once per
+worker and reused. Tokens are refreshed only when they are close to expiry,
+which leaves steady-state invocations with no credential work at all.
+"""
+
+from __future__ import annotations
+
+import os
+import threading
+import time
+from collections.abc import Callable
+from typing import Any, TypeVar
+
+from azure.core.credentials import AccessToken, TokenCredential
+from azure.identity import DefaultAzureCredential, ManagedIdentityCredential
+
+T = TypeVar("T")
+
+# Refresh a cached token this long before `expires_on`, so a token never
+# expires between being handed out and the remote-write POST.
+TOKEN_REFRESH_MARGIN_SECONDS = 300
+
+
+def default_credential() -> TokenCredential:
+    # The Functions host exposes IDENTITY_ENDPOINT for its managed identity;
+    # using it directly skips DefaultAzureCredential's chain probing on cold
+    # starts. Elsewhere (local runs) fall back to the full chain.
+    if os.environ.get("IDENTITY_ENDPOINT"):
+        return ManagedIdentityCredential()
+    return DefaultAzureCredential()
+
+
+class CredentialCache:
+    def __init__(
+        self,
+        factory: Callable[[], TokenCredential] = default_credential,
+        *,
+        refresh_margin_seconds: float = TOKEN_REFRESH_MARGIN_SECONDS,
+        clock: Callable[[], float] = time.time,
+    ) -> None:
+        self._factory = factory
+        self._refresh_margin_seconds = refresh_margin_seconds
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._credential: TokenCredential | None = None
+        self._tokens: dict[str, AccessToken] = {}
+        self._clients: dict[tuple[str, str], Any] = {}
+        self.credentials_created = 0
+        self.tokens_fetched = 0
+
+    @property
+    def credential(self) -> TokenCredential:
+        with self._lock:
+            return self._credential_locked()
+
+    def _credential_locked(self) -> TokenCredential:
+        if self._credential is None:
+            self._credential = self._factory()
+            self.credentials_created += 1
+        return self._credential
+
+    def token(self, scope: str) -> str:
+        with self._lock:
+            cached = self._tokens.get(scope)
+            if (
+                cached is not None
+                and cached.expires_on - self._refresh_margin_seconds > self._clock()
+            ):
+                return cached.token
+            token = self._credential_locked().get_token(scope)
+            self._tokens[scope] = token
+            self.tokens_fetched += 1
+            return token.token
+
+    def client(self, kind: str, key: str, factory: Callable[[TokenCredential], T]) -> T:
+        """Return the cached client for `(kind, key)`, creating it once."""
+        with self._lock:
+            client = self._clients.get((kind, key))
+            if client is None:
+                client = factory(self._credential_locked())
+                self._clients[(kind, key)] = client
+            return client
+
+    def clear(self) -> None:
+        with self._lock:
+            self._credential = None
+            self._tokens.clear()
+            self._clients.clear()
+
+
+CREDENTIALS = CredentialCache()
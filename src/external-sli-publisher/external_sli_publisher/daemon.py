@@ -0,0 +1,218 @@
+"""Long-running publisher: probe at sub-window cadence, publish at window close.
+
+    python -m external_sli_publisher.daemon
+
+The Functions timer (`function_app.publish_external_sli`) probes once per
+tick. The daemon instead stays warm, runs a probe round every
+`EXTERNAL_SLI_DAEMON_PROBE_INTERVAL_SECONDS`, aggregates the results of the
+open window in memory and publishes them when the window closes, through the
+same `publish_windows` path and state store as `run_once`. The state format
+is unchanged, so the daemon and the timer can replace each other.
+
+Each window gets its own `PooledTransport`: probes within a window reuse
+connections, and every window still opens at least one new connection.
+Closed windows are published by background tasks, one at a time and in
+order, so the probe cadence does not stall while a publish is in flight.
+A stop signal interrupts the wait between rounds. Pending rounds and
+publishes finish before `run` returns, and the window that is still open is
+published early with the rounds it has, so a restart does not show up as a
+missed (all-bad) window. The rest of that window is left unprobed; the next
+publisher continues from the following window.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import contextlib
+import logging
+import os
+import signal
+from collections.abc import Awaitable, Callable
+from dataclasses import dataclass, field
+from datetime import UTC, datetime, timedelta
+
+from external_sli_publisher.auth import CREDENTIALS, CredentialCache
+from external_sli_publisher.publisher import (
+    AZURE_MONITOR_SCOPE,
+    ProbeResult,
+    ProbeTarget,
+    Settings,
+    Window,
+    cached_state_store,
+    env_int,
+    floor_datetime,
+    probe_endpoint,
+    publish_heartbeat_only,
+    publish_windows,
+    windows_to_publish,
+)
+from external_sli_publisher.transport import PooledTransport
+
+LOGGER = logging.getLogger(__name__)
+DEFAULT_PROBE_INTERVAL_SECONDS = 30
+
+
+async def wait_until_stopped(stop: asyncio.Event, seconds: float) -> None:
+    """Return after `seconds`, or as soon as `stop` is set."""
+    with contextlib.suppress(TimeoutError):
+        await asyncio.wait_for(stop.wait(), seconds)
+
+
+@dataclass
+class OpenWindow:
+    window: Window
+    transport: PooledTransport = field(default_factory=PooledTransport)
+    results: dict[ProbeTarget, list[ProbeResult]] = field(default_factory=dict)
+    rounds: set[asyncio.Task[None]] = field(default_factory=set)
+
+
+class PublisherDaemon:
+    def __init__(
+        self,
+        settings: Settings,
+        *,
+        probe_interval_seconds: int = DEFAULT_PROBE_INTERVAL_SECONDS,
+        credentials: CredentialCache = CREDENTIALS,
+        clock: Callable[[], datetime] = lambda: datetime.now(UTC),
+        wait: Callable[[asyncio.Event, float], Awaitable[None]] = wait_until_stopped,
+    ) -> None:
+        if not 0 < probe_interval_seconds < settings.window_seconds:
+            raise RuntimeError(
+                "EXTERNAL_SLI_DAEMON_PROBE_INTERVAL_SECONDS must be positive and "
+                "shorter than EXTERNAL_SLI_WINDOW_SECONDS"
+            )
+        self.settings = settings
+        self.interval = timedelta(seconds=probe_interval_seconds)
+        self.credentials = credentials
+        self.clock = clock
+        self.wait = wait
+        self.semaphore = asyncio.Semaphore(settings.probe_concurrency)
+        self.publish_lock = asyncio.Lock()
+        self.windows_published = 0
+
+    @property
+    def probes_per_window(self) -> int:
+        """Weight of one missed window, in bad probes."""
+        return max(
+            1, self.settings.window_seconds // int(self.interval.total_seconds())
+        )
+
+    def _open_window(self, now: datetime) -> OpenWindow:
+        start = floor_datetime(now, self.settings.window_seconds)
+        end = start + timedelta(seconds=self.settings.window_seconds)
+        return OpenWindow(
+            window=Window(start=start, end=end),
+            results={target: [] for target in self.settings.probe_targets},
+        )
+
+    async def run(self, stop: asyncio.Event) -> None:
+        current = self._open_window(self.clock())
+        next_probe = self.clock()
+        publishing: set[asyncio.Task[None]] = set()
+        while not stop.is_set():
+            now = self.clock()
+            if now >= current.window.end:
+                task = asyncio.create_task(self._close(current, now))
+                publishing.add(task)
+                task.add_done_callback(publishing.discard)
+                current = self._open_window(now)
+            if now >= next_probe:
+                task = asyncio.create_task(self._probe_round(current))
+                current.rounds.add(task)
+                while next_probe <= now:
+                    next_probe += self.interval
+            wake = min(next_probe, current.window.end)
+            await self.wait(stop, max(0.0, (wake - self.clock()).total_seconds()))
+        await asyncio.gather(*publishing, return_exceptions=True)
+        await self._close(current, self.clock())
+
+    async def _probe_round(self, current: OpenWindow) -> None:
+        async def probe(target: ProbeTarget) -> None:
+            async with self.semaphore:
+                result = await asyncio.to_thread(
+                    probe_endpoint,
+                    self.settings,
+                    target=target,
+                    urlopen=current.transport.urlopen,
+                )
+            current.results[target].append(result)
+
+        await asyncio.gather(*(probe(target) for target in current.results))
+
+    async def _close(self, current: OpenWindow, now: datetime) -> None:
+        # The lock is FIFO, so windows are published in the order they closed.
+        async with self.publish_lock:
+            # Rounds started inside the window belong to it even if they finish
+            # after the window end.
+            await asyncio.gather(*current.rounds, return_exceptions=True)
+            try:
+                await asyncio.to_thread(self._publish, current, now)
+            except Exception:
+                LOGGER.exception(
+                    "external SLI daemon failed to publish window ending %s",
+                    current.window.end.isoformat(),
+                )
+            finally:
+                current.transport.close()
+
+    def _publish(self, current: OpenWindow, sample_time: datetime) -> None:
+        store = cached_state_store(self.settings, self.credentials)
+        token = self.credentials.token(AZURE_MONITOR_SCOPE)
+        loaded = store.load()
+        windows = windows_to_publish(
+            last_published_end=loaded.state.last_published_end,
+            target=current.window,
+            settings=self.settings,
+        )
+        if not windows:
+            publish_heartbeat_only(store, loaded, token, self.settings, sample_time)
+            return
+        for target, results in current.results.items():
+            if not results:
+                # No scheduled round fell inside the window (started near its end
+                # or stopped right after it opened).
+                results.append(
+                    probe_endpoint(
+                        self.settings, target=target, urlopen=current.transport.urlopen
+                    )
+                )
+        if publish_windows(
+            store,
+            loaded,
+            token,
+            self.settings,
+            windows,
+            current.results,
+            sample_time,
+            missed_window_weight=self.probes_per_window,
+        ):
+            self.windows_published += 1
+
+    async def serve(self) -> None:
+        stop = asyncio.Event()
+        loop = asyncio.get_running_loop()
+        for signum in (signal.SIGINT, signal.SIGTERM):
+            loop.add_signal_handler(signum, stop.set)
+        LOGGER.info(
+            "external SLI daemon started interval=%ss window=%ss targets=%s",
+            int(self.interval.total_seconds()),
+            self.settings.window_seconds,
+            [target.name for target in self.settings.probe_targets],
+        )
+        await self.run(stop)
+
+
+def main() -> int:
+    logging.basicConfig(level=os.environ.get("LOG_LEVEL", "INFO").upper())
+    daemon = PublisherDaemon(
+        Settings.from_env(),
+        probe_interval_seconds=env_int(
+            "EXTERNAL_SLI_DAEMON_PROBE_INTERVAL_SECONDS", DEFAULT_PROBE_INTERVAL_SECONDS
+        ),
+    )
+    asyncio.run(daemon.serve())
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
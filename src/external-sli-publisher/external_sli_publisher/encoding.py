@@ -0,0 +1,454 @@
+"""Prometheus remote-write protobuf encoders (1.0 and 2.0).
+
+The payload is written in two passes: sizes are computed first (protobuf
+length prefixes need them anyway), then every field is written into one
+preallocated `bytearray` (or a reusable one from `PayloadBuffers`). Each
+label set is encoded once into a reusable block, and all samples of a series
+are written after it. Label sets passed as
+`SeriesLabels` (the publisher builds them once per `Settings`) also skip the
+per-sample `__name__` merge and sort.
+
+Wire layout (prometheus/prompb/remote.proto, types.proto):
+
+    WriteRequest { repeated TimeSeries timeseries = 1; }
+    TimeSeries   { repeated Label labels = 1; repeated Sample samples = 2; }
+    Label        { string name = 1; string value = 2; }
+    Sample       { double value = 1; int64 timestamp = 2; }
+
+Remote Write 2.0 (io.prometheus.write.v2.Request) interns every label name and
+value into one `symbols` table and refers to them by index:
+
+    Request    { repeated string symbols = 4; repeated TimeSeries timeseries = 5; }
+    TimeSeries { repeated uint32 labels_refs = 1 [packed];
+                 repeated Sample samples = 2; Metadata metadata = 5; }
+    Metadata   { MetricType type = 1; }
+
+Native histograms (`NativeHistogram` sample values) use the Histogram message
+shared by both versions, in `TimeSeries.histograms` (field 4 in 1.0, field 3
+in 2.0); see `external_sli_publisher.histogram`.
+"""
+
+from __future__ import annotations
+
+import struct
+from collections.abc import Callable, Iterable, Iterator, Mapping, Sequence
+from functools import lru_cache
+
+from external_sli_publisher.histogram import NativeHistogram
+
+# (metric name, labels, value, timestamp ms) — the publisher's sample shape.
+# A `NativeHistogram` value is sent as a native histogram sample.
+RemoteWriteSample = tuple[str, Mapping[str, str], float | NativeHistogram, int]
+# (value, timestamp ms)
+SamplePoint = tuple[float | NativeHistogram, int]
+LabelKey = tuple[tuple[str, str], ...]
+# Returns a buffer of at least the requested size to write a payload into.
+Allocate = Callable[[int], bytearray]
+
+_TAG_FIELD1_LEN = 0x0A  # field 1, wire type 2 (timeseries / labels / label name)
+_TAG_FIELD2_LEN = 0x12  # field 2, wire type 2 (samples / label value)
+_TAG_SAMPLE_VALUE = 0x09  # field 1, wire type 1 (double)
+_TAG_SAMPLE_TIMESTAMP = 0x10  # field 2, wire type 0 (varint)
+_TAG_V2_SYMBOL = 0x22  # Request.symbols, field 4, wire type 2
+_TAG_V2_TIMESERIES = 0x2A  # Request.timeseries, field 5, wire type 2
+_TAG_V2_METADATA = 0x2A  # TimeSeries.metadata, field 5, wire type 2
+_TAG_V1_HISTOGRAM = 0x22  # TimeSeries.histograms, field 4, wire type 2
+_TAG_V2_HISTOGRAM = 0x1A  # TimeSeries.histograms, field 3, wire type 2
+# Metadata { type = METRIC_TYPE_GAUGE (2) }: every publisher series is a gauge,
+# histograms included (METRIC_TYPE_GAUGEHISTOGRAM (4)): one value per publish.
+_V2_GAUGE_METADATA = bytes((_TAG_V2_METADATA, 2, 0x08, 2))
+_V2_GAUGE_HISTOGRAM_METADATA = bytes((_TAG_V2_METADATA, 2, 0x08, 4))
+_DOUBLE = struct.Struct("<d")
+
+REMOTE_WRITE_V1_HEADERS: Mapping[str, str] = {
+    "Content-Type": "application/x-protobuf",
+    "X-Prometheus-Remote-Write-Version": "0.1.0",
+}
+REMOTE_WRITE_V2_HEADERS: Mapping[str, str] = {
+    "Content-Type": "application/x-protobuf;proto=io.prometheus.write.v2.Request",
+    "X-Prometheus-Remote-Write-Version": "2.0.0",
+}
+
+
+class PayloadBuffers:
+    """Reusable buffers for the encoded and the compressed payload.
+
+    Buffers only grow, so steady-state publishes allocate nothing
+    payload-sized. A view returned by an `*_into` function is valid until
+    the next payload is written through the same instance: keep one per
+    thread.
+    """
+
+    def __init__(self) -> None:
+        self.raw = bytearray()
+        self.compressed = bytearray()
+
+    def raw_buffer(self, size: int) -> bytearray:
+        if len(self.raw) < size:
+            self.raw = _grown(self.raw, size)
+        return self.raw
+
+    def compressed_buffer(self, size: int) -> bytearray:
+        if len(self.compressed) < size:
+            self.compressed = _grown(self.compressed, size)
+        return self.compressed
+
+
+def _grown(buffer: bytearray, size: int) -> bytearray:
+    # A new bytearray instead of resizing: a view of the previous payload
+    # may still be alive, and an exported bytearray cannot be resized.
+    return bytearray(max(size, 2 * len(buffer)))
+
+
+def varint_size(value: int) -> int:
+    if value < 0:
+        return 10  # int64 negatives are sign-extended to 10 bytes
+    return max(1, (value.bit_length() + 6) // 7)
+
+
+def write_varint(buffer: bytearray, offset: int, value: int) -> int:
+    """Write `value` at `offset` and return the offset after it."""
+    if value < 0:
+        value += 1 << 64
+    while value > 0x7F:
+        buffer[offset] = (value & 0x7F) | 0x80
+        value >>= 7
+        offset += 1
+    buffer[offset] = value
+    return offset + 1
+
+
+def encode_varint(value: int) -> bytes:
+    buffer = bytearray(varint_size(value))
+    write_varint(buffer, 0, value)
+    return bytes(buffer)
+
+
+def zigzag(value: int) -> int:
+    """sint32 / sint64 ZigZag encoding."""
+    return (value << 1) ^ (value >> 63)
+
+
+def encode_native_histogram(histogram: NativeHistogram, timestamp_ms: int) -> bytes:
+    """Encode one Histogram message (prompb types.proto / io.prometheus.write.v2).
+
+    Histogram { uint64 count_int = 1; double sum = 3; sint32 schema = 4;
+                double zero_threshold = 5; uint64 zero_count_int = 6;
+                repeated BucketSpan positive_spans = 11;
+                repeated sint64 positive_deltas = 12 [packed];
+                ResetHint reset_hint = 14; int64 timestamp = 15; }
+    BucketSpan { sint32 offset = 1; uint32 length = 2; }
+
+    Histograms are a few dozen bytes, so this is not worth a size pass.
+    """
+    message = bytearray()
+    message.append(0x08)
+    message += encode_varint(histogram.count)
+    message.append(0x19)
+    message += _DOUBLE.pack(histogram.sum)
+    message.append(0x20)
+    message += encode_varint(zigzag(histogram.schema))
+    message.append(0x29)
+    message += _DOUBLE.pack(histogram.zero_threshold)
+    message.append(0x30)
+    message += encode_varint(histogram.zero_count)
+    for offset, length in histogram.positive_spans:
+        span = bytearray((0x08,))
+        span += encode_varint(zigzag(offset))
+        span.append(0x10)
+        span += encode_varint(length)
+        message.append(0x5A)
+        message += encode_varint(len(span))
+        message += span
+    if histogram.positive_deltas:
+        deltas = b"".join(
+            encode_varint(zigzag(delta)) for delta in histogram.positive_deltas
+        )
+        message.append(0x62)
+        message += encode_varint(len(deltas))
+        message += deltas
+    message.append(0x70)
+    message += encode_varint(histogram.reset_hint)
+    message.append(0x78)
+    message += encode_varint(timestamp_ms)
+    return bytes(message)
+
+
+def _plan_points(
+    points: Sequence[SamplePoint],
+) -> tuple[list[tuple[float, int]], list[bytes], int]:
+    """Split float samples from native histograms; return their encoded size."""
+    floats: list[tuple[float, int]] = []
+    histograms: list[bytes] = []
+    size = 0
+    for value, timestamp_ms in points:
+        if isinstance(value, NativeHistogram):
+            encoded = encode_native_histogram(value, timestamp_ms)
+            histograms.append(encoded)
+            size += 1 + varint_size(len(encoded)) + len(encoded)
+        else:
+            floats.append((value, timestamp_ms))
+            sample_size = _sample_size(timestamp_ms)
+            size += 1 + varint_size(sample_size) + sample_size
+    return floats, histograms, size
+
+
+def _write_histograms(
+    buffer: bytearray,
+    view: memoryview,
+    offset: int,
+    tag: int,
+    histograms: Sequence[bytes],
+) -> int:
+    for encoded in histograms:
+        buffer[offset] = tag
+        offset = write_varint(buffer, offset + 1, len(encoded))
+        end = offset + len(encoded)
+        view[offset:end] = encoded
+        offset = end
+    return offset
+
+
+def label_key(metric_name: str, labels: Mapping[str, str]) -> LabelKey:
+    """Sorted label pairs including `__name__` (remote write requires order)."""
+    return tuple(sorted({**labels, "__name__": metric_name}.items()))
+
+
+class SeriesKey(tuple[tuple[str, str], ...]):
+    """A `LabelKey` carrying its encoded label block (`encode_label_block`)."""
+
+    block: bytes
+
+    @classmethod
+    def of(cls, metric_name: str, labels: Mapping[str, str]) -> SeriesKey:
+        key = cls(label_key(metric_name, labels))
+        key.block = encode_label_block(key)
+        return key
+
+
+class SeriesLabels(Mapping[str, str]):
+    """Immutable label set that memoizes its `SeriesKey` per metric name."""
+
+    __slots__ = ("_labels", "_keys")
+
+    def __init__(self, labels: Mapping[str, str]) -> None:
+        self._labels = dict(labels)
+        self._keys: dict[str, SeriesKey] = {}
+
+    def __getitem__(self, name: str) -> str:
+        return self._labels[name]
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._labels)
+
+    def __len__(self) -> int:
+        return len(self._labels)
+
+    def __repr__(self) -> str:
+        return f"SeriesLabels({self._labels!r})"
+
+    def key(self, metric_name: str) -> SeriesKey:
+        key = self._keys.get(metric_name)
+        if key is None:
+            key = self._keys[metric_name] = SeriesKey.of(metric_name, self._labels)
+        return key
+
+
+@lru_cache(maxsize=1024)
+def encode_label_block(key: LabelKey) -> bytes:
+    """All `labels` fields of one TimeSeries, encoded once per label set.
+
+    Cached so a warm worker reuses blocks for the same series across runs.
+    """
+    block = bytearray()
+    for name, value in key:
+        name_bytes = name.encode("utf-8")
+        value_bytes = value.encode("utf-8")
+        label_size = (
+            1
+            + varint_size(len(name_bytes))
+            + len(name_bytes)
+            + 1
+            + varint_size(len(value_bytes))
+            + len(value_bytes)
+        )
+        block.append(_TAG_FIELD1_LEN)
+        block += encode_varint(label_size)
+        block.append(_TAG_FIELD1_LEN)
+        block += encode_varint(len(name_bytes))
+        block += name_bytes
+        block.append(_TAG_FIELD2_LEN)
+        block += encode_varint(len(value_bytes))
+        block += value_bytes
+    return bytes(block)
+
+
+def _sample_size(timestamp_ms: int) -> int:
+    # double tag + 8 bytes, timestamp tag + varint
+    return 1 + 8 + 1 + varint_size(timestamp_ms)
+
+
+def encode_series(
+    series: Iterable[tuple[LabelKey, Sequence[SamplePoint]]],
+) -> bytes:
+    """Encode `(label key, samples)` pairs into one WriteRequest payload."""
+    buffer, _ = _write_series(series, bytearray)
+    return bytes(buffer)
+
+
+def encode_series_into(
+    series: Iterable[tuple[LabelKey, Sequence[SamplePoint]]],
+    buffers: PayloadBuffers,
+) -> memoryview:
+    buffer, size = _write_series(series, buffers.raw_buffer)
+    return memoryview(buffer)[:size]
+
+
+def _write_series(
+    series: Iterable[tuple[LabelKey, Sequence[SamplePoint]]],
+    allocate: Allocate,
+) -> tuple[bytearray, int]:
+    plan: list[tuple[bytes, list[tuple[float, int]], list[bytes], int]] = []
+    total = 0
+    for key, points in series:
+        block = key.block if isinstance(key, SeriesKey) else encode_label_block(key)
+        floats, histograms, points_size = _plan_points(points)
+        series_size = len(block) + points_size
+        plan.append((block, floats, histograms, series_size))
+        total += 1 + varint_size(series_size) + series_size
+
+    buffer = allocate(total)
+    view = memoryview(buffer)
+    offset = 0
+    for block, floats, histograms, series_size in plan:
+        buffer[offset] = _TAG_FIELD1_LEN
+        offset = write_varint(buffer, offset + 1, series_size)
+        end = offset + len(block)
+        view[offset:end] = block
+        offset = end
+        for value, timestamp_ms in floats:
+            buffer[offset] = _TAG_FIELD2_LEN
+            offset = write_varint(buffer, offset + 1, _sample_size(timestamp_ms))
+            buffer[offset] = _TAG_SAMPLE_VALUE
+            _DOUBLE.pack_into(buffer, offset + 1, value)
+            buffer[offset + 9] = _TAG_SAMPLE_TIMESTAMP
+            offset = write_varint(buffer, offset + 10, timestamp_ms)
+        offset = _write_histograms(buffer, view, offset, _TAG_V1_HISTOGRAM, histograms)
+    view.release()
+    return buffer, total
+
+
+def group_samples(
+    samples: Iterable[RemoteWriteSample],
+) -> list[tuple[LabelKey, list[SamplePoint]]]:
+    """Group flat samples by series, keeping first-seen series order.
+
+    Samples of one series are sorted by timestamp as remote write requires.
+    """
+    grouped: dict[LabelKey, list[SamplePoint]] = {}
+    for metric_name, labels, value, timestamp_ms in samples:
+        key = (
+            labels.key(metric_name)
+            if isinstance(labels, SeriesLabels)
+            else label_key(metric_name, labels)
+        )
+        grouped.setdefault(key, []).append((value, timestamp_ms))
+    for points in grouped.values():
+        if len(points) > 1:
+            points.sort(key=lambda point: point[1])
+    return list(grouped.items())
+
+
+def encode_write_request(samples: Iterable[RemoteWriteSample]) -> bytes:
+    return encode_series(group_samples(samples))
+
+
+def encode_write_request_into(
+    samples: Iterable[RemoteWriteSample], buffers: PayloadBuffers
+) -> memoryview:
+    return encode_series_into(group_samples(samples), buffers)
+
+
+def encode_series_v2(
+    series: Iterable[tuple[LabelKey, Sequence[SamplePoint]]],
+) -> bytes:
+    """Encode `(label key, samples)` pairs as a Remote Write 2.0 Request."""
+    buffer, _ = _write_series_v2(series, bytearray)
+    return bytes(buffer)
+
+
+def encode_series_v2_into(
+    series: Iterable[tuple[LabelKey, Sequence[SamplePoint]]],
+    buffers: PayloadBuffers,
+) -> memoryview:
+    buffer, size = _write_series_v2(series, buffers.raw_buffer)
+    return memoryview(buffer)[:size]
+
+
+def _write_series_v2(
+    series: Iterable[tuple[LabelKey, Sequence[SamplePoint]]],
+    allocate: Allocate,
+) -> tuple[bytearray, int]:
+    symbols: dict[str, int] = {"": 0}  # symbols[0] must be the empty string
+    plan: list[tuple[bytes, list[tuple[float, int]], list[bytes], int]] = []
+    for key, points in series:
+        refs = bytearray()
+        for pair in key:
+            for symbol in pair:
+                ref = symbols.get(symbol)
+                if ref is None:
+                    ref = symbols[symbol] = len(symbols)
+                if ref < 0x80:
+                    refs.append(ref)
+                else:
+                    refs += encode_varint(ref)
+        floats, histograms, points_size = _plan_points(points)
+        series_size = 1 + varint_size(len(refs)) + len(refs) + points_size
+        series_size += len(_V2_GAUGE_METADATA)
+        plan.append((bytes(refs), floats, histograms, series_size))
+
+    encoded_symbols = [symbol.encode("utf-8") for symbol in symbols]
+    total = sum(
+        1 + varint_size(len(symbol)) + len(symbol) for symbol in encoded_symbols
+    )
+    total += sum(1 + varint_size(series_size) + series_size for *_, series_size in plan)
+
+    buffer = allocate(total)
+    view = memoryview(buffer)
+    offset = 0
+    for symbol in encoded_symbols:
+        buffer[offset] = _TAG_V2_SYMBOL
+        offset = write_varint(buffer, offset + 1, len(symbol))
+        view[offset : offset + len(symbol)] = symbol
+        offset += len(symbol)
+    for refs, floats, histograms, series_size in plan:
+        buffer[offset] = _TAG_V2_TIMESERIES
+        offset = write_varint(buffer, offset + 1, series_size)
+        buffer[offset] = _TAG_FIELD1_LEN
+        offset = write_varint(buffer, offset + 1, len(refs))
+        view[offset : offset + len(refs)] = refs
+        offset += len(refs)
+        for value, timestamp_ms in floats:
+            buffer[offset] = _TAG_FIELD2_LEN
+            offset = write_varint(buffer, offset + 1, _sample_size(timestamp_ms))
+            buffer[offset] = _TAG_SAMPLE_VALUE
+            _DOUBLE.pack_into(buffer, offset + 1, value)
+            buffer[offset + 9] = _TAG_SAMPLE_TIMESTAMP
+            offset = write_varint(buffer, offset + 10, timestamp_ms)
+        offset = _write_histograms(buffer, view, offset, _TAG_V2_HISTOGRAM, histograms)
+        metadata = _V2_GAUGE_HISTOGRAM_METADATA if histograms else _V2_GAUGE_METADATA
+        end = offset + len(metadata)
+        view[offset:end] = metadata
+        offset = end
+    view.release()
+    return buffer, total
+
+
+def encode_write_request_v2(samples: Iterable[RemoteWriteSample]) -> bytes:
+    return encode_series_v2(group_samples(samples))
+
+
+def encode_write_request_v2_into(
+    samples: Iterable[RemoteWriteSample], buffers: PayloadBuffers
+) -> memoryview:
+    return encode_series_v2_into(group_samples(samples), buffers)
@@ -0,0 +1,131 @@
+"""Latency histograms: classic `le` buckets and native exponential buckets.
+
+Native histograms (Prometheus "sparse" histograms) place an observation `v`
+in bucket `i` when `base**(i-1) < v <= base**i`, with `base = 2**(2**-schema)`.
+Only populated buckets are sent: consecutive bucket indexes form a span
+`(offset, length)` and counts are delta-encoded, so payload size follows the
+number of distinct latencies observed rather than the resolution.
+
+The publisher emits one histogram per publish (like its other per-window
+series), so native histograms carry the GAUGE reset hint.
+"""
+
+from __future__ import annotations
+
+import math
+from collections.abc import Iterable, Sequence
+from dataclasses import dataclass
+
+NATIVE_SCHEMA_MIN = -4
+NATIVE_SCHEMA_MAX = 8
+# Prometheus' default zero bucket width; a 0 ms probe lands in the zero bucket.
+DEFAULT_ZERO_THRESHOLD = 2.0**-128
+# prometheus Histogram.ResetHint
+RESET_HINT_GAUGE = 3
+
+
+@dataclass(frozen=True)
+class NativeHistogram:
+    count: int
+    sum: float
+    schema: int
+    zero_threshold: float
+    zero_count: int
+    # (offset, length): offset is relative to the end of the previous span,
+    # or the absolute index for the first span.
+    positive_spans: tuple[tuple[int, int], ...]
+    # First count absolute, then the difference to the previous bucket.
+    positive_deltas: tuple[int, ...]
+    reset_hint: int = RESET_HINT_GAUGE
+
+    def bucket_counts(self) -> dict[int, int]:
+        """Expand spans / deltas back to `{bucket index: count}`."""
+        counts: dict[int, int] = {}
+        index = 0
+        count = 0
+        deltas = iter(self.positive_deltas)
+        for span_number, (offset, length) in enumerate(self.positive_spans):
+            index = offset if span_number == 0 else index + offset
+            for _ in range(length):
+                count += next(deltas)
+                counts[index] = count
+                index += 1
+        return counts
+
+
+def native_bucket_index(value: float, schema: int) -> int:
+    """Index `i` of the bucket `(base**(i-1), base**i]` holding `value` > 0."""
+    frac, exp = math.frexp(value)  # value = frac * 2**exp, 0.5 <= frac < 1
+    if schema > 0:
+        # log2(value) = exp + log2(frac), with log2(frac) in [-1, 0).
+        index = math.ceil((exp + math.log2(frac)) * (1 << schema))
+        # Correct float rounding right at a bucket boundary.
+        if _upper_bound(index - 1, schema) >= value:
+            index -= 1
+        elif _upper_bound(index, schema) < value:
+            index += 1
+        return index
+    # Powers of two are exact: 2**(exp-1) when frac == 0.5.
+    key = exp - 1 if frac == 0.5 else exp
+    return (key + (1 << -schema) - 1) >> -schema
+
+
+def _upper_bound(index: int, schema: int) -> float:
+    return 2.0 ** (index / (1 << schema)) if schema > 0 else 2.0 ** (index << -schema)
+
+
+def native_histogram(
+    values: Iterable[float],
+    *,
+    schema: int,
+    zero_threshold: float = DEFAULT_ZERO_THRESHOLD,
+) -> NativeHistogram:
+    counts: dict[int, int] = {}
+    zero_count = 0
+    total = 0
+    value_sum = 0.0
+    for value in values:
+        total += 1
+        value_sum += value
+        if value <= zero_threshold:
+            zero_count += 1
+            continue
+        index = native_bucket_index(value, schema)
+        counts[index] = counts.get(index, 0) + 1
+
+    spans: list[tuple[int, int]] = []
+    deltas: list[int] = []
+    previous_index: int | None = None
+    previous_count = 0
+    for index in sorted(counts):
+        if previous_index is not None and index == previous_index + 1:
+            offset, length = spans[-1]
+            spans[-1] = (offset, length + 1)
+        else:
+            offset = index if previous_index is None else index - previous_index - 1
+            spans.append((offset, 1))
+        deltas.append(counts[index] - previous_count)
+        previous_index = index
+        previous_count = counts[index]
+    return NativeHistogram(
+        count=total,
+        sum=value_sum,
+        schema=schema,
+        zero_threshold=zero_threshold,
+        zero_count=zero_count,
+        positive_spans=tuple(spans),
+        positive_deltas=tuple(deltas),
+    )
+
+
+def classic_bucket_counts(
+    values: Iterable[float], bounds: Sequence[float]
+) -> list[int]:
+    """Cumulative counts per upper bound, plus a final `+Inf` count."""
+    counts = [0] * (len(bounds) + 1)
+    for value in values:
+        for position, bound in enumerate(bounds):
+            if value <= bound:
+                counts[position] += 1
+        counts[-1] += 1
+    return counts
@@ -0,0 +1,202 @@
+"""Durable outbox and retry for remote-write payloads.
+
+`run_once` persists the encoded, compressed payload in the publisher state
+before sending it. A payload that still fails after retries stays in the
+outbox and is re-sent by the next invocation, so windows whose probes
+succeeded are not later reported as missed. Entries whose oldest sample
+(a backfilled window can be older than the entry itself) is past the Azure
+Monitor Workspace OldData limit are dropped because the receiver would reject
+them anyway.
+"""
+
+from __future__ import annotations
+
+import base64
+import logging
+import random
+import time
+import urllib.error
+import uuid
+from collections.abc import Callable, Iterable
+from dataclasses import dataclass, replace
+from datetime import datetime, timedelta
+from typing import Any
+
+LOGGER = logging.getLogger(__name__)
+
+# Azure Monitor Workspace rejects samples older than 20 minutes (OldData).
+OUTBOX_MAX_AGE = timedelta(minutes=20)
+OUTBOX_MAX_ENTRIES = 30
+# HTTP statuses worth retrying; other 4xx responses are permanent failures.
+RETRYABLE_STATUSES = frozenset({408, 425, 429, 500, 502, 503, 504})
+
+
+@dataclass(frozen=True)
+class OutboxEntry:
+    entry_id: str
+    created_at: datetime
+    remote_write_version: str
+    payload: bytes
+    # Timestamp of the oldest sample in `payload`; what OldData is judged on.
+    oldest_sample_at: datetime
+    attempts: int = 0
+
+    @classmethod
+    def create(
+        cls,
+        payload: bytes,
+        remote_write_version: str,
+        created_at: datetime,
+        oldest_sample_at: datetime | None = None,
+    ) -> OutboxEntry:
+        return cls(
+            entry_id=uuid.uuid4().hex,
+            created_at=created_at,
+            remote_write_version=remote_write_version,
+            payload=payload,
+            oldest_sample_at=oldest_sample_at or created_at,
+        )
+
+    def to_json(self, format_datetime: Callable[[datetime], str]) -> dict[str, Any]:
+        return {
+            "id": self.entry_id,
+            "created_at": format_datetime(self.created_at),
+            "oldest_sample_at": format_datetime(self.oldest_sample_at),
+            "remote_write_version": self.remote_write_version,
+            "payload": base64.b64encode(self.payload).decode("ascii"),
+            "attempts": self.attempts,
+        }
+
+    @classmethod
+    def from_json(
+        cls,
+        value: dict[str, Any],
+        parse_datetime: Callable[[str], datetime],
+    ) -> OutboxEntry:
+        created_at = parse_datetime(value["created_at"])
+        oldest_sample_at = value.get("oldest_sample_at")
+        return cls(
+            entry_id=str(value["id"]),
+            created_at=created_at,
+            remote_write_version=str(value.get("remote_write_version", "1.0")),
+            payload=base64.b64decode(value["payload"]),
+            oldest_sample_at=(
+                parse_datetime(oldest_sample_at) if oldest_sample_at else created_at
+            ),
+            attempts=int(value.get("attempts", 0)),
+        )
+
+
+@dataclass(frozen=True)
+class RetryPolicy:
+    """Exponential backoff with full jitter: sleep U(0, min(cap, base * 2^n))."""
+
+    attempts: int = 3
+    base_delay_seconds: float = 0.5
+    max_delay_seconds: float = 5.0
+
+    def delay(self, retry: int, rng: random.Random) -> float:
+        ceiling = min(self.max_delay_seconds, self.base_delay_seconds * 2**retry)
+        return rng.uniform(0, ceiling)
+
+
+class PermanentSendError(Exception):
+    """The receiver rejected the payload; retrying will not help."""
+
+
+def is_retryable(exc: BaseException) -> bool:
+    if isinstance(exc, urllib.error.HTTPError):
+        return exc.code in RETRYABLE_STATUSES
+    return isinstance(exc, (urllib.error.URLError, TimeoutError, OSError))
+
+
+def send_with_retry(
+    send: Callable[[], None],
+    policy: RetryPolicy,
+    *,
+    sleep: Callable[[float], None] = time.sleep,
+    rng: random.Random | None = None,
+) -> None:
+    """Call `send` until it succeeds or `policy.attempts` are exhausted.
+
+    Raises the last error, or `PermanentSendError` for non-retryable
+    responses.
+    """
+    rng = rng or random.Random()  # noqa: S311 — jitter, not security
+    for attempt in range(policy.attempts):
+        try:
+            send()
+            return
+        except Exception as exc:
+            if not is_retryable(exc):
+                raise PermanentSendError(str(exc)) from exc
+            if attempt + 1 >= policy.attempts:
+                raise
+            delay = policy.delay(attempt, rng)
+            LOGGER.warning(
+                "remote write failed attempt=%s error=%s; retrying in %.2fs",
+                attempt + 1,
+                exc,
+                delay,
+            )
+            sleep(delay)
+
+
+def prune_outbox(entries: Iterable[OutboxEntry], now: datetime) -> list[OutboxEntry]:
+    """Drop entries whose oldest sample is past the OldData limit and keep at
+    most the newest N."""
+    kept: list[OutboxEntry] = []
+    for entry in entries:
+        if now - entry.oldest_sample_at > OUTBOX_MAX_AGE:
+            LOGGER.warning(
+                "dropping external SLI outbox entry id=%s created_at=%s oldest_sample_at=%s attempts=%s: older than OldData limit",
+                entry.entry_id,
+                entry.created_at.isoformat(),
+                entry.oldest_sample_at.isoformat(),
+                entry.attempts,
+            )
+            continue
+        kept.append(entry)
+    dropped = len(kept) - OUTBOX_MAX_ENTRIES
+    if dropped > 0:
+        LOGGER.warning("dropping %s oldest external SLI outbox entries", dropped)
+        kept = kept[dropped:]
+    return kept
+
+
+def drain_outbox(
+    entries: Iterable[OutboxEntry],
+    send: Callable[[OutboxEntry], None],
+    policy: RetryPolicy,
+    *,
+    sleep: Callable[[float], None] = time.sleep,
+    rng: random.Random | None = None,
+) -> list[OutboxEntry]:
+    """Send entries oldest first; return those still pending.
+
+    Stops at the first entry that exhausts its retries so payloads for the same
+    series are not delivered out of timestamp order; later entries wait for
+    the next invocation.
+    """
+    pending = list(entries)
+    while pending:
+        entry = pending[0]
+        try:
+            send_with_retry(lambda e=entry: send(e), policy, sleep=sleep, rng=rng)
+        except PermanentSendError as exc:
+            LOGGER.error(
+                "dropping external SLI outbox entry id=%s rejected by remote write: %s",
+                entry.entry_id,
+                exc,
+            )
+        except Exception as exc:  # noqa: BLE001
+            LOGGER.warning(
+                "external SLI outbox entry id=%s still pending after %s attempts: %s",
+                entry.entry_id,
+                entry.attempts + policy.attempts,
+                exc,
+            )
+            pending[0] = replace(entry, attempts=entry.attempts + policy.attempts)
+            return pending
+        pending.pop(0)
+    return pending
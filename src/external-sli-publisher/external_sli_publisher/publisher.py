@@ -2,34 +2,74 @@
 
 from __future__ import annotations
 
-import json
+import contextvars
 import logging
+import math
 import os
-import struct
+import threading
 import time
 import urllib.error
 import urllib.parse
 import urllib.request
-from collections.abc import Callable, Iterable
-from dataclasses import dataclass
+from collections.abc import Callable, Iterable, Mapping
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field, replace
 from datetime import UTC, datetime, timedelta
+from functools import cached_property
 from typing import Any
 
 import cramjam
-from azure.core.exceptions import ResourceNotFoundError
-from azure.identity import DefaultAzureCredential
-from azure.storage.blob import BlobClient
 from opentelemetry import trace
 from opentelemetry.instrumentation.utils import suppress_http_instrumentation
 from opentelemetry.propagate import inject
 from opentelemetry.trace import SpanKind, Status, StatusCode
 
+from external_sli_publisher.auth import CREDENTIALS, CredentialCache
+from external_sli_publisher.encoding import (
+    REMOTE_WRITE_V1_HEADERS,
+    REMOTE_WRITE_V2_HEADERS,
+    PayloadBuffers,
+    SeriesLabels,
+    encode_write_request_into,
+    encode_write_request_v2_into,
+)
+from external_sli_publisher.histogram import (
+    NATIVE_SCHEMA_MAX,
+    NATIVE_SCHEMA_MIN,
+    NativeHistogram,
+    classic_bucket_counts,
+    native_histogram,
+)
+from external_sli_publisher.outbox import (
+    OutboxEntry,
+    RetryPolicy,
+    drain_outbox,
+    prune_outbox,
+    send_with_retry,
+)
+from external_sli_publisher.sketch import DDSketch, merge_sketches
+from external_sli_publisher.state import (
+    PublisherState,
+    StateConflictError,
+    StateStore,
+    VersionedState,
+    WindowSketch,
+    format_state_datetime,
+    parse_state_datetime,
+    state_store_for,
+)
+from external_sli_publisher.transport import HTTP_TRANSPORT, PooledTransport
+
 LOGGER = logging.getLogger(__name__)
 AZURE_MONITOR_SCOPE = "https://monitor.azure.com/.default"
 TRACER = trace.get_tracer(__name__)
+# Per-thread `PayloadBuffers`: the daemon publishes from worker threads.
+_PAYLOAD_BUFFERS = threading.local()
 
 UrlOpen = Callable[..., Any]
 Clock = Callable[[], float]
+# (metric name, labels, value, timestamp ms); see encoding.RemoteWriteSample.
+MetricSample = tuple[str, Mapping[str, str], float | NativeHistogram, int]
 
 # Latency threshold buckets used to emit "good" samples per `le` boundary.
 # Each entry is `(label_string, seconds_float)`. The publisher emits one
@@ -46,9 +86,51 @@ LATENCY_BUCKETS: tuple[tuple[str, float], ...] = (
     ("5", 5.0),
 )
 MAX_BUCKET_SECONDS: float = max(seconds for _, seconds in LATENCY_BUCKETS)
+REMOTE_WRITE_VERSIONS = ("1.0", "2.0")
+# Azure Monitor Workspace rejects samples older than 20 minutes (OldData).
+OLD_DATA_MAX_AGE_SECONDS = 20 * 60
 LATENCY_GOOD_METRIC = "chaos_app_external_latency_good"
 LATENCY_TOTAL_METRIC = "chaos_app_external_latency_total"
 
+# Diagnostic per-phase latency of successful probes, published next to the SLI
+# series with a `phase` label. Connection phases (dns / connect / tls) are only
+# counted for probes that opened a new connection, so each phase has its own
+# total. These series are not SLI inputs: missed windows contribute nothing.
+PROBE_PHASES: tuple[str, ...] = ("dns", "connect", "tls", "ttfb", "body")
+PHASE_LATENCY_BUCKETS: tuple[tuple[str, float], ...] = (
+    ("0.01", 0.01),
+    ("0.025", 0.025),
+    ("0.05", 0.05),
+    *LATENCY_BUCKETS,
+)
+PHASE_LATENCY_GOOD_METRIC = "chaos_app_external_phase_latency_good"
+PHASE_LATENCY_TOTAL_METRIC = "chaos_app_external_phase_latency_total"
+
+# Optional latency histogram of successful probes, emitted next to the
+# `le`-bucket series. "classic" sends `_bucket` / `_sum` / `_count` with
+# configurable bounds; "native" sends one exponential (sparse) histogram
+# sample, so any SLO threshold can be evaluated at the schema's resolution.
+# Failed and missed probes are not observations: they count only in
+# `LATENCY_TOTAL_METRIC`, which stays the Latency SLI denominator.
+HISTOGRAM_MODES = ("buckets", "classic", "native")
+LATENCY_HISTOGRAM_METRIC = "chaos_app_external_latency_seconds"
+
+# Optional percentiles of successful probe latency over the last
+# `latency_sketch_windows` published windows. A DDSketch per window is kept in
+# the state blob (not raw samples) and merged at publish time, so quantiles
+# span windows and runs with 1% relative error.
+LATENCY_QUANTILES: tuple[str, ...] = ("0.5", "0.95", "0.99")
+LATENCY_QUANTILE_METRIC = "chaos_app_external_latency_quantile_seconds"
+LATENCY_SKETCH_COUNT_METRIC = "chaos_app_external_latency_sketch_count"
+
+
+@dataclass(frozen=True)
+class ProbeTarget:
+    """One probed endpoint; `name` becomes the Prometheus `test` label."""
+
+    name: str
+    url: str
+
 
 @dataclass(frozen=True)
 class Settings:
@@ -62,6 +144,24 @@ class Settings:
     probe_timeout_seconds: int
     max_catchup_windows: int
     not_before: datetime | None
+    probe_count: int = 1
+    probe_concurrency: int = 1
+    # Probed in addition to `probe_url` / `probe_name` (the primary target,
+    # which also labels the heartbeat).
+    extra_probe_targets: tuple[ProbeTarget, ...] = ()
+    remote_write_version: str = "1.0"
+    # Missed windows that ended within this many seconds are published as bad
+    # samples at their own window-end timestamp instead of being folded into
+    # the current sample. 0 folds every missed window. Must stay below
+    # OLD_DATA_MAX_AGE_SECONDS.
+    backfill_max_age_seconds: int = 0
+    remote_write_attempts: int = 3
+    histogram_mode: str = "buckets"
+    # Classic histogram upper bounds in seconds; empty uses LATENCY_BUCKETS.
+    histogram_buckets: tuple[float, ...] = ()
+    native_histogram_schema: int = 3
+    # 0 disables latency sketches and quantile series.
+    latency_sketch_windows: int = 0
 
     def __post_init__(self) -> None:
         if self.probe_timeout_seconds <= MAX_BUCKET_SECONDS:
@@ -70,6 +170,73 @@ class Settings:
                 f"largest latency bucket ({MAX_BUCKET_SECONDS:g}s) so successful "
                 "but slow probes can be observed in the top bucket"
             )
+        if self.remote_write_version not in REMOTE_WRITE_VERSIONS:
+            raise RuntimeError(
+                "EXTERNAL_SLI_REMOTE_WRITE_VERSION must be one of "
+                f"{', '.join(REMOTE_WRITE_VERSIONS)}"
+            )
+        if self.backfill_max_age_seconds >= OLD_DATA_MAX_AGE_SECONDS:
+            raise RuntimeError(
+                "EXTERNAL_SLI_BACKFILL_MAX_AGE_SECONDS must be less than "
+                f"{OLD_DATA_MAX_AGE_SECONDS} because Azure Monitor Workspace "
+                "rejects older samples as OldData"
+            )
+        if self.histogram_mode not in HISTOGRAM_MODES:
+            raise RuntimeError(
+                f"EXTERNAL_SLI_HISTOGRAM_MODE must be one of {', '.join(HISTOGRAM_MODES)}"
+            )
+        bounds = self.histogram_buckets
+        if any(bound <= 0 for bound in bounds) or list(bounds) != sorted(set(bounds)):
+            raise RuntimeError(
+                "EXTERNAL_SLI_HISTOGRAM_BUCKETS must be strictly increasing "
+                f"positive seconds: {bounds}"
+            )
+        if not NATIVE_SCHEMA_MIN <= self.native_histogram_schema <= NATIVE_SCHEMA_MAX:
+            raise RuntimeError(
+                "EXTERNAL_SLI_NATIVE_HISTOGRAM_SCHEMA must be between "
+                f"{NATIVE_SCHEMA_MIN} and {NATIVE_SCHEMA_MAX}"
+            )
+        if self.probe_count < 1 or self.probe_concurrency < 1:
+            raise RuntimeError(
+                "EXTERNAL_SLI_PROBE_COUNT and EXTERNAL_SLI_PROBE_CONCURRENCY must "
+                "be greater than zero"
+            )
+        names = [target.name for target in self.probe_targets]
+        if len(set(names)) != len(names):
+            raise RuntimeError(
+                f"external SLI probe target names must be unique: {names}"
+            )
+        if self.probe_rounds * self.probe_timeout_seconds >= self.window_seconds:
+            raise RuntimeError(
+                "EXTERNAL_SLI_PROBE_COUNT / EXTERNAL_SLI_PROBE_CONCURRENCY rounds "
+                "times EXTERNAL_SLI_PROBE_TIMEOUT_SECONDS must be shorter than "
+                "EXTERNAL_SLI_WINDOW_SECONDS so one invocation finishes within "
+                "its window"
+            )
+
+    @property
+    def primary_target(self) -> ProbeTarget:
+        return ProbeTarget(name=self.probe_name, url=self.probe_url)
+
+    @property
+    def probe_targets(self) -> tuple[ProbeTarget, ...]:
+        return (self.primary_target, *self.extra_probe_targets)
+
+    @property
+    def classic_histogram_buckets(self) -> tuple[float, ...]:
+        return self.histogram_buckets or tuple(
+            seconds for _, seconds in LATENCY_BUCKETS
+        )
+
+    @cached_property
+    def series_catalog(self) -> SeriesCatalog:
+        return SeriesCatalog.build(self)
+
+    @property
+    def probe_rounds(self) -> int:
+        """Worst-case sequential probe rounds when every probe times out."""
+        probes = self.probe_count * len(self.probe_targets)
+        return math.ceil(probes / self.probe_concurrency)
 
     @classmethod
     def from_env(cls) -> Settings:
@@ -84,6 +251,30 @@ class Settings:
             probe_timeout_seconds=env_int("EXTERNAL_SLI_PROBE_TIMEOUT_SECONDS", 10),
             max_catchup_windows=env_int("EXTERNAL_SLI_MAX_CATCHUP_WINDOWS", 12),
             not_before=optional_datetime("EXTERNAL_SLI_NOT_BEFORE_UTC"),
+            probe_count=env_int("EXTERNAL_SLI_PROBE_COUNT", 1),
+            probe_concurrency=env_int("EXTERNAL_SLI_PROBE_CONCURRENCY", 1),
+            extra_probe_targets=parse_probe_targets(
+                os.environ.get("EXTERNAL_SLI_PROBE_TARGETS", "")
+            ),
+            remote_write_version=os.environ.get(
+                "EXTERNAL_SLI_REMOTE_WRITE_VERSION", "1.0"
+            ).strip(),
+            backfill_max_age_seconds=env_int(
+                "EXTERNAL_SLI_BACKFILL_MAX_AGE_SECONDS", 0, minimum=0
+            ),
+            remote_write_attempts=env_int("EXTERNAL_SLI_REMOTE_WRITE_ATTEMPTS", 3),
+            histogram_mode=os.environ.get(
+                "EXTERNAL_SLI_HISTOGRAM_MODE", "buckets"
+            ).strip(),
+            histogram_buckets=parse_histogram_buckets(
+                os.environ.get("EXTERNAL_SLI_HISTOGRAM_BUCKETS", "")
+            ),
+            native_histogram_schema=env_int(
+                "EXTERNAL_SLI_NATIVE_HISTOGRAM_SCHEMA", 3, minimum=NATIVE_SCHEMA_MIN
+            ),
+            latency_sketch_windows=env_int(
+                "EXTERNAL_SLI_LATENCY_SKETCH_WINDOWS", 0, minimum=0
+            ),
         )
 
 
@@ -99,6 +290,8 @@ class ProbeResult:
     status_code: int | None
     duration_ms: int
     error: str | None = None
+    # Phase name -> duration ms; only set when the transport measured phases.
+    phases: dict[str, float] | None = None
 
 
 @dataclass(frozen=True)
@@ -112,12 +305,21 @@ class SliSamples:
     `metric_samples`. `latency_total` is the Latency SLI denominator
     (== availability_total). We intentionally do not emit an average latency
     because missed/failed windows would skew the mean.
+
+    `phase_buckets` / `phase_totals` hold the same cumulative counts per
+    probe phase (see `PROBE_PHASES`) and are empty when no phase was measured.
+
+    `latency_observations` keeps the duration in seconds of every successful
+    probe for the optional histogram modes (see `HISTOGRAM_MODES`).
     """
 
     availability_good: int
     availability_total: int
     latency_buckets: dict[str, int]
     latency_total: int
+    phase_buckets: dict[str, dict[str, int]] = field(default_factory=dict)
+    phase_totals: dict[str, int] = field(default_factory=dict)
+    latency_observations: tuple[float, ...] = ()
 
 
 def required_env(name: str) -> str:
@@ -127,7 +329,7 @@ def required_env(name: str) -> str:
     return value
 
 
-def env_int(name: str, default: int) -> int:
+def env_int(name: str, default: int, *, minimum: int = 1) -> int:
     value = os.environ.get(name)
     if value is None or value == "":
         return default
@@ -135,11 +337,40 @@ def env_int(name: str, default: int) -> int:
         parsed = int(value)
     except ValueError as exc:
         raise RuntimeError(f"{name} must be an integer") from exc
-    if parsed <= 0:
-        raise RuntimeError(f"{name} must be greater than zero")
+    if parsed < minimum:
+        if minimum == 1:
+            raise RuntimeError(f"{name} must be greater than zero")
+        raise RuntimeError(f"{name} must be at least {minimum}")
     return parsed
 
 
+def parse_probe_targets(value: str) -> tuple[ProbeTarget, ...]:
+    """Parse comma-separated `name=url` pairs (EXTERNAL_SLI_PROBE_TARGETS)."""
+    targets: list[ProbeTarget] = []
+    for entry in value.split(","):
+        entry = entry.strip()
+        if not entry:
+            continue
+        name, sep, url = entry.partition("=")
+        name, url = name.strip(), url.strip()
+        if not sep or not name or not url:
+            raise RuntimeError(
+                f"EXTERNAL_SLI_PROBE_TARGETS entries must be `name=url`, got {entry!r}"
+            )
+        targets.append(ProbeTarget(name=name, url=url))
+    return tuple(targets)
+
+
+def parse_histogram_buckets(value: str) -> tuple[float, ...]:
+    """Parse `0.05,0.1,0.2` (seconds) into histogram upper bounds."""
+    try:
+        return tuple(float(item) for item in value.split(",") if item.strip())
+    except ValueError as exc:
+        raise RuntimeError(
+            f"EXTERNAL_SLI_HISTOGRAM_BUCKETS must be comma-separated seconds: {value!r}"
+        ) from exc
+
+
 def optional_datetime(name: str) -> datetime | None:
     value = os.environ.get(name, "").strip()
     if not value:
@@ -196,10 +427,12 @@ def windows_to_publish(
 def probe_endpoint(
     settings: Settings,
     *,
+    target: ProbeTarget | None = None,
     urlopen: UrlOpen = urllib.request.urlopen,
     clock: Clock = time.perf_counter,
 ) -> ProbeResult:
-    parsed = urllib.parse.urlsplit(settings.probe_url)
+    probe_url = (target or settings.primary_target).url
+    parsed = urllib.parse.urlsplit(probe_url)
     path = parsed.path or "/"
     if parsed.query:
         path = f"{path}?{parsed.query}"
@@ -214,12 +447,12 @@ def probe_endpoint(
         headers = {"User-Agent": "aks-chaos-lab-external-sli-publisher"}
         inject(headers)
         request = urllib.request.Request(  # noqa: S310
-            settings.probe_url,
+            probe_url,
             headers=headers,
             method="GET",
         )
         span.set_attribute("http.request.method", "GET")
-        span.set_attribute("url.full", settings.probe_url)
+        span.set_attribute("url.full", probe_url)
         span.set_attribute("server.address", parsed.hostname or "")
         span.set_attribute("server.port", port)
         span.set_attribute("peer.service", settings.service_name)
@@ -233,6 +466,7 @@ def probe_endpoint(
             ):
                 response.read()
                 status_code = int(getattr(response, "status", response.getcode()))
+                request_phases = getattr(response, "phases", None)
         except urllib.error.HTTPError as exc:
             duration_ms = elapsed_ms(start, clock)
             span.set_attribute("http.response.status_code", exc.code)
@@ -240,7 +474,7 @@ def probe_endpoint(
             LOGGER.warning(
                 "external SLI probe returned HTTP error status=%s url=%s",
                 exc.code,
-                settings.probe_url,
+                probe_url,
             )
             return ProbeResult(
                 success=False,
@@ -255,7 +489,7 @@ def probe_endpoint(
             LOGGER.warning(
                 "external SLI probe failed error=%s url=%s",
                 exc,
-                settings.probe_url,
+                probe_url,
             )
             return ProbeResult(
                 success=False,
@@ -267,15 +501,75 @@ def probe_endpoint(
         duration_ms = elapsed_ms(start, clock)
         success = 200 <= status_code < 300
         span.set_attribute("http.response.status_code", status_code)
+        phases = None
+        if request_phases is not None:
+            phases = request_phases.as_dict()
+            span.set_attribute(
+                "probe.connection.reused", request_phases.connection_reused
+            )
+            for phase, phase_ms in phases.items():
+                span.set_attribute(f"probe.phase.{phase}_ms", round(phase_ms, 3))
         if not success:
             span.set_status(Status(StatusCode.ERROR, f"HTTP {status_code}"))
         return ProbeResult(
             success=success,
             status_code=status_code,
             duration_ms=duration_ms,
+            phases=phases,
         )
 
 
+def run_probes(
+    settings: Settings,
+    targets: Iterable[ProbeTarget],
+    *,
+    urlopen: UrlOpen = urllib.request.urlopen,
+    clock: Clock = time.perf_counter,
+) -> list[ProbeResult]:
+    """Probe each entry of `targets` with at most `probe_concurrency` in flight.
+
+    Each probe runs in a copy of the caller's context so its client span stays
+    a child of the Functions invocation span. Results keep submission order.
+    """
+    jobs = list(targets)
+    if len(jobs) == 1:
+        return [probe_endpoint(settings, target=jobs[0], urlopen=urlopen, clock=clock)]
+
+    def run_probe(target: ProbeTarget) -> ProbeResult:
+        return probe_endpoint(settings, target=target, urlopen=urlopen, clock=clock)
+
+    workers = max(1, min(len(jobs), settings.probe_concurrency))
+    with ThreadPoolExecutor(
+        max_workers=workers,
+        thread_name_prefix="external-sli-probe",
+    ) as executor:
+        futures = [
+            executor.submit(contextvars.copy_context().run, run_probe, target)
+            for target in jobs
+        ]
+        return [future.result() for future in futures]
+
+
+def probe_all_targets(
+    settings: Settings,
+    *,
+    urlopen: UrlOpen = urllib.request.urlopen,
+    clock: Clock = time.perf_counter,
+) -> dict[ProbeTarget, list[ProbeResult]]:
+    """Probe every target `probe_count` times through one shared pool."""
+    jobs = [
+        target for target in settings.probe_targets for _ in range(settings.probe_count)
+    ]
+    results: dict[ProbeTarget, list[ProbeResult]] = {
+        target: [] for target in settings.probe_targets
+    }
+    for target, result in zip(
+        jobs, run_probes(settings, jobs, urlopen=urlopen, clock=clock), strict=True
+    ):
+        results[target].append(result)
+    return results
+
+
 def elapsed_ms(start: float, clock: Clock) -> int:
     return max(0, int((clock() - start) * 1000))
 
@@ -290,16 +584,38 @@ def probe_result_to_sli_samples(
 ) -> SliSamples:
     availability_good = 1 if result.success else 0
     buckets = empty_latency_buckets()
+    phase_buckets: dict[str, dict[str, int]] = {}
+    phase_totals: dict[str, int] = {}
+    observations: tuple[float, ...] = ()
     if result.success:
         duration_seconds = result.duration_ms / 1000.0
+        observations = (duration_seconds,)
         for le_label, le_seconds in LATENCY_BUCKETS:
             if duration_seconds <= le_seconds:
                 buckets[le_label] = 1
+        for phase, phase_ms in (result.phases or {}).items():
+            phase_totals[phase] = 1
+            phase_buckets[phase] = {
+                le_label: 1 if phase_ms / 1000.0 <= le_seconds else 0
+                for le_label, le_seconds in PHASE_LATENCY_BUCKETS
+            }
     return SliSamples(
         availability_good=availability_good,
         availability_total=1,
         latency_buckets=buckets,
         latency_total=1,
+        phase_buckets=phase_buckets,
+        phase_totals=phase_totals,
+        latency_observations=observations,
+    )
+
+
+def probe_results_to_sli_samples(
+    results: Iterable[ProbeResult],
+    settings: Settings,
+) -> SliSamples:
+    return combine_sli_samples(
+        probe_result_to_sli_samples(result, settings) for result in results
     )
 
 
@@ -317,100 +633,108 @@ def combine_sli_samples(samples: Iterable[SliSamples]) -> SliSamples:
     availability_total = 0
     latency_total = 0
     latency_buckets = empty_latency_buckets()
+    phase_buckets: dict[str, dict[str, int]] = {}
+    phase_totals: dict[str, int] = {}
+    observations: list[float] = []
     for sample in samples:
+        observations += sample.latency_observations
         availability_good += sample.availability_good
         availability_total += sample.availability_total
         latency_total += sample.latency_total
         for le_label, value in sample.latency_buckets.items():
             latency_buckets[le_label] = latency_buckets.get(le_label, 0) + value
+        for phase, total in sample.phase_totals.items():
+            phase_totals[phase] = phase_totals.get(phase, 0) + total
+        for phase, counts in sample.phase_buckets.items():
+            merged = phase_buckets.setdefault(phase, {})
+            for le_label, value in counts.items():
+                merged[le_label] = merged.get(le_label, 0) + value
     return SliSamples(
         availability_good=availability_good,
         availability_total=availability_total,
         latency_buckets=latency_buckets,
         latency_total=latency_total,
+        phase_buckets=phase_buckets,
+        phase_totals=phase_totals,
+        latency_observations=tuple(observations),
     )
 
 
-def encode_varint(value: int) -> bytes:
-    chunks = bytearray()
-    while value > 0x7F:
-        chunks.append((value & 0x7F) | 0x80)
-        value >>= 7
-    chunks.append(value)
-    return bytes(chunks)
-
-
-def encode_key(field_number: int, wire_type: int) -> bytes:
-    return encode_varint((field_number << 3) | wire_type)
-
-
-def encode_length_delimited(field_number: int, payload: bytes) -> bytes:
-    return encode_key(field_number, 2) + encode_varint(len(payload)) + payload
-
-
-def encode_string(field_number: int, value: str) -> bytes:
-    return encode_length_delimited(field_number, value.encode("utf-8"))
-
-
-def encode_double(field_number: int, value: float) -> bytes:
-    return encode_key(field_number, 1) + struct.pack("<d", value)
-
-
-def encode_int64(field_number: int, value: int) -> bytes:
-    return encode_key(field_number, 0) + encode_varint(value)
-
-
-def encode_label(name: str, value: str) -> bytes:
-    return encode_string(1, name) + encode_string(2, value)
-
-
-def encode_sample(value: float, timestamp_ms: int) -> bytes:
-    return encode_double(1, value) + encode_int64(2, timestamp_ms)
-
-
-def encode_time_series(
-    metric_name: str,
-    labels: dict[str, str],
-    value: float,
-    timestamp_ms: int,
-) -> bytes:
-    payload = bytearray()
-    label_items = {"__name__": metric_name, **labels}
-    for name, label_value in sorted(label_items.items()):
-        payload += encode_length_delimited(1, encode_label(name, label_value))
-    payload += encode_length_delimited(2, encode_sample(value, timestamp_ms))
-    return bytes(payload)
-
+@dataclass(frozen=True)
+class SeriesCatalog:
+    """Label sets of every series emitted for one `Settings`, built once.
 
-def encode_write_request(
-    samples: Iterable[tuple[str, dict[str, str], float, int]],
-) -> bytes:
-    payload = bytearray()
-    for metric_name, labels, value, sample_timestamp_ms in samples:
-        payload += encode_length_delimited(
-            1,
-            encode_time_series(metric_name, labels, value, sample_timestamp_ms),
-        )
-    return bytes(payload)
+    Entries are `SeriesLabels` keyed by `(target name, extra label pairs)`;
+    each memoizes its sorted label key and encoded label block per metric, so
+    a warm worker only encodes values and timestamps. A label set outside the
+    catalog is built on demand and not cached.
+    """
 
+    base: Mapping[str, str]
+    entries: Mapping[tuple[str, tuple[tuple[str, str], ...]], SeriesLabels]
 
-def sli_labels(settings: Settings) -> dict[str, str]:
-    return {
-        "environment": settings.environment,
-        "service": settings.service_name,
-        "source": "external_probe",
-        "test": settings.probe_name,
-    }
+    @classmethod
+    def build(cls, settings: Settings) -> SeriesCatalog:
+        base = {
+            "environment": settings.environment,
+            "service": settings.service_name,
+            "source": "external_probe",
+        }
+        extras: list[tuple[tuple[str, str], ...]] = [()]
+        extras += [(("le", le_label),) for le_label, _ in LATENCY_BUCKETS]
+        for phase in PROBE_PHASES:
+            extras.append((("phase", phase),))
+            extras += [
+                (("phase", phase), ("le", le_label))
+                for le_label, _ in PHASE_LATENCY_BUCKETS
+            ]
+        if settings.histogram_mode == "classic":
+            extras += [
+                (("le", f"{bound:g}"),) for bound in settings.classic_histogram_buckets
+            ]
+            extras.append((("le", "+Inf"),))
+        if settings.latency_sketch_windows:
+            extras += [(("quantile", quantile),) for quantile in LATENCY_QUANTILES]
+        entries = {
+            (target.name, extra): _series_labels(base, target.name, extra)
+            for target in settings.probe_targets
+            for extra in extras
+        }
+        return cls(base=base, entries=entries)
+
+    def labels(self, target_name: str, *extra: tuple[str, str]) -> SeriesLabels:
+        labels = self.entries.get((target_name, extra))
+        if labels is None:
+            labels = _series_labels(self.base, target_name, extra)
+        return labels
+
+
+def _series_labels(
+    base: Mapping[str, str],
+    target_name: str,
+    extra: tuple[tuple[str, str], ...],
+) -> SeriesLabels:
+    return SeriesLabels({**base, "test": target_name, **dict(extra)})
+
+
+def sli_labels(
+    settings: Settings,
+    target: ProbeTarget | None = None,
+) -> SeriesLabels:
+    return settings.series_catalog.labels((target or settings.primary_target).name)
 
 
 def metric_samples(
     sli_samples: SliSamples,
     settings: Settings,
     sample_time: datetime,
-) -> list[tuple[str, dict[str, str], float, int]]:
-    labels = sli_labels(settings)
+    target: ProbeTarget | None = None,
+) -> list[MetricSample]:
+    catalog = settings.series_catalog
+    target_name = (target or settings.primary_target).name
+    labels = catalog.labels(target_name)
     sample_timestamp_ms = timestamp_ms(sample_time)
-    samples: list[tuple[str, dict[str, str], float, int]] = [
+    samples: list[MetricSample] = [
         (
             "chaos_app_external_availability_good",
             labels,
@@ -434,18 +758,204 @@ def metric_samples(
         samples.append(
             (
                 LATENCY_GOOD_METRIC,
-                {**labels, "le": le_label},
+                catalog.labels(target_name, ("le", le_label)),
                 float(sli_samples.latency_buckets.get(le_label, 0)),
                 sample_timestamp_ms,
             )
         )
+    if sli_samples.phase_totals:
+        # Once any phase was measured, emit every phase so series stay stable
+        # (e.g. tls reads 0 for plain-HTTP targets).
+        for phase in PROBE_PHASES:
+            samples.append(
+                (
+                    PHASE_LATENCY_TOTAL_METRIC,
+                    catalog.labels(target_name, ("phase", phase)),
+                    float(sli_samples.phase_totals.get(phase, 0)),
+                    sample_timestamp_ms,
+                )
+            )
+            counts = sli_samples.phase_buckets.get(phase, {})
+            for le_label, _ in PHASE_LATENCY_BUCKETS:
+                samples.append(
+                    (
+                        PHASE_LATENCY_GOOD_METRIC,
+                        catalog.labels(target_name, ("phase", phase), ("le", le_label)),
+                        float(counts.get(le_label, 0)),
+                        sample_timestamp_ms,
+                    )
+                )
+    samples += histogram_samples(sli_samples, settings, labels, sample_timestamp_ms)
+    return samples
+
+
+def histogram_samples(
+    sli_samples: SliSamples,
+    settings: Settings,
+    labels: SeriesLabels,
+    sample_timestamp_ms: int,
+) -> list[MetricSample]:
+    observations = sli_samples.latency_observations
+    if settings.histogram_mode == "native":
+        histogram = native_histogram(
+            observations, schema=settings.native_histogram_schema
+        )
+        return [(LATENCY_HISTOGRAM_METRIC, labels, histogram, sample_timestamp_ms)]
+    if settings.histogram_mode != "classic":
+        return []
+    bounds = settings.classic_histogram_buckets
+    counts = classic_bucket_counts(observations, bounds)
+    le_labels = [f"{bound:g}" for bound in bounds] + ["+Inf"]
+    samples: list[MetricSample] = [
+        (
+            f"{LATENCY_HISTOGRAM_METRIC}_bucket",
+            settings.series_catalog.labels(labels["test"], ("le", le_label)),
+            float(count),
+            sample_timestamp_ms,
+        )
+        for le_label, count in zip(le_labels, counts, strict=True)
+    ]
+    samples.append(
+        (
+            f"{LATENCY_HISTOGRAM_METRIC}_sum",
+            labels,
+            math.fsum(observations),
+            sample_timestamp_ms,
+        )
+    )
+    samples.append(
+        (
+            f"{LATENCY_HISTOGRAM_METRIC}_count",
+            labels,
+            float(len(observations)),
+            sample_timestamp_ms,
+        )
+    )
+    return samples
+
+
+def update_latency_sketches(
+    previous: Mapping[str, tuple[WindowSketch, ...]],
+    samples_by_target: Mapping[ProbeTarget, SliSamples],
+    window_end: datetime,
+    settings: Settings,
+) -> dict[str, tuple[WindowSketch, ...]]:
+    """Add this window's sketch per target and drop windows past the horizon.
+
+    Targets no longer configured are dropped with their sketches.
+    """
+    if settings.latency_sketch_windows <= 0:
+        return {}
+    horizon = window_end - timedelta(
+        seconds=settings.latency_sketch_windows * settings.window_seconds
+    )
+    updated: dict[str, tuple[WindowSketch, ...]] = {}
+    for target, samples in samples_by_target.items():
+        kept = [
+            (end, sketch)
+            for end, sketch in previous.get(target.name, ())
+            if horizon < end < window_end
+        ]
+        kept.append((window_end, DDSketch.of(samples.latency_observations)))
+        updated[target.name] = tuple(kept)
+    return updated
+
+
+def latency_quantile_samples(
+    windows: Iterable[WindowSketch],
+    settings: Settings,
+    sample_time: datetime,
+    target: ProbeTarget,
+) -> list[MetricSample]:
+    sketch = merge_sketches(sketch for _, sketch in windows)
+    labels = sli_labels(settings, target)
+    sample_timestamp_ms = timestamp_ms(sample_time)
+    samples: list[MetricSample] = [
+        (
+            LATENCY_SKETCH_COUNT_METRIC,
+            labels,
+            float(sketch.count),
+            sample_timestamp_ms,
+        )
+    ]
+    for quantile in LATENCY_QUANTILES:
+        value = sketch.quantile(float(quantile))
+        if value is not None:
+            samples.append(
+                (
+                    LATENCY_QUANTILE_METRIC,
+                    settings.series_catalog.labels(target.name, ("quantile", quantile)),
+                    value,
+                    sample_timestamp_ms,
+                )
+            )
     return samples
 
 
+def split_missed_windows(
+    windows: list[Window],
+    settings: Settings,
+    sample_time: datetime,
+) -> tuple[list[Window], int]:
+    """Return (missed windows to backfill, count of missed windows to fold).
+
+    The last window is the one probed now; every earlier one was missed.
+    """
+    missed = windows[:-1]
+    if settings.backfill_max_age_seconds <= 0:
+        return [], len(missed)
+    oldest = sample_time - timedelta(seconds=settings.backfill_max_age_seconds)
+    backfill = [window for window in missed if window.end >= oldest]
+    return backfill, len(missed) - len(backfill)
+
+
+def build_publish_samples(
+    settings: Settings,
+    windows: list[Window],
+    results_by_target: Mapping[ProbeTarget, list[ProbeResult]],
+    sample_time: datetime,
+    *,
+    missed_window_weight: int | None = None,
+) -> tuple[list[MetricSample], dict[ProbeTarget, SliSamples]]:
+    """Build the single remote-write payload for one run.
+
+    Returns the flat sample list (heartbeat first) and the current-sample
+    aggregate per target. Backfilled windows become extra samples of the same
+    series; their window-end timestamps are always newer than the previous
+    run's sample, so per-series timestamps stay in order on the receiver.
+
+    Each missed window counts as `missed_window_weight` bad probes
+    (default `settings.probe_count`, i.e. as much as a probed window).
+    """
+    weight = (
+        settings.probe_count if missed_window_weight is None else missed_window_weight
+    )
+    backfill, folded_count = split_missed_windows(windows, settings, sample_time)
+    samples = [heartbeat_sample(settings, sample_time)]
+    current_by_target: dict[ProbeTarget, SliSamples] = {}
+    for target, results in results_by_target.items():
+        current = combine_sli_samples(
+            [
+                missed_window_samples(folded_count * weight),
+                probe_results_to_sli_samples(results, settings),
+            ]
+        )
+        current_by_target[target] = current
+        samples += metric_samples(current, settings, sample_time, target)
+        for window in backfill:
+            samples += metric_samples(
+                missed_window_samples(weight),
+                settings,
+                window.end,
+                target,
+            )
+    return samples, current_by_target
+
+
 def heartbeat_sample(
     settings: Settings,
     sample_time: datetime,
-) -> tuple[str, dict[str, str], float, int]:
+) -> tuple[str, Mapping[str, str], float, int]:
     return (
         "chaos_app_external_sli_publisher_heartbeat",
         sli_labels(settings),
@@ -454,28 +964,86 @@ def heartbeat_sample(
     )
 
 
-def publish_remote_write_samples(
+def payload_buffers() -> PayloadBuffers:
+    """This thread's reusable encode / compress buffers."""
+    buffers = getattr(_PAYLOAD_BUFFERS, "buffers", None)
+    if buffers is None:
+        buffers = _PAYLOAD_BUFFERS.buffers = PayloadBuffers()
+    return buffers
+
+
+def encode_remote_write_view(
+    samples: Iterable[MetricSample],
+    settings: Settings,
+    buffers: PayloadBuffers | None = None,
+) -> memoryview:
+    """Encode and snappy-compress samples without copying the payload.
+
+    The view points into `buffers` (this thread's by default) and is only
+    valid until the next payload is encoded through them.
+    """
+    buffers = buffers or payload_buffers()
+    if settings.remote_write_version == "2.0":
+        raw = encode_write_request_v2_into(samples, buffers)
+    else:
+        raw = encode_write_request_into(samples, buffers)
+    with raw:
+        return compress_snappy_raw_into(raw, buffers)
+
+
+def encode_remote_write_payload(
+    samples: Iterable[MetricSample],
+    settings: Settings,
+) -> bytes:
+    """Encode and snappy-compress samples for `settings.remote_write_version`."""
+    with encode_remote_write_view(samples, settings) as view:
+        return bytes(view)
+
+
+def send_remote_write_payload(
     token: str,
-    samples: Iterable[tuple[str, dict[str, str], float, int]],
+    compressed: bytes | memoryview,
+    remote_write_version: str,
     settings: Settings,
+    *,
+    urlopen: UrlOpen = HTTP_TRANSPORT.urlopen,
 ) -> None:
-    payload = encode_write_request(samples)
-    compressed = compress_snappy_raw(payload)
+    protocol_headers = (
+        REMOTE_WRITE_V2_HEADERS
+        if remote_write_version == "2.0"
+        else REMOTE_WRITE_V1_HEADERS
+    )
     request = urllib.request.Request(  # noqa: S310
         settings.remote_write_url,
         data=compressed,
         headers={
             "Authorization": f"Bearer {token}",
             "Content-Encoding": "snappy",
-            "Content-Type": "application/x-protobuf",
-            "X-Prometheus-Remote-Write-Version": "0.1.0",
+            **protocol_headers,
         },
         method="POST",
     )
-    with urllib.request.urlopen(request, timeout=60) as response:  # noqa: S310
+    with urlopen(request, timeout=60) as response:
         response.read()
 
 
+def publish_remote_write_samples(
+    token: str,
+    samples: Iterable[MetricSample],
+    settings: Settings,
+    *,
+    urlopen: UrlOpen = HTTP_TRANSPORT.urlopen,
+) -> None:
+    with encode_remote_write_view(samples, settings) as compressed:
+        send_remote_write_payload(
+            token,
+            compressed,
+            settings.remote_write_version,
+            settings,
+            urlopen=urlopen,
+        )
+
+
 def publish_heartbeat(token: str, settings: Settings, sample_time: datetime) -> None:
     publish_remote_write_samples(
         token,
@@ -484,107 +1052,220 @@ def publish_heartbeat(token: str, settings: Settings, sample_time: datetime) ->
     )
 
 
-def publish_sli_samples(
+def compress_snappy_raw(payload: bytes) -> bytes:
+    snappy_codec = getattr(cramjam, "snappy")  # noqa: B009
+    return bytes(snappy_codec.compress_raw(payload))
+
+
+def compress_snappy_raw_into(
+    payload: bytes | memoryview, buffers: PayloadBuffers
+) -> memoryview:
+    snappy_codec = getattr(cramjam, "snappy")  # noqa: B009
+    output = buffers.compressed_buffer(snappy_codec.compress_raw_max_len(payload))
+    size = snappy_codec.compress_raw_into(payload, output)
+    return memoryview(output)[:size]
+
+
+def flush_outbox(
+    store: StateStore,
+    versioned: VersionedState,
     token: str,
-    samples: SliSamples,
     settings: Settings,
-    sample_time: datetime,
-) -> None:
-    publish_remote_write_samples(
-        token,
-        metric_samples(samples, settings, sample_time),
-        settings,
+    now: datetime,
+    *,
+    send: Callable[[OutboxEntry], None] | None = None,
+    sleep: Callable[[float], None] = time.sleep,
+) -> VersionedState:
+    """Send pending outbox entries oldest first and persist what remains."""
+    if send is None:
+
+        def send(entry: OutboxEntry) -> None:
+            send_remote_write_payload(
+                token, entry.payload, entry.remote_write_version, settings
+            )
+
+    state = versioned.state
+    policy = RetryPolicy(attempts=settings.remote_write_attempts)
+    pending = tuple(
+        drain_outbox(prune_outbox(state.outbox, now), send, policy, sleep=sleep)
     )
+    if pending != state.outbox:
+        state = replace(state, outbox=pending)
+        try:
+            versioned = VersionedState(state, store.save(state, versioned.etag))
+        except StateConflictError:
+            # Another invocation rewrote the state meanwhile and owns its
+            # outbox now; entries sent here may be sent once more by it.
+            LOGGER.warning(
+                "external SLI state changed while draining the outbox; leaving it to the newer invocation"
+            )
+            return versioned
+    if pending:
+        LOGGER.warning(
+            "external SLI outbox has %s pending payloads; they will be retried by the next invocation",
+            len(pending),
+        )
+    return versioned
 
 
-def publish_remote_write(
+def cached_state_store(settings: Settings, credentials: CredentialCache) -> StateStore:
+    # Cached per worker: warm invocations reuse the credential, token and
+    # state store, so they do no credential work.
+    return credentials.client(
+        "state",
+        settings.state_blob_url,
+        lambda credential: state_store_for(settings.state_blob_url, credential),
+    )
+
+
+def publish_heartbeat_only(
+    store: StateStore,
+    loaded: VersionedState,
     token: str,
-    samples: SliSamples,
     settings: Settings,
     sample_time: datetime,
 ) -> None:
-    publish_sli_samples(token, samples, settings, sample_time)
-
-
-def parse_state_datetime(value: str) -> datetime:
-    return datetime.fromisoformat(value.replace("Z", "+00:00")).astimezone(UTC)
-
+    LOGGER.info("no external SLI windows to publish")
+    if loaded.state.outbox:
+        flush_outbox(store, loaded, token, settings, sample_time)
+    send_with_retry(
+        lambda: publish_heartbeat(token, settings, sample_time),
+        RetryPolicy(attempts=settings.remote_write_attempts),
+    )
 
-def format_state_datetime(value: datetime) -> str:
-    return value.astimezone(UTC).isoformat().replace("+00:00", "Z")
 
+def publish_windows(
+    store: StateStore,
+    loaded: VersionedState,
+    token: str,
+    settings: Settings,
+    windows: list[Window],
+    results_by_target: Mapping[ProbeTarget, list[ProbeResult]],
+    sample_time: datetime,
+    *,
+    missed_window_weight: int | None = None,
+) -> bool:
+    """Publish `windows` (the last one probed) and advance the state.
 
-def load_last_published(blob: BlobClient) -> datetime | None:
+    Returns False when a concurrent publisher advanced the state first.
+    """
+    # Heartbeat and every target's series go into one remote-write payload.
+    payload_samples, samples_by_target = build_publish_samples(
+        settings,
+        windows,
+        results_by_target,
+        sample_time,
+        missed_window_weight=missed_window_weight,
+    )
+    last_window = windows[-1]
+    latency_sketches = update_latency_sketches(
+        loaded.state.latency_sketches, samples_by_target, last_window.end, settings
+    )
+    for target in samples_by_target:
+        if target.name in latency_sketches:
+            payload_samples += latency_quantile_samples(
+                latency_sketches[target.name], settings, sample_time, target
+            )
+    # The payload is persisted together with the advanced window before it is
+    # sent: a failed write is retried from the outbox instead of the windows
+    # being re-published (or later counted as missed).
+    entry = OutboxEntry.create(
+        encode_remote_write_payload(payload_samples, settings),
+        settings.remote_write_version,
+        sample_time,
+        # Backfilled windows make the payload older than `sample_time`.
+        datetime.fromtimestamp(
+            min(timestamp for *_, timestamp in payload_samples) / 1000, UTC
+        ),
+    )
+    state = PublisherState(
+        last_published_end=last_window.end,
+        outbox=(*prune_outbox(loaded.state.outbox, sample_time), entry),
+        latency_sketches=latency_sketches,
+    )
     try:
-        state = blob.download_blob().readall()
-    except ResourceNotFoundError:
-        return None
-    payload = json.loads(state.decode("utf-8") if isinstance(state, bytes) else state)
-    value = payload.get("last_published_window_end")
-    if not isinstance(value, str) or not value:
-        return None
-    return parse_state_datetime(value)
-
-
-def compress_snappy_raw(payload: bytes) -> bytes:
-    snappy_codec = getattr(cramjam, "snappy")  # noqa: B009
-    return bytes(snappy_codec.compress_raw(payload))
-
-
-def save_last_published(blob: BlobClient, window_end: datetime) -> None:
-    blob.upload_blob(
-        json.dumps({"last_published_window_end": format_state_datetime(window_end)}),
-        overwrite=True,
+        etag = store.save(state, loaded.etag)
+    except StateConflictError:
+        # An overlapping invocation (e.g. a past-due tick) already advanced
+        # the state from the same read; publishing here would double count.
+        LOGGER.warning(
+            "external SLI state changed since it was read; skipping windows %s..%s",
+            format_state_datetime(windows[0].start),
+            format_state_datetime(last_window.end),
+        )
+        return False
+    flush_outbox(store, VersionedState(state, etag), token, settings, sample_time)
+    backfilled, missed_window_count = split_missed_windows(
+        windows, settings, sample_time
     )
+    for target, results in results_by_target.items():
+        samples = samples_by_target[target]
+        LOGGER.info(
+            "published external SLI probe windows test=%s start=%s end=%s count=%s sample_time=%s missed=%s probes=%s failed=%s status=%s max_duration_ms=%s availability_good=%s/%s latency_total=%s buckets=%s",
+            target.name,
+            format_state_datetime(windows[0].start),
+            format_state_datetime(last_window.end),
+            len(windows),
+            format_state_datetime(sample_time),
+            missed_window_count,
+            len(results),
+            sum(1 for result in results if not result.success),
+            sorted({result.status_code or 0 for result in results}),
+            max(result.duration_ms for result in results),
+            samples.availability_good,
+            samples.availability_total,
+            samples.latency_total,
+            samples.latency_buckets,
+        )
+    if missed_window_count:
+        LOGGER.info(
+            "external SLI publisher folded %s missed windows into the current sample as bad; windows that ended more than backfill_max_age_seconds=%s ago are aggregated at publish time because Azure Monitor Workspace rejects OldData timestamps",
+            missed_window_count,
+            settings.backfill_max_age_seconds,
+        )
+    if backfilled:
+        LOGGER.info(
+            "external SLI publisher backfilled %s missed windows as bad samples at their window end",
+            len(backfilled),
+        )
+    return True
 
 
-def run_once(settings: Settings, now: datetime | None = None) -> int:
-    credential = DefaultAzureCredential()
-    blob = BlobClient.from_blob_url(settings.state_blob_url, credential=credential)
-    monitor_token = credential.get_token(AZURE_MONITOR_SCOPE).token
+def run_once(
+    settings: Settings,
+    now: datetime | None = None,
+    *,
+    credentials: CredentialCache = CREDENTIALS,
+) -> int:
+    store = cached_state_store(settings, credentials)
+    monitor_token = credentials.token(AZURE_MONITOR_SCOPE)
     sample_time = now or datetime.now(UTC)
-    target = target_window(sample_time, settings)
+    loaded = store.load()
     windows = windows_to_publish(
-        last_published_end=load_last_published(blob),
-        target=target,
+        last_published_end=loaded.state.last_published_end,
+        target=target_window(sample_time, settings),
         settings=settings,
     )
     if not windows:
-        LOGGER.info("no external SLI windows to publish")
-        publish_heartbeat(monitor_token, settings, sample_time)
+        publish_heartbeat_only(store, loaded, monitor_token, settings, sample_time)
         return 0
 
-    publish_heartbeat(monitor_token, settings, sample_time)
-    missed_window_count = max(0, len(windows) - 1)
-    current_result = probe_endpoint(settings)
-    samples = combine_sli_samples(
-        [
-            missed_window_samples(missed_window_count),
-            probe_result_to_sli_samples(current_result, settings),
-        ]
-    )
-    publish_remote_write(monitor_token, samples, settings, sample_time)
-    last_window = windows[-1]
-    save_last_published(blob, last_window.end)
-    LOGGER.info(
-        "published external SLI probe windows start=%s end=%s count=%s sample_time=%s missed=%s status=%s duration_ms=%s availability_good=%s/%s latency_total=%s buckets=%s",
-        format_state_datetime(windows[0].start),
-        format_state_datetime(last_window.end),
-        len(windows),
-        format_state_datetime(sample_time),
-        missed_window_count,
-        current_result.status_code,
-        current_result.duration_ms,
-        samples.availability_good,
-        samples.availability_total,
-        samples.latency_total,
-        samples.latency_buckets,
+    # Probes share keep-alive connections within this run only, so every run
+    # still exercises DNS / connect / TLS against the target at least once.
+    probe_transport = PooledTransport()
+    try:
+        results_by_target = probe_all_targets(settings, urlopen=probe_transport.urlopen)
+    finally:
+        probe_transport.close()
+    publish_windows(
+        store,
+        loaded,
+        monitor_token,
+        settings,
+        windows,
+        results_by_target,
+        sample_time,
     )
-    if missed_window_count:
-        LOGGER.info(
-            "external SLI publisher marked %s missed windows as bad; samples are aggregated at publish time because Azure Monitor Workspace rejects OldData timestamps",
-            missed_window_count,
-        )
     return 0
 
 
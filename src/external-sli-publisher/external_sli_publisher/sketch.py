@@ -0,0 +1,129 @@
+"""DDSketch: mergeable latency quantile sketch with bounded relative error.
+
+A value `v` is counted in bin `ceil(log_gamma(v))` with
+`gamma = (1 + alpha) / (1 - alpha)`; every value in a bin is within `alpha`
+relative error of the bin's representative `2 * gamma**i / (gamma + 1)`, so
+any quantile is returned within `alpha` of the true sample quantile.
+Sketches with the same `alpha` merge by adding bin counts, which is what lets
+the publisher keep one small sketch per window in the state blob and compute
+p50 / p95 / p99 over several windows and runs without raw samples.
+
+Reference: Masson, Rim, Lee, "DDSketch: A Fast and Fully-Mergeable Quantile
+Sketch with Relative-Error Guarantees" (VLDB 2019).
+"""
+
+from __future__ import annotations
+
+import math
+from collections.abc import Iterable
+from dataclasses import dataclass, field
+from typing import Any
+
+DEFAULT_RELATIVE_ACCURACY = 0.01
+# Values at or below this (e.g. a 0 ms probe) are counted in the zero bin.
+MIN_INDEXABLE_VALUE = 1e-9
+# Beyond this many bins the lowest ones are collapsed: accuracy is kept for
+# the upper quantiles that latency SLIs care about.
+DEFAULT_MAX_BINS = 2048
+
+
+@dataclass
+class DDSketch:
+    relative_accuracy: float = DEFAULT_RELATIVE_ACCURACY
+    max_bins: int = DEFAULT_MAX_BINS
+    bins: dict[int, int] = field(default_factory=dict)
+    zero_count: int = 0
+    count: int = 0
+
+    def __post_init__(self) -> None:
+        if not 0 < self.relative_accuracy < 1:
+            raise ValueError("relative_accuracy must be between 0 and 1")
+        self._gamma = (1 + self.relative_accuracy) / (1 - self.relative_accuracy)
+        self._log_gamma = math.log(self._gamma)
+
+    def key(self, value: float) -> int:
+        return math.ceil(math.log(value) / self._log_gamma)
+
+    def value(self, key: int) -> float:
+        return 2 * self._gamma**key / (self._gamma + 1)
+
+    def add(self, value: float, count: int = 1) -> None:
+        if value < 0:
+            raise ValueError("DDSketch only tracks non-negative latencies")
+        self.count += count
+        if value <= MIN_INDEXABLE_VALUE:
+            self.zero_count += count
+            return
+        key = self.key(value)
+        self.bins[key] = self.bins.get(key, 0) + count
+        self._collapse()
+
+    def merge(self, other: DDSketch) -> None:
+        if other.relative_accuracy != self.relative_accuracy:
+            raise ValueError("cannot merge sketches with different accuracy")
+        for key, count in other.bins.items():
+            self.bins[key] = self.bins.get(key, 0) + count
+        self.zero_count += other.zero_count
+        self.count += other.count
+        self._collapse()
+
+    def _collapse(self) -> None:
+        if len(self.bins) <= self.max_bins:
+            return
+        keys = sorted(self.bins)
+        excess = keys[: len(keys) - self.max_bins + 1]
+        self.bins[excess[-1]] += sum(self.bins.pop(key) for key in excess[:-1])
+
+    def quantile(self, q: float) -> float | None:
+        """Value at quantile `q` (0..1), or None for an empty sketch."""
+        if self.count == 0:
+            return None
+        rank = q * (self.count - 1)
+        if rank < self.zero_count:
+            return 0.0
+        seen = self.zero_count
+        for key in sorted(self.bins):
+            seen += self.bins[key]
+            if seen > rank:
+                return self.value(key)
+        return self.value(max(self.bins))
+
+    def to_json(self) -> dict[str, Any]:
+        return {
+            "alpha": self.relative_accuracy,
+            "zero": self.zero_count,
+            # JSON object keys must be strings.
+            "bins": {str(key): count for key, count in sorted(self.bins.items())},
+        }
+
+    @classmethod
+    def from_json(cls, value: dict[str, Any]) -> DDSketch:
+        bins = {int(key): int(count) for key, count in value.get("bins", {}).items()}
+        zero_count = int(value.get("zero", 0))
+        return cls(
+            relative_accuracy=float(value.get("alpha", DEFAULT_RELATIVE_ACCURACY)),
+            bins=bins,
+            zero_count=zero_count,
+            count=zero_count + sum(bins.values()),
+        )
+
+    @classmethod
+    def of(
+        cls,
+        values: Iterable[float],
+        relative_accuracy: float = DEFAULT_RELATIVE_ACCURACY,
+    ) -> DDSketch:
+        sketch = cls(relative_accuracy=relative_accuracy)
+        for value in values:
+            sketch.add(value)
+        return sketch
+
+
+def merge_sketches(
+    sketches: Iterable[DDSketch],
+    relative_accuracy: float = DEFAULT_RELATIVE_ACCURACY,
+) -> DDSketch:
+    merged = DDSketch(relative_accuracy=relative_accuracy)
+    for sketch in sketches:
+        merged.merge(sketch)
+    return merged
@@ -0,0 +1,216 @@
+"""Publisher state store with optimistic concurrency.
+
+The state document (`last_published_window_end` plus the remote-write
+outbox) is read together with its ETag and written back with If-Match, so a
+read-modify-write is one GET and one conditional PUT. When two invocations
+overlap (a past-due tick next to a new one), the second writer gets
+`StateConflictError` instead of silently overwriting the first, and must not
+publish the windows it computed from the stale read.
+
+`state_store_for` returns a `BlobStateStore` for https URLs and a
+`FileStateStore` for `file://` URLs, which is used for offline runs and
+tests.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import tempfile
+import urllib.parse
+import urllib.request
+from dataclasses import dataclass, field
+from datetime import UTC, datetime
+from pathlib import Path
+from typing import Any, Protocol
+
+from azure.core import MatchConditions
+from azure.core.exceptions import (
+    ResourceExistsError,
+    ResourceModifiedError,
+    ResourceNotFoundError,
+)
+from azure.storage.blob import BlobClient
+
+from external_sli_publisher.outbox import OutboxEntry
+from external_sli_publisher.sketch import DDSketch
+
+# (window end, latency sketch of that window)
+WindowSketch = tuple[datetime, DDSketch]
+
+
+class StateConflictError(RuntimeError):
+    """The state changed since it was loaded (ETag / If-Match mismatch)."""
+
+
+@dataclass(frozen=True)
+class PublisherState:
+    """Contents of the state blob.
+
+    `outbox` holds encoded payloads persisted before sending; see
+    `external_sli_publisher.outbox`.
+    """
+
+    last_published_end: datetime | None = None
+    outbox: tuple[OutboxEntry, ...] = ()
+    # Per-target latency sketches of recently published windows, keyed by
+    # target name; see `external_sli_publisher.sketch`.
+    latency_sketches: dict[str, tuple[WindowSketch, ...]] = field(default_factory=dict)
+
+
+@dataclass(frozen=True)
+class VersionedState:
+    state: PublisherState
+    # None when the state does not exist yet; saving then requires that it
+    # still does not exist.
+    etag: str | None = None
+
+
+def parse_state_datetime(value: str) -> datetime:
+    return datetime.fromisoformat(value.replace("Z", "+00:00")).astimezone(UTC)
+
+
+def format_state_datetime(value: datetime) -> str:
+    return value.astimezone(UTC).isoformat().replace("+00:00", "Z")
+
+
+def decode_state(data: bytes | str) -> PublisherState:
+    payload = json.loads(data.decode("utf-8") if isinstance(data, bytes) else data)
+    value = payload.get("last_published_window_end")
+    last_published_end = (
+        parse_state_datetime(value) if isinstance(value, str) and value else None
+    )
+    outbox = tuple(
+        OutboxEntry.from_json(entry, parse_state_datetime)
+        for entry in payload.get("outbox", [])
+    )
+    latency_sketches = {
+        target: tuple(
+            (parse_state_datetime(item["window_end"]), DDSketch.from_json(item))
+            for item in windows
+        )
+        for target, windows in payload.get("latency_sketches", {}).items()
+    }
+    return PublisherState(
+        last_published_end=last_published_end,
+        outbox=outbox,
+        latency_sketches=latency_sketches,
+    )
+
+
+def encode_state(state: PublisherState) -> str:
+    payload: dict[str, Any] = {}
+    if state.last_published_end is not None:
+        payload["last_published_window_end"] = format_state_datetime(
+            state.last_published_end
+        )
+    if state.outbox:
+        payload["outbox"] = [
+            entry.to_json(format_state_datetime) for entry in state.outbox
+        ]
+    if state.latency_sketches:
+        payload["latency_sketches"] = {
+            target: [
+                {"window_end": format_state_datetime(window_end), **sketch.to_json()}
+                for window_end, sketch in windows
+            ]
+            for target, windows in state.latency_sketches.items()
+        }
+    return json.dumps(payload)
+
+
+class StateStore(Protocol):
+    def load(self) -> VersionedState: ...
+
+    def save(self, state: PublisherState, etag: str | None) -> str:
+        """Write `state` if the stored ETag still equals `etag`.
+
+        Returns the new ETag, or raises `StateConflictError`.
+        """
+        ...
+
+
+class BlobStateStore:
+    def __init__(self, blob: BlobClient) -> None:
+        self.blob = blob
+
+    def load(self) -> VersionedState:
+        try:
+            downloader = self.blob.download_blob()
+        except ResourceNotFoundError:
+            return VersionedState(PublisherState())
+        # The ETag comes with the download response: no separate HEAD.
+        return VersionedState(
+            decode_state(downloader.readall()), downloader.properties.etag
+        )
+
+    def save(self, state: PublisherState, etag: str | None) -> str:
+        data = encode_state(state)
+        try:
+            if etag is None:
+                result = self.blob.upload_blob(data, overwrite=False)
+            else:
+                result = self.blob.upload_blob(
+                    data,
+                    overwrite=True,
+                    etag=etag,
+                    match_condition=MatchConditions.IfNotModified,
+                )
+        except (ResourceExistsError, ResourceModifiedError) as exc:
+            raise StateConflictError(
+                f"state blob changed since it was read (etag={etag})"
+            ) from exc
+        return str(result["etag"])
+
+
+class FileStateStore:
+    """Local JSON file; the ETag is a content hash, writes hold a file lock.
+
+    The lock uses `fcntl`, so writes need a POSIX host. It is imported on first
+    save so that importing this module (e.g. for `BlobStateStore`) works
+    everywhere.
+    """
+
+    def __init__(self, path: Path) -> None:
+        self.path = path
+
+    def load(self) -> VersionedState:
+        try:
+            data = self.path.read_bytes()
+        except FileNotFoundError:
+            return VersionedState(PublisherState())
+        return VersionedState(decode_state(data), _content_etag(data))
+
+    def save(self, state: PublisherState, etag: str | None) -> str:
+        import fcntl
+
+        data = encode_state(state).encode("utf-8")
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        lock_path = self.path.with_name(f"{self.path.name}.lock")
+        with lock_path.open("a") as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            try:
+                current = _content_etag(self.path.read_bytes())
+            except FileNotFoundError:
+                current = None
+            if current != etag:
+                raise StateConflictError(
+                    f"state file {self.path} changed since it was read"
+                )
+            fd, temp_path = tempfile.mkstemp(dir=self.path.parent)
+            with os.fdopen(fd, "wb") as temp:
+                temp.write(data)
+            os.replace(temp_path, self.path)
+        return _content_etag(data)
+
+
+def _content_etag(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()
+
+
+def state_store_for(url: str, credential: Any) -> StateStore:
+    parts = urllib.parse.urlsplit(url)
+    if parts.scheme == "file":
+        return FileStateStore(Path(urllib.request.url2pathname(parts.path)))
+    return BlobStateStore(BlobClient.from_blob_url(url, credential=credential))
@@ -0,0 +1,347 @@
+"""Pooled keep-alive HTTP transport shared by probes and remote write."""
+
+from __future__ import annotations
+
+import http.client
+import socket
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+from collections.abc import Buffer, Callable
+from dataclasses import dataclass
+from email.message import Message
+
+Clock = Callable[[], float]
+
+MAX_REDIRECTS = 5
+REDIRECT_STATUSES = frozenset({301, 302, 303, 307, 308})
+# Reused connections may have been closed by the peer while idle; these are
+# the errors that surface on the first write/read in that case.
+STALE_CONNECTION_ERRORS: tuple[type[BaseException], ...] = (
+    http.client.RemoteDisconnected,
+    http.client.BadStatusLine,
+    ConnectionResetError,
+    BrokenPipeError,
+)
+
+_PoolKey = tuple[str, str, int]
+
+
+@dataclass(frozen=True)
+class RequestPhases:
+    """Per-phase durations (ms) of one request on the final redirect hop.
+
+    Connection phases are None when a pooled connection was reused (no DNS /
+    connect / TLS happened) and `tls_ms` is None for plain HTTP.
+    """
+
+    dns_ms: float | None
+    connect_ms: float | None
+    tls_ms: float | None
+    ttfb_ms: float
+    body_ms: float
+
+    @property
+    def connection_reused(self) -> bool:
+        return self.connect_ms is None
+
+    def as_dict(self) -> dict[str, float]:
+        """Measured phases keyed by name (dns, connect, tls, ttfb, body)."""
+        values = {
+            "dns": self.dns_ms,
+            "connect": self.connect_ms,
+            "tls": self.tls_ms,
+            "ttfb": self.ttfb_ms,
+            "body": self.body_ms,
+        }
+        return {name: value for name, value in values.items() if value is not None}
+
+
+class _PhaseTimingMixin:
+    """Split connection setup into DNS, TCP connect and TLS handshake timings.
+
+    http.client resolves and connects in one `socket.create_connection` call;
+    replacing `_create_connection` (the hook http.client provides for this)
+    lets us time `getaddrinfo` separately. TLS is the remainder of `connect`.
+    """
+
+    dns_ms: float | None = None
+    connect_ms: float | None = None
+    tls_ms: float | None = None
+    _connected_at = 0.0
+
+    def _timed_create_connection(
+        self,
+        address: tuple[str, int],
+        timeout: float | None,
+        source_address: tuple[str, int] | None = None,
+    ) -> socket.socket:
+        host, port = address
+        start = time.perf_counter()
+        infos = socket.getaddrinfo(host, port, 0, socket.SOCK_STREAM)
+        resolved = time.perf_counter()
+        last_error: OSError | None = None
+        for family, sock_type, proto, _, sockaddr in infos:
+            sock = socket.socket(family, sock_type, proto)
+            try:
+                sock.settimeout(timeout)
+                if source_address:
+                    sock.bind(source_address)
+                sock.connect(sockaddr)
+            except OSError as exc:
+                sock.close()
+                last_error = exc
+                continue
+            self._connected_at = time.perf_counter()
+            self.dns_ms = (resolved - start) * 1000
+            self.connect_ms = (self._connected_at - resolved) * 1000
+            return sock
+        raise last_error or OSError(f"getaddrinfo returned no addresses for {host}")
+
+
+class TimedHTTPConnection(_PhaseTimingMixin, http.client.HTTPConnection):
+    def __init__(self, *args: object, **kwargs: object) -> None:
+        super().__init__(*args, **kwargs)  # ty: ignore[invalid-argument-type]
+        self._create_connection = self._timed_create_connection
+
+
+class TimedHTTPSConnection(_PhaseTimingMixin, http.client.HTTPSConnection):
+    def __init__(self, *args: object, **kwargs: object) -> None:
+        super().__init__(*args, **kwargs)  # ty: ignore[invalid-argument-type]
+        self._create_connection = self._timed_create_connection
+
+    def connect(self) -> None:
+        super().connect()
+        self.tls_ms = (time.perf_counter() - self._connected_at) * 1000
+
+
+class PooledResponse:
+    """Fully-read response, compatible with what callers use from `urlopen`."""
+
+    def __init__(
+        self,
+        url: str,
+        status: int,
+        headers: Message,
+        body: bytes,
+        phases: RequestPhases | None = None,
+    ) -> None:
+        self.url = url
+        self.status = status
+        self.headers = headers
+        self._body = body
+        self.phases = phases
+
+    def __enter__(self) -> PooledResponse:
+        return self
+
+    def __exit__(self, *args: object) -> None:
+        return None
+
+    def read(self) -> bytes:
+        return self._body
+
+    def getcode(self) -> int:
+        return self.status
+
+
+class PooledTransport:
+    """Keep idle HTTP/1.1 connections per (scheme, host, port) for reuse.
+
+    The instance is module-global so a warm Functions host reuses TCP / TLS
+    connections across timer runs. `urlopen` accepts a `urllib.request.Request`
+    and mirrors `urllib.request.urlopen`: non-2xx/3xx responses raise
+    `HTTPError` and GET redirects are followed.
+    """
+
+    def __init__(
+        self,
+        *,
+        max_idle_per_host: int = 8,
+        idle_timeout_seconds: float = 120.0,
+        clock: Clock = time.monotonic,
+    ) -> None:
+        self._max_idle_per_host = max_idle_per_host
+        self._idle_timeout = idle_timeout_seconds
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._idle: dict[_PoolKey, list[tuple[http.client.HTTPConnection, float]]] = {}
+        self.connections_opened = 0
+
+    def urlopen(
+        self,
+        request: urllib.request.Request,
+        *,
+        timeout: float,
+    ) -> PooledResponse:
+        url = request.full_url
+        method = request.get_method()
+        body = request.data
+        if body is not None and not isinstance(body, Buffer):
+            raise TypeError("PooledTransport only sends in-memory request bodies")
+        headers = dict(request.header_items())
+        for _ in range(MAX_REDIRECTS + 1):
+            try:
+                response = self.request(
+                    method, url, body=body, headers=headers, timeout=timeout
+                )
+            except http.client.HTTPException as exc:
+                # Protocol errors are not OSError; surface them like urllib does
+                # for connection failures so callers handle one exception family.
+                raise urllib.error.URLError(exc) from exc
+            location = response.headers.get("Location")
+            if (
+                response.status in REDIRECT_STATUSES
+                and location
+                and method in {"GET", "HEAD"}
+            ):
+                url = urllib.parse.urljoin(url, location)
+                continue
+            if response.status >= 400:
+                raise urllib.error.HTTPError(
+                    url,
+                    response.status,
+                    http.client.responses.get(response.status, ""),
+                    response.headers,
+                    None,
+                )
+            return response
+        raise urllib.error.URLError(f"too many redirects: {request.full_url}")
+
+    def request(
+        self,
+        method: str,
+        url: str,
+        *,
+        body: Buffer | None = None,
+        headers: dict[str, str] | None = None,
+        timeout: float,
+    ) -> PooledResponse:
+        parsed = urllib.parse.urlsplit(url)
+        scheme = parsed.scheme.lower()
+        if scheme not in {"http", "https"}:
+            raise urllib.error.URLError(f"unsupported URL scheme: {scheme}")
+        host = parsed.hostname or ""
+        port = parsed.port or (443 if scheme == "https" else 80)
+        key: _PoolKey = (scheme, host, port)
+        path = parsed.path or "/"
+        if parsed.query:
+            path = f"{path}?{parsed.query}"
+
+        connection, reused = self._acquire(key, timeout)
+        try:
+            response = self._send(connection, method, path, body, headers)
+        except STALE_CONNECTION_ERRORS:
+            connection.close()
+            if not reused:
+                raise
+            # The idle connection was closed by the peer: retry once on a new one.
+            connection, _ = self._acquire(key, timeout, fresh=True)
+            try:
+                response = self._send(connection, method, path, body, headers)
+            except BaseException:
+                connection.close()
+                raise
+        except BaseException:
+            connection.close()
+            raise
+
+        status, response_headers, response_body, will_close, phases = response
+        if will_close:
+            connection.close()
+        else:
+            self._release(key, connection)
+        return PooledResponse(url, status, response_headers, response_body, phases)
+
+    def close(self) -> None:
+        with self._lock:
+            idle, self._idle = self._idle, {}
+        for connections in idle.values():
+            for connection, _ in connections:
+                connection.close()
+
+    def _acquire(
+        self,
+        key: _PoolKey,
+        timeout: float,
+        *,
+        fresh: bool = False,
+    ) -> tuple[http.client.HTTPConnection, bool]:
+        now = self._clock()
+        expired: list[http.client.HTTPConnection] = []
+        connection: http.client.HTTPConnection | None = None
+        if not fresh:
+            with self._lock:
+                idle = self._idle.get(key, [])
+                while idle:
+                    candidate, released_at = idle.pop()
+                    if now - released_at < self._idle_timeout:
+                        connection = candidate
+                        break
+                    expired.append(candidate)
+        for stale in expired:
+            stale.close()
+        if connection is not None:
+            connection.timeout = timeout
+            if connection.sock is not None:
+                connection.sock.settimeout(timeout)
+            return connection, True
+        return self._connect(key, timeout), False
+
+    def _connect(self, key: _PoolKey, timeout: float) -> http.client.HTTPConnection:
+        scheme, host, port = key
+        with self._lock:
+            self.connections_opened += 1
+        if scheme == "https":
+            return TimedHTTPSConnection(host, port, timeout=timeout)
+        return TimedHTTPConnection(host, port, timeout=timeout)
+
+    def _release(self, key: _PoolKey, connection: http.client.HTTPConnection) -> None:
+        with self._lock:
+            idle = self._idle.setdefault(key, [])
+            if len(idle) < self._max_idle_per_host:
+                idle.append((connection, self._clock()))
+                return
+        connection.close()
+
+    @staticmethod
+    def _send(
+        connection: http.client.HTTPConnection,
+        method: str,
+        path: str,
+        body: Buffer | None,
+        headers: dict[str, str] | None,
+    ) -> tuple[int, Message, bytes, bool, RequestPhases]:
+        dns_ms = connect_ms = tls_ms = None
+        if connection.sock is None:
+            # Connect explicitly so TTFB starts after the handshake.
+            connection.connect()
+            dns_ms = getattr(connection, "dns_ms", None)
+            connect_ms = getattr(connection, "connect_ms", None)
+            tls_ms = getattr(connection, "tls_ms", None)
+        sent = time.perf_counter()
+        connection.request(method, path, body=body, headers=headers or {})
+        response = connection.getresponse()
+        first_byte = time.perf_counter()
+        response_body = response.read()
+        done = time.perf_counter()
+        phases = RequestPhases(
+            dns_ms=dns_ms,
+            connect_ms=connect_ms,
+            tls_ms=tls_ms,
+            ttfb_ms=(first_byte - sent) * 1000,
+            body_ms=(done - first_byte) * 1000,
+        )
+        return (
+            response.status,
+            response.msg,
+            response_body,
+            response.will_close,
+            phases,
+        )
+
+
+# Shared by every run in this worker process (warm Functions host).
+HTTP_TRANSPORT = PooledTransport()
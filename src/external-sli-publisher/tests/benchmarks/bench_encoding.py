@@ -0,0 +1,160 @@
+"""Microbenchmark: remote-write protobuf encoding, legacy vs preallocated.
+
+Usage (from src/external-sli-publisher):
+    uv run python tests/benchmarks/bench_encoding.py
+
+- legacy: the original per-field `bytes` concatenation encoder (inlined below)
+- preallocated: `external_sli_publisher.encoding.encode_write_request`
+- v2: `encode_write_request_v2` (Remote Write 2.0, interned symbols)
+- dict labels: `encode_write_request` with plain label dicts instead of the
+  `SeriesCatalog` label sets, i.e. without memoized label keys
+
+Raw and snappy-compressed payload sizes are printed per format.
+
+Payloads mirror what `run_once` sends: heartbeat + SLI + phase series for one
+or several probe targets. Both encoders are checked to produce the same bytes.
+"""
+
+from __future__ import annotations
+
+import struct
+import timeit
+from collections.abc import Iterable, Mapping
+from datetime import UTC, datetime
+
+from external_sli_publisher.encoding import (
+    encode_write_request,
+    encode_write_request_v2,
+)
+from external_sli_publisher.publisher import (
+    MetricSample,
+    ProbeResult,
+    ProbeTarget,
+    Settings,
+    compress_snappy_raw,
+    heartbeat_sample,
+    metric_samples,
+    probe_result_to_sli_samples,
+)
+
+ITERATIONS = 2_000
+
+
+def _legacy_varint(value: int) -> bytes:
+    chunks = bytearray()
+    while value > 0x7F:
+        chunks.append((value & 0x7F) | 0x80)
+        value >>= 7
+    chunks.append(value)
+    return bytes(chunks)
+
+
+def _legacy_length_delimited(field_number: int, payload: bytes) -> bytes:
+    return (
+        _legacy_varint((field_number << 3) | 2) + _legacy_varint(len(payload)) + payload
+    )
+
+
+def _legacy_string(field_number: int, value: str) -> bytes:
+    return _legacy_length_delimited(field_number, value.encode("utf-8"))
+
+
+def _legacy_time_series(
+    name: str, labels: Mapping[str, str], value: float, timestamp_ms: int
+) -> bytes:
+    payload = bytearray()
+    for label_name, label_value in sorted({"__name__": name, **labels}.items()):
+        payload += _legacy_length_delimited(
+            1, _legacy_string(1, label_name) + _legacy_string(2, label_value)
+        )
+    sample = (
+        _legacy_varint((1 << 3) | 1)
+        + struct.pack("<d", value)
+        + _legacy_varint(2 << 3)
+        + _legacy_varint(timestamp_ms)
+    )
+    payload += _legacy_length_delimited(2, sample)
+    return bytes(payload)
+
+
+def legacy_encode(samples: Iterable[MetricSample]) -> bytes:
+    payload = bytearray()
+    for name, labels, value, timestamp_ms in samples:
+        assert isinstance(value, float | int), "legacy encoder has no histograms"
+        payload += _legacy_length_delimited(
+            1, _legacy_time_series(name, labels, value, timestamp_ms)
+        )
+    return bytes(payload)
+
+
+def _payload(target_count: int) -> list[MetricSample]:
+    targets = tuple(
+        ProbeTarget(name=f"target-{index}", url=f"https://t{index}.example.test/")
+        for index in range(1, target_count)
+    )
+    settings = Settings(
+        probe_url="https://chaos.example.test/",
+        probe_name="chaos-app-health",
+        remote_write_url="https://example.test/write",
+        state_blob_url="https://storage.blob.core.windows.net/state/blob.json",
+        service_name="chaos-app",
+        environment="bench",
+        window_seconds=300,
+        probe_timeout_seconds=10,
+        max_catchup_windows=12,
+        not_before=None,
+        extra_probe_targets=targets,
+    )
+    sample_time = datetime(2026, 5, 19, 16, 52, 9, tzinfo=UTC)
+    result = ProbeResult(
+        success=True,
+        status_code=200,
+        duration_ms=180,
+        phases={"dns": 4.0, "connect": 12.0, "tls": 30.0, "ttfb": 120.0, "body": 2.0},
+    )
+    samples = probe_result_to_sli_samples(result, settings)
+    payload: list[MetricSample] = [heartbeat_sample(settings, sample_time)]
+    for target in settings.probe_targets:
+        payload += metric_samples(samples, settings, sample_time, target)
+    return payload
+
+
+def main() -> None:
+    for target_count in (1, 4):
+        samples = _payload(target_count)
+        plain = [(name, dict(labels), value, ts) for name, labels, value, ts in samples]
+        assert legacy_encode(samples) == encode_write_request(samples)
+        assert encode_write_request(plain) == encode_write_request(samples)
+        legacy = timeit.timeit(lambda s=samples: legacy_encode(s), number=ITERATIONS)
+        current = timeit.timeit(
+            lambda s=samples: encode_write_request(s), number=ITERATIONS
+        )
+        v2 = timeit.timeit(
+            lambda s=samples: encode_write_request_v2(s), number=ITERATIONS
+        )
+        uncached = timeit.timeit(
+            lambda s=plain: encode_write_request(s), number=ITERATIONS
+        )
+        for name, elapsed in (
+            ("legacy", legacy),
+            ("preallocated", current),
+            ("v2", v2),
+            ("dict labels", uncached),
+        ):
+            per_op_us = elapsed / ITERATIONS * 1e6
+            print(
+                f"targets={target_count} series={len(samples):3d} {name:12s} "
+                f"{per_op_us:8.1f} us/payload  x{elapsed / current:4.1f}"
+            )
+        for name, payload in (
+            ("v1", encode_write_request(samples)),
+            ("v2", encode_write_request_v2(samples)),
+        ):
+            print(
+                f"targets={target_count} {name} bytes raw={len(payload):6d} "
+                f"snappy={len(compress_snappy_raw(payload)):6d}"
+            )
+
+
+if __name__ == "__main__":
+    main()
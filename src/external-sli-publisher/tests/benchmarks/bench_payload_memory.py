@@ -0,0 +1,139 @@
+"""Benchmark: payload copies and peak memory of the remote-write publish path.
+
+Usage (from src/external-sli-publisher):
+    uv run python tests/benchmarks/bench_payload_memory.py
+
+- copy: `compress_snappy_raw(encode_write_request(...))` sent as `bytes`, i.e.
+  the encoded payload and the compressed payload are each copied once
+- buffers: `publish_remote_write_samples`, which encodes and compresses into
+  the thread's reusable `PayloadBuffers` and sends a `memoryview`
+- outbox: `encode_remote_write_payload`, the windowed publish path, which
+  keeps one `bytes` copy of the compressed payload for the state blob
+
+"copied" counts payload bytes materialized as new objects per publish (the
+memory copies this change removes); "peak" is the tracemalloc peak above the
+baseline for one warm publish. The HTTP layer is a no-op `urlopen` that only
+reads the body length, as `http.client` does before `sendall`.
+"""
+
+from __future__ import annotations
+
+import time
+import tracemalloc
+import urllib.request
+from collections.abc import Buffer, Callable
+from datetime import UTC, datetime
+
+from external_sli_publisher.encoding import encode_write_request
+from external_sli_publisher.publisher import (
+    MetricSample,
+    ProbeResult,
+    ProbeTarget,
+    Settings,
+    compress_snappy_raw,
+    encode_remote_write_payload,
+    heartbeat_sample,
+    metric_samples,
+    probe_result_to_sli_samples,
+    publish_remote_write_samples,
+    send_remote_write_payload,
+)
+
+ITERATIONS = 200
+
+
+class _NullResponse:
+    def __enter__(self) -> _NullResponse:
+        return self
+
+    def __exit__(self, *args: object) -> None:
+        return None
+
+    def read(self) -> bytes:
+        return b""
+
+
+def _urlopen(request: urllib.request.Request, timeout: float) -> _NullResponse:
+    assert isinstance(request.data, Buffer)
+    memoryview(request.data).nbytes  # noqa: B018 — Content-Length
+    return _NullResponse()
+
+
+def _workload(target_count: int) -> tuple[Settings, list[MetricSample]]:
+    settings = Settings(
+        probe_url="https://chaos.example.test/",
+        probe_name="chaos-app-health",
+        remote_write_url="https://example.test/write",
+        state_blob_url="https://storage.blob.core.windows.net/state/blob.json",
+        service_name="chaos-app",
+        environment="bench",
+        window_seconds=300,
+        probe_timeout_seconds=10,
+        max_catchup_windows=12,
+        not_before=None,
+        probe_concurrency=32,
+        extra_probe_targets=tuple(
+            ProbeTarget(name=f"target-{index}", url=f"https://t{index}.example.test/")
+            for index in range(1, target_count)
+        ),
+    )
+    sample_time = datetime(2026, 5, 19, 16, 52, 9, tzinfo=UTC)
+    result = ProbeResult(
+        success=True,
+        status_code=200,
+        duration_ms=180,
+        phases={"dns": 4.0, "connect": 12.0, "tls": 30.0, "ttfb": 120.0, "body": 2.0},
+    )
+    sli = probe_result_to_sli_samples(result, settings)
+    samples = [heartbeat_sample(settings, sample_time)]
+    for target in settings.probe_targets:
+        samples += metric_samples(sli, settings, sample_time, target)
+    return settings, samples
+
+
+def _measure(publish: Callable[[], int]) -> tuple[float, int, int]:
+    """Return `(ms per publish, payload bytes copied, peak bytes)`."""
+    publish()  # warm-up: buffers and label caches reach steady state
+    started = time.perf_counter()
+    for _ in range(ITERATIONS):
+        publish()
+    elapsed = time.perf_counter() - started
+    tracemalloc.start()
+    baseline, _ = tracemalloc.get_traced_memory()
+    tracemalloc.reset_peak()
+    copied = publish()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return elapsed / ITERATIONS * 1000, copied, peak - baseline
+
+
+def main() -> None:
+    for target_count in (10, 50, 200):
+        settings, samples = _workload(target_count)
+
+        def copy(settings: Settings = settings, samples: list = samples) -> int:
+            raw = encode_write_request(samples)
+            compressed = compress_snappy_raw(raw)
+            send_remote_write_payload(
+                "token", compressed, "1.0", settings, urlopen=_urlopen
+            )
+            return len(raw) + len(compressed)
+
+        def buffers(settings: Settings = settings, samples: list = samples) -> int:
+            publish_remote_write_samples("token", samples, settings, urlopen=_urlopen)
+            return 0
+
+        def outbox(settings: Settings = settings, samples: list = samples) -> int:
+            return len(encode_remote_write_payload(samples, settings))
+
+        for name, publish in (("copy", copy), ("buffers", buffers), ("outbox", outbox)):
+            per_run_ms, copied, peak = _measure(publish)
+            print(
+                f"targets={target_count:4d} series={len(samples):6d} {name:8s} "
+                f"{per_run_ms:7.2f} ms/publish  copied={copied:8d} B  "
+                f"peak={peak / 1024:8.1f} KiB"
+            )
+
+
+if __name__ == "__main__":
+    main()
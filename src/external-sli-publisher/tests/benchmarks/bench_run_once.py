@@ -0,0 +1,53 @@
+"""Benchmark: full `run_once` invocations against the offline local stack.
+
+Usage (from src/external-sli-publisher):
+    uv run python -m tests.benchmarks.bench_run_once
+
+Each row runs consecutive timer ticks over simulated time with N probe
+targets served by `tests/e2e/local_stack.py` (probe server, remote-write
+receiver, file state, fake credential), and reports wall time per
+invocation and probes per second. Target latency is injected per request so
+the probe concurrency setting is what bounds throughput.
+"""
+
+from __future__ import annotations
+
+import tempfile
+import time
+from datetime import UTC, datetime
+from pathlib import Path
+
+from tests.e2e.local_stack import local_stack, tick
+
+START = datetime(2026, 5, 19, 16, 0, tzinfo=UTC)
+TICKS = 5
+TARGET_DELAY_SECONDS = 0.02
+
+
+def main() -> None:
+    for target_count, concurrency in ((1, 1), (10, 4), (50, 16), (200, 32)):
+        with (
+            tempfile.TemporaryDirectory() as state_dir,
+            local_stack(Path(state_dir)) as stack,
+        ):
+            settings = stack.settings(
+                extra_targets=target_count - 1, probe_concurrency=concurrency
+            )
+            stack.targets.delays = {
+                target.name: TARGET_DELAY_SECONDS for target in settings.probe_targets
+            }
+            started = time.perf_counter()
+            for windows in range(TICKS):
+                stack.run(settings, tick(START, windows))
+            elapsed = time.perf_counter() - started
+            series = sum(len(r.series) for r in stack.receiver.requests)
+        per_run_ms = elapsed / TICKS * 1000
+        print(
+            f"targets={target_count:4d} concurrency={concurrency:3d} "
+            f"{per_run_ms:8.1f} ms/run  {target_count * TICKS / elapsed:7.1f} "
+            f"probes/s  series/run={series // TICKS}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,319 @@
+"""Offline stand-ins for everything `run_once` talks to.
+
+- `RemoteWriteReceiver`: local HTTP endpoint that snappy-decompresses and
+  decodes Remote Write 1.0 / 2.0 requests (float samples and native
+  histogram counts) with a small self-contained protobuf reader.
+- `ProbeTargets`: local HTTP server answering `/<target name>` with a
+  configurable status and delay, so many probe targets share one socket.
+- `FakeCredential`: static token, wrapped in a fresh `CredentialCache`.
+- The state blob is a `file://` URL (`FileStateStore`).
+
+`LocalStack.run(now)` drives `run_once` at a simulated time, so tests can
+skip ticks (missed windows), jump back (clock skew) or make the receiver fail.
+"""
+
+from __future__ import annotations
+
+import struct
+import threading
+import time
+from collections.abc import Iterator
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Any
+
+import cramjam
+from azure.core.credentials import AccessToken
+
+from external_sli_publisher.auth import CredentialCache
+from external_sli_publisher.publisher import ProbeTarget, Settings, run_once
+from external_sli_publisher.state import FileStateStore, PublisherState
+
+TOKEN = "local-stack-token"  # noqa: S105 — fake credential
+
+
+class FakeCredential:
+    def __init__(self) -> None:
+        self.calls = 0
+
+    def get_token(self, *_scopes: str, **_kwargs: object) -> AccessToken:
+        self.calls += 1
+        return AccessToken(TOKEN, int(time.time()) + 3600)
+
+
+# --- protobuf reader -------------------------------------------------------
+
+
+def _varint(data: bytes, offset: int) -> tuple[int, int]:
+    value = shift = 0
+    while True:
+        byte = data[offset]
+        value |= (byte & 0x7F) << shift
+        offset += 1
+        if byte < 0x80:
+            return value, offset
+        shift += 7
+
+
+def _fields(data: bytes) -> Iterator[tuple[int, int, Any]]:
+    """Yield `(field number, wire type, value)`; LEN values are bytes."""
+    offset = 0
+    while offset < len(data):
+        key, offset = _varint(data, offset)
+        number, wire_type = key >> 3, key & 7
+        if wire_type == 0:
+            value, offset = _varint(data, offset)
+        elif wire_type == 1:
+            value, offset = data[offset : offset + 8], offset + 8
+        elif wire_type == 2:
+            length, offset = _varint(data, offset)
+            value, offset = data[offset : offset + length], offset + length
+        else:
+            raise ValueError(f"unsupported wire type {wire_type}")
+        yield number, wire_type, value
+
+
+def _signed64(value: int) -> int:
+    return value - (1 << 64) if value >= 1 << 63 else value
+
+
+def _double(raw: bytes) -> float:
+    return struct.unpack("<d", raw)[0]
+
+
+def _sample(data: bytes) -> tuple[float, int]:
+    value, timestamp = 0.0, 0
+    for number, _, raw in _fields(data):
+        if number == 1:
+            value = _double(raw)
+        elif number == 2:
+            timestamp = _signed64(raw)
+    return value, timestamp
+
+
+def _histogram(data: bytes) -> tuple[int, int]:
+    """Return `(count, timestamp)` of a native histogram sample."""
+    count, timestamp = 0, 0
+    for number, _, raw in _fields(data):
+        if number == 1:
+            count = raw
+        elif number == 15:
+            timestamp = _signed64(raw)
+    return count, timestamp
+
+
+@dataclass
+class ReceivedSeries:
+    labels: dict[str, str]
+    samples: list[tuple[float, int]] = field(default_factory=list)
+    histograms: list[tuple[int, int]] = field(default_factory=list)
+
+    @property
+    def name(self) -> str:
+        return self.labels["__name__"]
+
+
+def decode_v1(payload: bytes) -> list[ReceivedSeries]:
+    decoded = []
+    for _, _, series_bytes in _fields(payload):
+        series = ReceivedSeries(labels={})
+        for number, _, raw in _fields(series_bytes):
+            if number == 1:
+                label = {n: v.decode("utf-8") for n, _, v in _fields(raw)}
+                series.labels[label.get(1, "")] = label.get(2, "")
+            elif number == 2:
+                series.samples.append(_sample(raw))
+            elif number == 4:
+                series.histograms.append(_histogram(raw))
+        decoded.append(series)
+    return decoded
+
+
+def decode_v2(payload: bytes) -> list[ReceivedSeries]:
+    symbols: list[str] = []
+    raw_series: list[bytes] = []
+    for number, _, raw in _fields(payload):
+        if number == 4:
+            symbols.append(raw.decode("utf-8"))
+        elif number == 5:
+            raw_series.append(raw)
+    decoded = []
+    for series_bytes in raw_series:
+        series = ReceivedSeries(labels={})
+        for number, _, raw in _fields(series_bytes):
+            if number == 1:
+                refs, offset = [], 0
+                while offset < len(raw):
+                    ref, offset = _varint(raw, offset)
+                    refs.append(ref)
+                for index in range(0, len(refs), 2):
+                    series.labels[symbols[refs[index]]] = symbols[refs[index + 1]]
+            elif number == 2:
+                series.samples.append(_sample(raw))
+            elif number == 3:
+                series.histograms.append(_histogram(raw))
+        decoded.append(series)
+    return decoded
+
+
+# --- servers ---------------------------------------------------------------
+
+
+@dataclass
+class ReceivedRequest:
+    headers: dict[str, str]  # lower-cased names
+    series: list[ReceivedSeries]
+
+
+class RemoteWriteReceiver:
+    """Decodes every POST; `fail_next` queues error statuses to return."""
+
+    def __init__(self) -> None:
+        self.requests: list[ReceivedRequest] = []
+        self.fail_next: list[int] = []
+        self.lock = threading.Lock()
+
+    def handle(self, handler: BaseHTTPRequestHandler) -> None:
+        body = handler.rfile.read(int(handler.headers["Content-Length"]))
+        with self.lock:
+            if self.fail_next:
+                _reply(handler, self.fail_next.pop(0))
+                return
+        if handler.headers["Authorization"] != f"Bearer {TOKEN}":
+            _reply(handler, 401)
+            return
+        payload = bytes(cramjam.snappy.decompress_raw(body))
+        content_type = handler.headers["Content-Type"]
+        series = (
+            decode_v2(payload)
+            if "io.prometheus.write.v2" in content_type
+            else decode_v1(payload)
+        )
+        with self.lock:
+            headers = {name.lower(): value for name, value in handler.headers.items()}
+            self.requests.append(ReceivedRequest(headers, series))
+        _reply(handler, 204)
+
+    def series(self, name: str, **labels: str) -> list[ReceivedSeries]:
+        with self.lock:
+            return [
+                series
+                for request in self.requests
+                for series in request.series
+                if series.name == name
+                and all(series.labels.get(k) == v for k, v in labels.items())
+            ]
+
+    def values(self, name: str, **labels: str) -> list[tuple[float, int]]:
+        return [
+            point for series in self.series(name, **labels) for point in series.samples
+        ]
+
+
+class ProbeTargets:
+    """`GET /<name>` answers `statuses[name]` (default 200) after `delays[name]`."""
+
+    def __init__(self) -> None:
+        self.statuses: dict[str, int] = {}
+        self.delays: dict[str, float] = {}
+        self.hits = 0
+
+    def handle(self, handler: BaseHTTPRequestHandler) -> None:
+        name = handler.path.lstrip("/")
+        self.hits += 1
+        delay = self.delays.get(name, 0.0)
+        if delay:
+            time.sleep(delay)
+        _reply(handler, self.statuses.get(name, 200), b"ok")
+
+
+def _reply(handler: BaseHTTPRequestHandler, status: int, body: bytes = b"") -> None:
+    handler.send_response(status)
+    handler.send_header("Content-Length", str(len(body)))
+    handler.end_headers()
+    handler.wfile.write(body)
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    receiver: RemoteWriteReceiver
+    targets: ProbeTargets
+
+    def do_GET(self) -> None:  # noqa: N802
+        self.targets.handle(self)
+
+    def do_POST(self) -> None:  # noqa: N802
+        self.receiver.handle(self)
+
+    def log_message(self, format: str, *args: Any) -> None:  # noqa: A002
+        return None
+
+
+# --- stack -----------------------------------------------------------------
+
+
+@dataclass
+class LocalStack:
+    base_url: str
+    state_path: Path
+    receiver: RemoteWriteReceiver
+    targets: ProbeTargets
+    credentials: CredentialCache
+    credential: FakeCredential
+
+    def settings(self, *, extra_targets: int = 0, **overrides: Any) -> Settings:
+        values: dict[str, Any] = {
+            "probe_url": f"{self.base_url}/primary",
+            "probe_name": "primary",
+            "remote_write_url": f"{self.base_url}/api/v1/write",
+            "state_blob_url": self.state_path.as_uri(),
+            "service_name": "chaos-app",
+            "environment": "local",
+            "window_seconds": 300,
+            "probe_timeout_seconds": 10,
+            "max_catchup_windows": 12,
+            "not_before": None,
+            "extra_probe_targets": tuple(
+                ProbeTarget(name=f"t{index}", url=f"{self.base_url}/t{index}")
+                for index in range(extra_targets)
+            ),
+        }
+        values.update(overrides)
+        return Settings(**values)
+
+    def run(self, settings: Settings, now: datetime) -> int:
+        return run_once(settings, now, credentials=self.credentials)
+
+    def state(self) -> PublisherState:
+        return FileStateStore(self.state_path).load().state
+
+
+@contextmanager
+def local_stack(state_dir: Path) -> Iterator[LocalStack]:
+    receiver = RemoteWriteReceiver()
+    targets = ProbeTargets()
+    handler = type("Handler", (_Handler,), {"receiver": receiver, "targets": targets})
+    httpd = ThreadingHTTPServer(("127.0.0.1", 0), handler)
+    thread = threading.Thread(target=httpd.serve_forever, args=(0.05,), daemon=True)
+    thread.start()
+    credential = FakeCredential()
+    try:
+        yield LocalStack(
+            base_url=f"http://127.0.0.1:{httpd.server_address[1]}",
+            state_path=state_dir / "external-sli-state.json",
+            receiver=receiver,
+            targets=targets,
+            credentials=CredentialCache(lambda: credential),
+            credential=credential,
+        )
+    finally:
+        httpd.shutdown()
+        httpd.server_close()
+
+
+def tick(start: datetime, windows: int, *, seconds: int = 300) -> datetime:
+    """`windows` timer ticks after `start`, 5 s into the window."""
+    return start + timedelta(seconds=windows * seconds + 5)
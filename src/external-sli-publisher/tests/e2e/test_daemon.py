@@ -0,0 +1,157 @@
+from __future__ import annotations
+
+import asyncio
+import time
+from collections.abc import Iterator
+from datetime import UTC, datetime, timedelta
+from http.server import BaseHTTPRequestHandler
+from pathlib import Path
+
+import pytest
+
+from external_sli_publisher.daemon import PublisherDaemon
+from external_sli_publisher.publisher import timestamp_ms
+from tests.e2e.local_stack import LocalStack, local_stack, tick
+
+START = datetime(2026, 5, 19, 16, 0, tzinfo=UTC)
+TOTAL = "chaos_app_external_availability_total"
+
+
+class SimulatedClock:
+    """Simulated time for the daemon; sets `stop` once `stop_at` is reached."""
+
+    def __init__(self, now: datetime, stop_at: datetime) -> None:
+        self.now = now
+        self.stop_at = stop_at
+
+    def __call__(self) -> datetime:
+        return self.now
+
+    async def wait(self, stop: asyncio.Event, seconds: float) -> None:
+        self.now += timedelta(seconds=seconds)
+        if self.now >= self.stop_at:
+            stop.set()
+        await asyncio.sleep(0)
+
+
+def run_daemon(
+    stack: LocalStack, start: datetime, stop_at: datetime, *, extra_targets: int = 0
+) -> PublisherDaemon:
+    clock = SimulatedClock(start, stop_at)
+    daemon = PublisherDaemon(
+        stack.settings(extra_targets=extra_targets),
+        probe_interval_seconds=60,
+        credentials=stack.credentials,
+        clock=clock,
+        wait=clock.wait,
+    )
+    asyncio.run(daemon.run(asyncio.Event()))
+    return daemon
+
+
+@pytest.fixture
+def stack(tmp_path: Path) -> Iterator[LocalStack]:
+    with local_stack(tmp_path) as running:
+        yield running
+
+
+def test_daemon_aggregates_sub_window_probes_and_publishes_at_close(
+    stack: LocalStack,
+) -> None:
+    window_end = START + timedelta(minutes=5)
+    daemon = run_daemon(
+        stack,
+        START + timedelta(seconds=5),
+        START + timedelta(minutes=10, seconds=30),
+        extra_targets=1,
+    )
+
+    assert daemon.windows_published == 3
+    # Five rounds per 300 s window at a 60 s interval, published at close.
+    # The third window is still open at stop (the simulated clock stops at
+    # the next wake, 16:11:05) and is published early with its one round.
+    assert stack.receiver.values(TOTAL, test="t0") == [
+        (5.0, timestamp_ms(window_end)),
+        (5.0, timestamp_ms(window_end + timedelta(minutes=5))),
+        (1.0, timestamp_ms(window_end + timedelta(minutes=6, seconds=5))),
+    ]
+    # 5 rounds x 2 targets per window, plus the first round of the third.
+    assert stack.targets.hits == 22
+    assert stack.state().last_published_end == window_end + timedelta(minutes=10)
+
+
+def test_daemon_state_is_interchangeable_with_the_timer(stack: LocalStack) -> None:
+    stack.run(stack.settings(), tick(START, 0))
+
+    # The timer published up to 16:00; 16:00-16:10 pass with nothing running.
+    run_daemon(
+        stack,
+        START + timedelta(minutes=10, seconds=5),
+        START + timedelta(minutes=15, seconds=30),
+    )
+
+    # Each missed window weighs five probes, like a probed daemon window.
+    # The window open at stop is published with its one round, not left to
+    # the timer as a missed window.
+    assert stack.receiver.values(TOTAL)[-2:] == [
+        (15.0, timestamp_ms(START + timedelta(minutes=15))),
+        (1.0, timestamp_ms(START + timedelta(minutes=16, seconds=5))),
+    ]
+    stack.run(stack.settings(), tick(START, 5))
+    assert stack.receiver.values(TOTAL)[-1] == (
+        1.0,
+        timestamp_ms(tick(START, 5)),
+    )
+
+
+def test_daemon_rejects_interval_not_shorter_than_window(stack: LocalStack) -> None:
+    with pytest.raises(RuntimeError, match="PROBE_INTERVAL"):
+        PublisherDaemon(stack.settings(), probe_interval_seconds=300)
+
+
+def test_daemon_keeps_probing_while_a_window_is_published(
+    stack: LocalStack, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    # Five rounds fall in the first window; the sixth only runs if the next
+    # window's first round is not held back by the first window's publish.
+    probed_during_publish: list[bool] = []
+    handle = stack.receiver.handle
+
+    def slow_handle(handler: BaseHTTPRequestHandler) -> None:
+        deadline = time.monotonic() + 2
+        while stack.targets.hits < 6 and time.monotonic() < deadline:
+            time.sleep(0.01)
+        probed_during_publish.append(stack.targets.hits >= 6)
+        handle(handler)
+
+    monkeypatch.setattr(stack.receiver, "handle", slow_handle)
+
+    daemon = run_daemon(
+        stack,
+        START + timedelta(seconds=5),
+        START + timedelta(minutes=5, seconds=30),
+    )
+
+    assert daemon.windows_published == 2
+    assert probed_during_publish == [True, True]
+    assert stack.receiver.values(TOTAL) == [
+        (5.0, timestamp_ms(START + timedelta(minutes=5))),
+        (1.0, timestamp_ms(START + timedelta(minutes=6, seconds=5))),
+    ]
+
+
+def test_daemon_stop_interrupts_the_wait_between_rounds(stack: LocalStack) -> None:
+    async def serve_briefly() -> None:
+        stop = asyncio.Event()
+        asyncio.get_running_loop().call_later(0.2, stop.set)
+        await PublisherDaemon(
+            stack.settings(),
+            probe_interval_seconds=60,
+            credentials=stack.credentials,
+        ).run(stop)
+
+    started = time.monotonic()
+    asyncio.run(serve_briefly())
+
+    assert time.monotonic() - started < 5
+    assert stack.targets.hits == 1
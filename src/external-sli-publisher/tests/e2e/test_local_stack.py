@@ -0,0 +1,161 @@
+from __future__ import annotations
+
+from collections.abc import Iterator
+from datetime import UTC, datetime, timedelta
+from pathlib import Path
+
+import pytest
+
+from external_sli_publisher.publisher import timestamp_ms
+from tests.e2e.local_stack import LocalStack, local_stack, tick
+
+START = datetime(2026, 5, 19, 16, 0, tzinfo=UTC)
+TOTAL = "chaos_app_external_availability_total"
+GOOD = "chaos_app_external_availability_good"
+HEARTBEAT = "chaos_app_external_sli_publisher_heartbeat"
+
+
+@pytest.fixture
+def stack(tmp_path: Path) -> Iterator[LocalStack]:
+    with local_stack(tmp_path) as running:
+        yield running
+
+
+def test_first_run_publishes_one_window_and_persists_state(stack: LocalStack) -> None:
+    settings = stack.settings()
+
+    assert stack.run(settings, tick(START, 0)) == 0
+
+    (request,) = stack.receiver.requests
+    assert request.headers["content-encoding"] == "snappy"
+    assert request.series[0].name == HEARTBEAT
+    assert stack.receiver.values(GOOD, test="primary") == [
+        (1.0, timestamp_ms(tick(START, 0)))
+    ]
+    assert stack.state().last_published_end == START
+    assert stack.state().outbox == ()
+
+
+def test_missed_ticks_are_caught_up_as_bad_samples(stack: LocalStack) -> None:
+    settings = stack.settings()
+    stack.run(settings, tick(START, 0))
+
+    stack.run(settings, tick(START, 4))  # three ticks never ran
+
+    assert stack.receiver.values(TOTAL)[-1][0] == 4.0
+    assert stack.receiver.values(GOOD)[-1][0] == 1.0
+    assert stack.state().last_published_end == tick(START, 4).replace(second=0)
+
+
+def test_clock_skew_backwards_only_sends_heartbeat(stack: LocalStack) -> None:
+    settings = stack.settings()
+    stack.run(settings, tick(START, 2))
+
+    stack.run(settings, tick(START, 1))  # clock jumped back one window
+    stack.run(settings, tick(START, 2))  # duplicate tick for the same window
+
+    assert [len(request.series) for request in stack.receiver.requests][1:] == [1, 1]
+    assert len(stack.receiver.values(TOTAL)) == 1
+    assert stack.state().last_published_end == tick(START, 2).replace(second=0)
+
+
+def test_remote_write_outage_is_delivered_from_outbox(stack: LocalStack) -> None:
+    settings = stack.settings(remote_write_attempts=1)
+    stack.receiver.fail_next = [503]
+
+    stack.run(settings, tick(START, 0))
+    assert stack.receiver.requests == []
+    assert len(stack.state().outbox) == 1
+
+    stack.run(settings, tick(START, 1))
+
+    timestamps = [ts for _, ts in stack.receiver.values(GOOD)]
+    assert timestamps == [timestamp_ms(tick(START, 0)), timestamp_ms(tick(START, 1))]
+    assert stack.state().outbox == ()
+    assert stack.receiver.values(TOTAL) == [
+        (1.0, timestamp_ms(tick(START, 0))),
+        (1.0, timestamp_ms(tick(START, 1))),
+    ]
+
+
+def test_failing_target_and_native_histogram_over_remote_write_v2(
+    stack: LocalStack,
+) -> None:
+    settings = stack.settings(
+        extra_targets=2, remote_write_version="2.0", histogram_mode="native"
+    )
+    stack.targets.statuses["t1"] = 503
+
+    stack.run(settings, tick(START, 0))
+
+    assert {
+        series.labels["test"]: series.samples[0][0]
+        for series in stack.receiver.series(GOOD)
+    } == {"primary": 1.0, "t0": 1.0, "t1": 0.0}
+    histograms = {
+        series.labels["test"]: series.histograms[0][0]
+        for series in stack.receiver.series("chaos_app_external_latency_seconds")
+    }
+    assert histograms == {"primary": 1, "t0": 1, "t1": 0}
+
+
+def test_warm_invocations_reuse_the_token(stack: LocalStack) -> None:
+    settings = stack.settings()
+    for windows in range(3):
+        stack.run(settings, tick(START, windows))
+    assert stack.credential.calls == 1
+
+
+def test_latency_quantiles_span_windows_and_runs(stack: LocalStack) -> None:
+    settings = stack.settings(extra_targets=1, latency_sketch_windows=3)
+    stack.targets.statuses["t0"] = 503
+
+    for windows in range(4):
+        stack.targets.delays["primary"] = 0.01 * (windows + 1)
+        stack.run(settings, tick(START, windows))
+
+    sketches = stack.state().latency_sketches
+    assert [sketch.count for _, sketch in sketches["primary"]] == [1, 1, 1]
+    assert [sketch.count for _, sketch in sketches["t0"]] == [0, 0, 0]
+    counts = stack.receiver.values(
+        "chaos_app_external_latency_sketch_count", test="primary"
+    )
+    assert [value for value, _ in counts] == [1.0, 2.0, 3.0, 3.0]
+    # The median of the last run covers the 0.02 / 0.03 / 0.04 s windows only.
+    *_, (p50, _) = stack.receiver.values(
+        "chaos_app_external_latency_quantile_seconds", test="primary", quantile="0.5"
+    )
+    assert 0.03 * 0.99 <= p50 < 0.04
+    assert not stack.receiver.series(
+        "chaos_app_external_latency_quantile_seconds", test="t0"
+    )
+
+
+def test_backfilled_outbox_entry_is_replayed_until_its_oldest_sample_expires(
+    stack: LocalStack,
+) -> None:
+    settings = stack.settings(backfill_max_age_seconds=1080, remote_write_attempts=1)
+    stack.run(settings, tick(START, 0))
+    stack.receiver.fail_next = [503, 503]
+
+    stack.run(settings, tick(START, 3))  # two missed windows backfilled, not sent
+    (first,) = stack.state().outbox
+    assert first.oldest_sample_at < first.created_at
+
+    stack.run(settings, tick(START, 4))  # replay fails again; a second entry queues
+    assert [entry.entry_id for entry in stack.state().outbox][0] == first.entry_id
+
+    # The first entry is less than 10 minutes old but its backfilled samples
+    # are past OldData: it is dropped instead of being sent and rejected.
+    now = first.oldest_sample_at + timedelta(minutes=20, seconds=1)
+    stack.run(settings, now)
+
+    oldest_accepted = timestamp_ms(now - timedelta(minutes=20))
+    sent = [
+        timestamp
+        for request in stack.receiver.requests[1:]
+        for series in request.series
+        for _, timestamp in series.samples
+    ]
+    assert sent and min(sent) >= oldest_accepted
+    assert stack.state().outbox == ()
@@ -0,0 +1,64 @@
+from __future__ import annotations
+
+from azure.core.credentials import AccessToken
+
+from external_sli_publisher.auth import CredentialCache
+
+
+class FakeCredential:
+    def __init__(self, clock: list[float]) -> None:
+        self.clock = clock
+        self.calls: list[str] = []
+
+    def get_token(self, *scopes: str, **_kwargs: object) -> AccessToken:
+        self.calls.append(scopes[0])
+        return AccessToken(f"token-{len(self.calls)}", int(self.clock[0]) + 3600)
+
+
+def cache(clock: list[float]) -> tuple[CredentialCache, list[FakeCredential]]:
+    created: list[FakeCredential] = []
+
+    def factory() -> FakeCredential:
+        created.append(FakeCredential(clock))
+        return created[-1]
+
+    return (
+        CredentialCache(
+            factory,
+            refresh_margin_seconds=300,
+            clock=lambda: clock[0],
+        ),
+        created,
+    )
+
+
+def test_token_is_reused_until_refresh_margin_before_expiry() -> None:
+    clock = [1000.0]
+    credentials, created = cache(clock)
+
+    assert credentials.token("scope") == "token-1"
+    clock[0] += 3000  # 600 s before expiry
+    assert credentials.token("scope") == "token-1"
+    clock[0] += 301  # inside the refresh margin
+    assert credentials.token("scope") == "token-2"
+
+    assert len(created) == 1
+    assert credentials.tokens_fetched == 2
+
+
+def test_clients_are_created_once_per_key_with_the_shared_credential() -> None:
+    credentials, created = cache([0.0])
+    built: list[object] = []
+
+    def factory(credential: object) -> object:
+        built.append(credential)
+        return object()
+
+    first = credentials.client("state", "https://a/blob", factory)
+    assert credentials.client("state", "https://a/blob", factory) is first
+    assert credentials.client("state", "https://b/blob", factory) is not first
+
+    assert built == [created[0], created[0]]
+    credentials.clear()
+    credentials.client("state", "https://a/blob", factory)
+    assert credentials.credentials_created == 2
@@ -0,0 +1,364 @@
+from __future__ import annotations
+
+import math
+import random
+from typing import Any
+
+import pytest
+
+from external_sli_publisher.encoding import (
+    PayloadBuffers,
+    SeriesLabels,
+    encode_label_block,
+    encode_series,
+    encode_varint,
+    encode_write_request,
+    encode_write_request_into,
+    encode_write_request_v2,
+    encode_write_request_v2_into,
+    label_key,
+)
+from external_sli_publisher.histogram import native_histogram
+
+descriptor_pb2 = pytest.importorskip("google.protobuf.descriptor_pb2")
+descriptor_pool = pytest.importorskip("google.protobuf.descriptor_pool")
+message_factory = pytest.importorskip("google.protobuf.message_factory")
+
+
+def _message_class(
+    package: str,
+    root: str,
+    messages: dict[str, tuple[tuple[str, int, str, int, str], ...]],
+) -> Any:
+    """Build a message class from a .proto shape (reference decoder)."""
+    file_proto = descriptor_pb2.FileDescriptorProto(
+        name=f"{package}_test.proto", package=package, syntax="proto3"
+    )
+    field = descriptor_pb2.FieldDescriptorProto
+    for name, fields in messages.items():
+        proto = file_proto.message_type.add(name=name)
+        for field_name, number, label, field_type, type_name in fields:
+            added = proto.field.add(
+                name=field_name,
+                number=number,
+                label=field.LABEL_REPEATED
+                if label == "repeated"
+                else field.LABEL_OPTIONAL,
+                type=field_type,
+            )
+            if type_name:
+                added.type_name = f".{package}.{type_name}"
+    pool = descriptor_pool.DescriptorPool()
+    pool.Add(file_proto)
+    return message_factory.GetMessageClass(
+        pool.FindMessageTypeByName(f"{package}.{root}")
+    )
+
+
+_F = descriptor_pb2.FieldDescriptorProto
+_SAMPLE = (
+    ("value", 1, "optional", _F.TYPE_DOUBLE, ""),
+    ("timestamp", 2, "optional", _F.TYPE_INT64, ""),
+)
+_BUCKET_SPAN = (
+    ("offset", 1, "optional", _F.TYPE_SINT32, ""),
+    ("length", 2, "optional", _F.TYPE_UINT32, ""),
+)
+_HISTOGRAM = (
+    ("count_int", 1, "optional", _F.TYPE_UINT64, ""),
+    ("sum", 3, "optional", _F.TYPE_DOUBLE, ""),
+    ("schema", 4, "optional", _F.TYPE_SINT32, ""),
+    ("zero_threshold", 5, "optional", _F.TYPE_DOUBLE, ""),
+    ("zero_count_int", 6, "optional", _F.TYPE_UINT64, ""),
+    ("positive_spans", 11, "repeated", _F.TYPE_MESSAGE, "BucketSpan"),
+    ("positive_deltas", 12, "repeated", _F.TYPE_SINT64, ""),
+    ("reset_hint", 14, "optional", _F.TYPE_INT32, ""),
+    ("timestamp", 15, "optional", _F.TYPE_INT64, ""),
+)
+WriteRequestV2 = _message_class(
+    "io.prometheus.write.v2",
+    "Request",
+    {
+        "Sample": _SAMPLE,
+        "BucketSpan": _BUCKET_SPAN,
+        "Histogram": _HISTOGRAM,
+        "Metadata": (("type", 1, "optional", _F.TYPE_INT32, ""),),
+        "TimeSeries": (
+            ("labels_refs", 1, "repeated", _F.TYPE_UINT32, ""),
+            ("samples", 2, "repeated", _F.TYPE_MESSAGE, "Sample"),
+            ("histograms", 3, "repeated", _F.TYPE_MESSAGE, "Histogram"),
+            ("metadata", 5, "optional", _F.TYPE_MESSAGE, "Metadata"),
+        ),
+        "Request": (
+            ("symbols", 4, "repeated", _F.TYPE_STRING, ""),
+            ("timeseries", 5, "repeated", _F.TYPE_MESSAGE, "TimeSeries"),
+        ),
+    },
+)
+
+
+def _write_request_class() -> Any:
+    """Build prometheus.WriteRequest from its .proto shape (reference decoder)."""
+    file_proto = descriptor_pb2.FileDescriptorProto(
+        name="remote_test.proto", package="prometheus", syntax="proto3"
+    )
+    field = descriptor_pb2.FieldDescriptorProto
+    optional, repeated = field.LABEL_OPTIONAL, field.LABEL_REPEATED
+
+    def message(name: str, *fields: tuple[str, int, int, int, str]) -> None:
+        proto = file_proto.message_type.add(name=name)
+        for field_name, number, label, field_type, type_name in fields:
+            added = proto.field.add(
+                name=field_name, number=number, label=label, type=field_type
+            )
+            if type_name:
+                added.type_name = type_name
+
+    message(
+        "Label",
+        ("name", 1, optional, field.TYPE_STRING, ""),
+        ("value", 2, optional, field.TYPE_STRING, ""),
+    )
+    message(
+        "Sample",
+        ("value", 1, optional, field.TYPE_DOUBLE, ""),
+        ("timestamp", 2, optional, field.TYPE_INT64, ""),
+    )
+    message(
+        "TimeSeries",
+        ("labels", 1, repeated, field.TYPE_MESSAGE, ".prometheus.Label"),
+        ("samples", 2, repeated, field.TYPE_MESSAGE, ".prometheus.Sample"),
+    )
+    message(
+        "WriteRequest",
+        ("timeseries", 1, repeated, field.TYPE_MESSAGE, ".prometheus.TimeSeries"),
+    )
+    pool = descriptor_pool.DescriptorPool()
+    pool.Add(file_proto)
+    return message_factory.GetMessageClass(
+        pool.FindMessageTypeByName("prometheus.WriteRequest")
+    )
+
+
+WriteRequest = _write_request_class()
+WriteRequestWithHistograms = _message_class(
+    "prometheus",
+    "WriteRequest",
+    {
+        "Label": (
+            ("name", 1, "optional", _F.TYPE_STRING, ""),
+            ("value", 2, "optional", _F.TYPE_STRING, ""),
+        ),
+        "Sample": _SAMPLE,
+        "BucketSpan": _BUCKET_SPAN,
+        "Histogram": _HISTOGRAM,
+        "TimeSeries": (
+            ("labels", 1, "repeated", _F.TYPE_MESSAGE, "Label"),
+            ("samples", 2, "repeated", _F.TYPE_MESSAGE, "Sample"),
+            ("histograms", 4, "repeated", _F.TYPE_MESSAGE, "Histogram"),
+        ),
+        "WriteRequest": (("timeseries", 1, "repeated", _F.TYPE_MESSAGE, "TimeSeries"),),
+    },
+)
+
+
+def decode(payload: bytes) -> list[tuple[dict[str, str], list[tuple[float, int]]]]:
+    request = WriteRequest()
+    request.ParseFromString(payload)
+    return [
+        (
+            {label.name: label.value for label in series.labels},
+            [(sample.value, sample.timestamp) for sample in series.samples],
+        )
+        for series in request.timeseries
+    ]
+
+
+def test_round_trip_groups_samples_per_series_in_timestamp_order() -> None:
+    labels = {"service": "chaos-app", "test": "probe"}
+    payload = encode_write_request(
+        [
+            ("up", labels, 1.0, 2000),
+            ("latency_good", {**labels, "le": "0.1"}, 0.0, 1000),
+            ("up", labels, 0.0, 1000),
+        ]
+    )
+
+    assert decode(payload) == [
+        ({"__name__": "up", **labels}, [(0.0, 1000), (1.0, 2000)]),
+        ({"__name__": "latency_good", **labels, "le": "0.1"}, [(0.0, 1000)]),
+    ]
+
+
+def decode_v2(
+    payload: bytes,
+) -> list[tuple[dict[str, str], list[tuple[float, int]], int]]:
+    request = WriteRequestV2()
+    request.ParseFromString(payload)
+    symbols = list(request.symbols)
+    assert symbols[0] == ""
+    assert len(set(symbols)) == len(symbols)  # every string interned once
+    decoded = []
+    for series in request.timeseries:
+        refs = list(series.labels_refs)
+        labels = {
+            symbols[refs[index]]: symbols[refs[index + 1]]
+            for index in range(0, len(refs), 2)
+        }
+        samples = [(sample.value, sample.timestamp) for sample in series.samples]
+        decoded.append((labels, samples, series.metadata.type))
+    return decoded
+
+
+def test_v2_round_trip_interns_symbols_and_marks_gauges() -> None:
+    labels = {"service": "chaos-app", "test": "probe"}
+    samples = [
+        ("up", labels, 1.0, 2000),
+        ("up", labels, 0.0, 1000),
+        ("latency_good", {**labels, "le": "0.1"}, 0.5, 1000),
+    ]
+
+    assert decode_v2(encode_write_request_v2(samples)) == [
+        ({"__name__": "up", **labels}, [(0.0, 1000), (1.0, 2000)], 2),
+        ({"__name__": "latency_good", **labels, "le": "0.1"}, [(0.5, 1000)], 2),
+    ]
+
+
+@pytest.mark.parametrize("seed", range(10))
+def test_v2_fuzz_matches_v1_content(seed: int) -> None:
+    rng = random.Random(seed)
+    samples = [
+        (
+            f"metric_{rng.randint(0, 4)}",
+            {f"l{i}": _random_label_value(rng) for i in range(rng.randint(0, 4))},
+            rng.uniform(-1e6, 1e6),
+            rng.randint(0, 2**41),
+        )
+        for _ in range(rng.randint(0, 30))
+    ]
+    v1 = decode(encode_write_request(samples))
+    v2 = decode_v2(encode_write_request_v2(samples))
+    assert [(labels, points) for labels, points, _ in v2] == v1
+
+
+def test_label_block_is_sorted_and_cached() -> None:
+    key = label_key("m", {"z": "1", "a": "2"})
+    assert [name for name, _ in key] == ["__name__", "a", "z"]
+    assert encode_label_block(key) is encode_label_block(key)
+
+
+def test_series_labels_memoize_key_and_encode_like_plain_dicts() -> None:
+    labels = SeriesLabels({"z": "1", "a": "2"})
+    key = labels.key("m")
+    assert labels.key("m") is key
+    assert key == label_key("m", {"z": "1", "a": "2"})
+    assert key.block == encode_label_block(label_key("m", {"a": "2", "z": "1"}))
+    assert dict(labels) == {"z": "1", "a": "2"}
+
+    samples = [("m", labels, 1.0, 2), ("n", labels, 3.0, 4), ("m", labels, 5.0, 1)]
+    plain = [(name, dict(lbl), value, ts) for name, lbl, value, ts in samples]
+    assert encode_write_request(samples) == encode_write_request(plain)
+    assert encode_write_request_v2(samples) == encode_write_request_v2(plain)
+
+
+def test_encoding_into_buffers_reuses_them_and_matches_bytes() -> None:
+    buffers = PayloadBuffers()
+    large = [("m", {"i": str(i)}, float(i), i) for i in range(50)]
+    small = large[:3]
+
+    with encode_write_request_into(large, buffers) as view:
+        assert view.obj is buffers.raw
+        assert view == encode_write_request(large)
+    raw = buffers.raw
+    with encode_write_request_v2_into(small, buffers) as view:
+        assert view == encode_write_request_v2(small)
+    assert buffers.raw is raw
+
+    # Growing never resizes a buffer that a live view still points into.
+    kept = encode_write_request_into(small, buffers)
+    with encode_write_request_into(large * 3, buffers):
+        assert buffers.raw is not raw
+    assert kept == encode_write_request(small)
+
+
+def test_varint_matches_protobuf_for_boundaries_and_negative_int64() -> None:
+    for value in (0, 1, 127, 128, 16383, 16384, 2**35, 2**63 - 1):
+        assert decode(encode_series([(label_key("m", {}), [(0.0, value)])])) == [
+            ({"__name__": "m"}, [(0.0, value)])
+        ]
+    assert decode(encode_series([(label_key("m", {}), [(0.0, -5)])]))[0][1] == [
+        (0.0, -5)
+    ]
+    assert encode_varint(300) == b"\xac\x02"
+
+
+def _random_label_value(rng: random.Random) -> str:
+    alphabet = "abcxyz_-/.: é日本🙂"
+    return "".join(rng.choice(alphabet) for _ in range(rng.choice([0, 1, 5, 200])))
+
+
+@pytest.mark.parametrize("seed", range(20))
+def test_fuzz_round_trip_against_reference_decoder(seed: int) -> None:
+    rng = random.Random(seed)
+    expected: dict[tuple[tuple[str, str], ...], list[tuple[float, int]]] = {}
+    samples = []
+    for _ in range(rng.randint(0, 40)):
+        name = f"metric_{rng.randint(0, 6)}"
+        labels = {
+            f"label_{index}": _random_label_value(rng)
+            for index in range(rng.randint(0, 5))
+        }
+        value = rng.choice(
+            [0.0, -0.0, 1.0, rng.uniform(-1e12, 1e12), math.inf, -math.inf, 5e-324]
+        )
+        timestamp = rng.choice([0, rng.randint(0, 2**41), 2**63 - 1])
+        samples.append((name, labels, value, timestamp))
+        expected.setdefault(label_key(name, labels), []).append((value, timestamp))
+
+    decoded = decode(encode_write_request(samples))
+
+    assert [labels for labels, _ in decoded] == [dict(key) for key in expected]
+    for (_, points), key in zip(decoded, expected, strict=True):
+        assert points == sorted(expected[key], key=lambda point: point[1])
+
+
+def _histogram_fields(message: Any) -> dict[str, Any]:
+    return {
+        "count": message.count_int,
+        "sum": message.sum,
+        "schema": message.schema,
+        "zero_count": message.zero_count_int,
+        "spans": [(span.offset, span.length) for span in message.positive_spans],
+        "deltas": list(message.positive_deltas),
+        "reset_hint": message.reset_hint,
+        "timestamp": message.timestamp,
+    }
+
+
+def test_native_histogram_round_trips_in_v1_and_v2() -> None:
+    labels = {"service": "chaos-app"}
+    histogram = native_histogram([0.0, 0.12, 0.13, 0.5, 2.4], schema=-1)
+    samples = [
+        ("up", labels, 1.0, 1000),
+        ("latency_seconds", labels, histogram, 1000),
+    ]
+    expected = {
+        "count": 5,
+        "sum": pytest.approx(3.15),
+        "schema": -1,
+        "zero_count": 1,
+        "spans": list(histogram.positive_spans),
+        "deltas": list(histogram.positive_deltas),
+        "reset_hint": 3,
+        "timestamp": 1000,
+    }
+
+    v1 = WriteRequestWithHistograms()
+    v1.ParseFromString(encode_write_request(samples))
+    assert [len(series.samples) for series in v1.timeseries] == [1, 0]
+    assert _histogram_fields(v1.timeseries[1].histograms[0]) == expected
+
+    v2 = WriteRequestV2()
+    v2.ParseFromString(encode_write_request_v2(samples))
+    assert [series.metadata.type for series in v2.timeseries] == [2, 4]
+    assert _histogram_fields(v2.timeseries[1].histograms[0]) == expected
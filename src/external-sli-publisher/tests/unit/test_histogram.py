@@ -0,0 +1,60 @@
+from __future__ import annotations
+
+import math
+
+import pytest
+
+from external_sli_publisher.histogram import (
+    classic_bucket_counts,
+    native_bucket_index,
+    native_histogram,
+)
+
+
+def _reference_index(value: float, schema: int) -> int:
+    base = 2.0 ** (2.0**-schema)
+    return math.ceil(math.log(value, base) - 1e-9)
+
+
+@pytest.mark.parametrize("schema", [-4, -1, 0, 1, 3, 8])
+def test_bucket_index_matches_definition(schema: int) -> None:
+    for value in (0.001, 0.0123, 0.1, 0.25, 0.3, 1.0, 1.7, 2.0, 5.5, 30.0):
+        index = native_bucket_index(value, schema)
+        assert index == _reference_index(value, schema)
+        base = 2.0 ** (2.0**-schema)
+        assert base ** (index - 1) < value <= base**index * (1 + 1e-12)
+
+
+def test_exact_boundaries_belong_to_the_lower_bucket() -> None:
+    # 0.5 = 2**-1 is the upper bound of bucket -8 at schema 3, -1 at schema 0.
+    assert native_bucket_index(0.5, 3) == -8
+    assert native_bucket_index(0.5, 0) == -1
+    assert native_bucket_index(1.0, 0) == 0
+    assert native_bucket_index(4.0, -1) == 1
+
+
+def test_native_histogram_is_sparse_with_delta_counts() -> None:
+    values = [0.0, 1.0, 1.0, 2.0, 16.0]
+    histogram = native_histogram(values, schema=0)
+
+    assert histogram.count == 5
+    assert histogram.sum == 20.0
+    assert histogram.zero_count == 1
+    # buckets 0 (1.0 x2), 1 (2.0), gap, 4 (16.0)
+    assert histogram.positive_spans == ((0, 2), (2, 1))
+    assert histogram.positive_deltas == (2, -1, 0)
+    assert histogram.bucket_counts() == {0: 2, 1: 1, 4: 1}
+
+
+def test_empty_native_histogram_has_no_buckets() -> None:
+    histogram = native_histogram([], schema=3)
+    assert (histogram.count, histogram.positive_spans) == (0, ())
+
+
+def test_classic_bucket_counts_are_cumulative_with_inf() -> None:
+    assert classic_bucket_counts([0.05, 0.2, 0.2, 3.0], [0.1, 0.25, 1.0]) == [
+        1,
+        3,
+        3,
+        4,
+    ]
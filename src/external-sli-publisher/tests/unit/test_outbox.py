@@ -0,0 +1,124 @@
+from __future__ import annotations
+
+import random
+import urllib.error
+from datetime import UTC, datetime, timedelta
+from email.message import Message
+
+import pytest
+
+from external_sli_publisher.outbox import (
+    OUTBOX_MAX_ENTRIES,
+    OutboxEntry,
+    PermanentSendError,
+    RetryPolicy,
+    drain_outbox,
+    prune_outbox,
+    send_with_retry,
+)
+
+NOW = datetime(2026, 5, 19, 16, 52, 9, tzinfo=UTC)
+
+
+def http_error(code: int) -> urllib.error.HTTPError:
+    return urllib.error.HTTPError(
+        "https://example.test/write", code, "", Message(), None
+    )
+
+
+def entry(minutes_ago: int, payload: bytes = b"\x00snappy") -> OutboxEntry:
+    return OutboxEntry.create(payload, "1.0", NOW - timedelta(minutes=minutes_ago))
+
+
+def test_send_with_retry_retries_transient_errors_with_bounded_jitter() -> None:
+    calls: list[int] = []
+    sleeps: list[float] = []
+
+    def flaky() -> None:
+        calls.append(1)
+        if len(calls) < 3:
+            raise http_error(503)
+
+    policy = RetryPolicy(attempts=3, base_delay_seconds=0.5, max_delay_seconds=0.8)
+    send_with_retry(flaky, policy, sleep=sleeps.append, rng=random.Random(1))
+
+    assert len(calls) == 3
+    assert len(sleeps) == 2
+    assert 0 <= sleeps[0] <= 0.5
+    assert 0 <= sleeps[1] <= 0.8  # capped below base * 2
+
+
+def test_send_with_retry_does_not_retry_rejected_payloads() -> None:
+    calls: list[int] = []
+
+    def rejected() -> None:
+        calls.append(1)
+        raise http_error(400)
+
+    with pytest.raises(PermanentSendError):
+        send_with_retry(rejected, RetryPolicy(), sleep=lambda _: None)
+    assert len(calls) == 1
+
+
+def test_drain_sends_oldest_first_and_stops_at_first_exhausted_entry() -> None:
+    first, second, third = entry(3, b"1"), entry(2, b"2"), entry(1, b"3")
+    sent: list[bytes] = []
+
+    def send(item: OutboxEntry) -> None:
+        if item.payload == b"2":
+            raise urllib.error.URLError("connection refused")
+        sent.append(item.payload)
+
+    pending = drain_outbox(
+        [first, second, third], send, RetryPolicy(attempts=2), sleep=lambda _: None
+    )
+
+    assert sent == [b"1"]
+    assert [item.payload for item in pending] == [b"2", b"3"]
+    assert pending[0].attempts == 2
+    assert pending[1] == third
+
+
+def test_drain_drops_permanently_rejected_entries() -> None:
+    rejected, accepted = entry(2, b"bad"), entry(1, b"good")
+    sent: list[bytes] = []
+
+    def send(item: OutboxEntry) -> None:
+        if item.payload == b"bad":
+            raise http_error(400)
+        sent.append(item.payload)
+
+    assert drain_outbox([rejected, accepted], send, RetryPolicy()) == []
+    assert sent == [b"good"]
+
+
+def test_prune_drops_old_data_and_caps_entry_count() -> None:
+    fresh = entry(5)
+    assert prune_outbox([entry(25), fresh], NOW) == [fresh]
+
+    many = [entry(0, bytes([index])) for index in range(OUTBOX_MAX_ENTRIES + 3)]
+    kept = prune_outbox(many, NOW)
+    assert len(kept) == OUTBOX_MAX_ENTRIES
+    assert kept[0].payload == bytes([3])
+
+
+def test_prune_ages_entries_by_their_oldest_sample() -> None:
+    backfilled = OutboxEntry.create(
+        b"\x00snappy",
+        "1.0",
+        NOW - timedelta(minutes=5),
+        NOW - timedelta(minutes=21),
+    )
+    assert prune_outbox([backfilled], NOW) == []
+
+
+def test_entry_json_keeps_oldest_sample_and_defaults_it_for_old_entries() -> None:
+    created = NOW - timedelta(minutes=1)
+    backfilled = OutboxEntry.create(b"p", "2.0", created, NOW - timedelta(minutes=15))
+
+    value = backfilled.to_json(datetime.isoformat)
+    assert OutboxEntry.from_json(value, datetime.fromisoformat) == backfilled
+    del value["oldest_sample_at"]
+    assert OutboxEntry.from_json(value, datetime.fromisoformat).oldest_sample_at == (
+        created
+    )
@@ -1,5 +1,7 @@
 from __future__ import annotations
 
+import threading
+import time
 import urllib.error
 import urllib.request
 from datetime import UTC, datetime
@@ -8,20 +10,38 @@ from typing import Any
 
 import pytest
 
+from external_sli_publisher.encoding import encode_write_request
+from external_sli_publisher.histogram import NativeHistogram
 from external_sli_publisher.publisher import (
+    LATENCY_BUCKETS,
+    MetricSample,
     ProbeResult,
+    ProbeTarget,
     Settings,
     Window,
+    build_publish_samples,
     combine_sli_samples,
+    compress_snappy_raw,
+    encode_remote_write_payload,
+    env_int,
     heartbeat_sample,
+    latency_quantile_samples,
     metric_samples,
     missed_window_samples,
+    parse_histogram_buckets,
+    parse_probe_targets,
     parse_state_datetime,
+    payload_buffers,
+    probe_all_targets,
     probe_endpoint,
     probe_result_to_sli_samples,
+    probe_results_to_sli_samples,
+    publish_remote_write_samples,
     target_window,
+    update_latency_sketches,
     windows_to_publish,
 )
+from external_sli_publisher.sketch import DDSketch
 
 
 class FakeResponse:
@@ -240,6 +260,231 @@ def test_probe_url_error_marks_all_latency_buckets_as_bad() -> None:
     assert all(value == 0 for value in samples.latency_buckets.values())
 
 
+def test_settings_rejects_probe_rounds_longer_than_window() -> None:
+    # 4 probes / concurrency 2 = 2 rounds x 10s timeout does not fit a 20s window
+    with pytest.raises(RuntimeError, match="EXTERNAL_SLI_WINDOW_SECONDS"):
+        settings(window_seconds=20, probe_count=4, probe_concurrency=2)
+    with pytest.raises(RuntimeError, match="greater than zero"):
+        settings(probe_count=0)
+
+
+def test_probe_all_targets_bounds_concurrency_and_keeps_every_result() -> None:
+    lock = threading.Lock()
+    in_flight = 0
+    peak = 0
+    calls = 0
+
+    def urlopen(*_args: object, **_kwargs: object) -> FakeResponse:
+        nonlocal in_flight, peak, calls
+        with lock:
+            in_flight += 1
+            calls += 1
+            peak = max(peak, in_flight)
+            status = 503 if calls % 4 == 0 else 200
+        time.sleep(0.01)
+        with lock:
+            in_flight -= 1
+        return FakeResponse(status)
+
+    cfg = settings(probe_count=8, probe_concurrency=3)
+    results = probe_all_targets(cfg, urlopen=urlopen)[cfg.primary_target]
+
+    assert len(results) == 8
+    assert 1 < peak <= 3
+    samples = probe_results_to_sli_samples(results, settings())
+    assert samples.availability_good == 6
+    assert samples.availability_total == 8
+    assert samples.latency_total == 8
+
+
+def test_parse_probe_targets_accepts_name_url_pairs() -> None:
+    assert parse_probe_targets(
+        " health=https://chaos.example.test/health?x=1 , ,west=http://w.test/"
+    ) == (
+        ProbeTarget(name="health", url="https://chaos.example.test/health?x=1"),
+        ProbeTarget(name="west", url="http://w.test/"),
+    )
+    assert parse_probe_targets("") == ()
+    with pytest.raises(RuntimeError, match="name=url"):
+        parse_probe_targets("https://missing-name.test/")
+
+
+def test_settings_rejects_duplicate_target_names() -> None:
+    with pytest.raises(RuntimeError, match="unique"):
+        settings(
+            extra_probe_targets=(ProbeTarget("chaos-app-health", "https://x.test/"),)
+        )
+
+
+def test_probe_all_targets_groups_results_and_labels_series_per_target() -> None:
+    health = ProbeTarget(
+        name="chaos-app-livez", url="https://chaos.example.test/health"
+    )
+    cfg = settings(extra_probe_targets=(health,), probe_count=2, probe_concurrency=4)
+
+    def urlopen(request: urllib.request.Request, **_kwargs: object) -> FakeResponse:
+        return FakeResponse(503 if request.full_url.endswith("/health") else 200)
+
+    results = probe_all_targets(cfg, urlopen=urlopen)
+
+    assert list(results) == [cfg.primary_target, health]
+    assert [r.status_code for r in results[cfg.primary_target]] == [200, 200]
+    assert [r.status_code for r in results[health]] == [503, 503]
+
+    sample_time = datetime(2026, 5, 19, 16, 52, 9, tzinfo=UTC)
+    samples = metric_samples(
+        probe_results_to_sli_samples(results[health], cfg), cfg, sample_time, health
+    )
+    assert {labels["test"] for _, labels, _, _ in samples} == {"chaos-app-livez"}
+
+
+def test_probe_phases_become_per_phase_bucketed_series() -> None:
+    cfg = settings()
+    fresh = ProbeResult(
+        success=True,
+        status_code=200,
+        duration_ms=120,
+        phases={"dns": 30.0, "connect": 20.0, "ttfb": 60.0, "body": 1.0},
+    )
+    reused = ProbeResult(
+        success=True,
+        status_code=200,
+        duration_ms=70,
+        phases={"ttfb": 600.0, "body": 1.0},
+    )
+    combined = probe_results_to_sli_samples([fresh, reused], cfg)
+
+    assert combined.phase_totals == {"dns": 1, "connect": 1, "ttfb": 2, "body": 2}
+    assert combined.phase_buckets["dns"]["0.025"] == 0
+    assert combined.phase_buckets["dns"]["0.05"] == 1
+    assert combined.phase_buckets["ttfb"]["0.1"] == 1
+    assert combined.phase_buckets["ttfb"]["1"] == 2
+
+    samples = metric_samples(
+        combined, cfg, datetime(2026, 5, 19, 16, 52, 9, tzinfo=UTC)
+    )
+    phase_totals = {
+        labels["phase"]: value
+        for name, labels, value, _ in samples
+        if name == "chaos_app_external_phase_latency_total"
+    }
+    # every phase is emitted once any phase was measured; tls stays 0 for HTTP
+    assert phase_totals == {
+        "dns": 1.0,
+        "connect": 1.0,
+        "tls": 0.0,
+        "ttfb": 2.0,
+        "body": 2.0,
+    }
+
+
+def test_failed_probe_phases_are_not_counted() -> None:
+    result = ProbeResult(
+        success=False, status_code=503, duration_ms=10, phases={"ttfb": 5.0}
+    )
+    samples = probe_result_to_sli_samples(result, settings())
+    assert samples.phase_totals == {}
+    assert not any(
+        name.startswith("chaos_app_external_phase")
+        for name, *_ in metric_samples(
+            samples, settings(), datetime(2026, 5, 19, tzinfo=UTC)
+        )
+    )
+
+
+def _windows(*minutes: int) -> list[Window]:
+    return [
+        Window(
+            start=datetime(2026, 5, 19, 17, minute, tzinfo=UTC),
+            end=datetime(2026, 5, 19, 17, minute + 5, tzinfo=UTC),
+        )
+        for minute in minutes
+    ]
+
+
+def _availability_totals(samples: list[MetricSample]) -> list[tuple[float, int]]:
+    totals: list[tuple[float, int]] = []
+    for name, _labels, value, timestamp in samples:
+        if name == "chaos_app_external_availability_total":
+            assert isinstance(value, float | int)
+            totals.append((value, timestamp))
+    return totals
+
+
+def test_backfill_publishes_recent_missed_windows_at_their_own_timestamps() -> None:
+    cfg = settings(backfill_max_age_seconds=720, probe_count=2)
+    sample_time = datetime(2026, 5, 19, 17, 21, tzinfo=UTC)
+    results = {
+        cfg.primary_target: [
+            ProbeResult(success=True, status_code=200, duration_ms=50),
+            ProbeResult(success=True, status_code=200, duration_ms=50),
+        ]
+    }
+
+    samples, current = build_publish_samples(
+        cfg, _windows(0, 5, 10, 15), results, sample_time
+    )
+
+    assert samples[0][0] == "chaos_app_external_sli_publisher_heartbeat"
+    # window ending 17:05 is 16 min old -> folded (2 bad samples);
+    # windows ending 17:10 / 17:15 are within 12 min -> backfilled
+    assert current[cfg.primary_target].availability_total == 2 + 2
+    assert _availability_totals(samples) == [
+        (4.0, 1779211260000),  # 17:21
+        (2.0, 1779210600000),  # 17:10
+        (2.0, 1779210900000),  # 17:15
+    ]
+
+
+def test_backfill_disabled_folds_every_missed_window() -> None:
+    cfg = settings()
+    sample_time = datetime(2026, 5, 19, 17, 21, tzinfo=UTC)
+    results = {
+        cfg.primary_target: [ProbeResult(success=True, status_code=200, duration_ms=50)]
+    }
+
+    samples, current = build_publish_samples(
+        cfg, _windows(5, 10, 15), results, sample_time
+    )
+
+    assert current[cfg.primary_target].availability_total == 3
+    assert _availability_totals(samples) == [(3.0, 1779211260000)]
+
+
+def test_explicit_zero_missed_window_weight_is_not_the_default() -> None:
+    cfg = settings(probe_count=2)
+    sample_time = datetime(2026, 5, 19, 17, 21, tzinfo=UTC)
+    results = {
+        cfg.primary_target: [ProbeResult(success=True, status_code=200, duration_ms=50)]
+    }
+
+    _, current = build_publish_samples(
+        cfg, _windows(5, 10, 15), results, sample_time, missed_window_weight=0
+    )
+
+    assert current[cfg.primary_target].availability_total == 1
+
+
+def test_settings_rejects_backfill_beyond_old_data_limit() -> None:
+    with pytest.raises(RuntimeError, match="BACKFILL_MAX_AGE_SECONDS"):
+        settings(backfill_max_age_seconds=1200)
+    assert settings(backfill_max_age_seconds=1080).backfill_max_age_seconds == 1080
+
+
+def test_settings_rejects_unknown_remote_write_version() -> None:
+    with pytest.raises(RuntimeError, match="REMOTE_WRITE_VERSION"):
+        settings(remote_write_version="3.0")
+
+
+def test_env_int_minimum_allows_zero_when_requested(
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    monkeypatch.setenv("EXTERNAL_SLI_BACKFILL_MAX_AGE_SECONDS", "0")
+    assert env_int("EXTERNAL_SLI_BACKFILL_MAX_AGE_SECONDS", 5, minimum=0) == 0
+    with pytest.raises(RuntimeError, match="greater than zero"):
+        env_int("EXTERNAL_SLI_BACKFILL_MAX_AGE_SECONDS", 5)
+
+
 def test_missed_windows_are_bad_and_combined_with_current_probe() -> None:
     combined = combine_sli_samples(
         [
@@ -344,3 +589,159 @@ def test_heartbeat_sample_uses_current_publish_timestamp() -> None:
 )
 def test_parse_state_datetime(value: str, expected: datetime) -> None:
     assert parse_state_datetime(value) == expected
+
+
+def test_classic_histogram_mode_adds_bucket_sum_and_count_series() -> None:
+    config = settings(histogram_mode="classic", histogram_buckets=(0.1, 0.3))
+    sli = probe_results_to_sli_samples(
+        [
+            ProbeResult(success=True, status_code=200, duration_ms=80),
+            ProbeResult(success=True, status_code=200, duration_ms=250),
+            ProbeResult(success=False, status_code=503, duration_ms=20),
+        ],
+        config,
+    )
+
+    samples = metric_samples(sli, config, datetime(2026, 5, 19, tzinfo=UTC))
+    histogram = {
+        (name, labels.get("le")): value
+        for name, labels, value, _ in samples
+        if name.startswith("chaos_app_external_latency_seconds")
+    }
+
+    assert histogram == {
+        ("chaos_app_external_latency_seconds_bucket", "0.1"): 1.0,
+        ("chaos_app_external_latency_seconds_bucket", "0.3"): 2.0,
+        ("chaos_app_external_latency_seconds_bucket", "+Inf"): 2.0,
+        ("chaos_app_external_latency_seconds_sum", None): pytest.approx(0.33),
+        ("chaos_app_external_latency_seconds_count", None): 2.0,
+    }
+    # The failed probe is still a bad Latency SLI event via the total.
+    assert sli.latency_total == 3
+
+
+def test_native_histogram_mode_emits_one_histogram_sample() -> None:
+    config = settings(histogram_mode="native", native_histogram_schema=0)
+    sli = probe_results_to_sli_samples(
+        [ProbeResult(success=True, status_code=200, duration_ms=1000)], config
+    )
+
+    samples = metric_samples(sli, config, datetime(2026, 5, 19, tzinfo=UTC))
+    (native,) = [
+        value
+        for name, _, value, _ in samples
+        if name == "chaos_app_external_latency_seconds"
+    ]
+
+    assert isinstance(native, NativeHistogram)
+    assert native.bucket_counts() == {0: 1}
+    assert not any(name.endswith("_bucket") for name, *_ in samples)
+
+
+def test_buckets_mode_emits_no_histogram_series() -> None:
+    sli = probe_results_to_sli_samples(
+        [ProbeResult(success=True, status_code=200, duration_ms=100)], settings()
+    )
+    samples = metric_samples(sli, settings(), datetime(2026, 5, 19, tzinfo=UTC))
+    assert not any("latency_seconds" in name for name, *_ in samples)
+
+
+def test_settings_validate_histogram_options() -> None:
+    assert parse_histogram_buckets("0.05, 0.1,0.2") == (0.05, 0.1, 0.2)
+    with pytest.raises(RuntimeError, match="HISTOGRAM_MODE"):
+        settings(histogram_mode="summary")
+    with pytest.raises(RuntimeError, match="strictly increasing"):
+        settings(histogram_mode="classic", histogram_buckets=(0.2, 0.1))
+    with pytest.raises(RuntimeError, match="SCHEMA"):
+        settings(histogram_mode="native", native_histogram_schema=9)
+
+
+def test_latency_sketches_keep_the_configured_number_of_windows() -> None:
+    config = settings(latency_sketch_windows=2)
+    primary = config.probe_targets[0]
+    ends = [datetime(2026, 5, 19, 16, minute, tzinfo=UTC) for minute in (5, 10, 15)]
+    sketches: dict[str, tuple[tuple[datetime, DDSketch], ...]] = {
+        "retired": ((ends[0], DDSketch.of([1.0])),)
+    }
+
+    for end, duration_ms in zip(ends, (100, 200, 400), strict=True):
+        sli = probe_results_to_sli_samples(
+            [ProbeResult(success=True, status_code=200, duration_ms=duration_ms)] * 50,
+            config,
+        )
+        sketches = update_latency_sketches(sketches, {primary: sli}, end, config)
+
+    assert list(sketches) == [primary.name]
+    assert [end for end, _ in sketches[primary.name]] == ends[1:]
+    samples = latency_quantile_samples(sketches[primary.name], config, ends[2], primary)
+    values = {labels.get("quantile"): value for _, labels, value, _ in samples}
+    assert values[None] == 100.0
+    assert values["0.5"] == pytest.approx(0.2, rel=0.01)
+    assert values["0.99"] == pytest.approx(0.4, rel=0.01)
+    assert update_latency_sketches(sketches, {primary: sli}, ends[2], settings()) == {}
+
+
+def test_empty_latency_sketch_only_emits_the_count() -> None:
+    config = settings(latency_sketch_windows=1)
+    end = datetime(2026, 5, 19, 16, 5, tzinfo=UTC)
+    samples = latency_quantile_samples(
+        [(end, DDSketch())], config, end, config.probe_targets[0]
+    )
+    assert [(name, value) for name, _, value, _ in samples] == [
+        ("chaos_app_external_latency_sketch_count", 0.0)
+    ]
+
+
+def test_series_catalog_reuses_label_sets_across_publishes() -> None:
+    config = settings(
+        extra_probe_targets=(ProbeTarget(name="api", url="https://api.test/"),)
+    )
+    sli = probe_results_to_sli_samples(
+        [ProbeResult(success=True, status_code=200, duration_ms=100)], config
+    )
+    sample_time = datetime(2026, 5, 19, tzinfo=UTC)
+    api = config.probe_targets[1]
+
+    first = metric_samples(sli, config, sample_time, api)
+    second = metric_samples(sli, config, sample_time, api)
+
+    assert config.series_catalog is config.series_catalog
+    assert all(a[1] is b[1] for a, b in zip(first, second, strict=True))
+    assert first[3][1] == {
+        "environment": config.environment,
+        "service": config.service_name,
+        "source": "external_probe",
+        "test": "api",
+        "le": LATENCY_BUCKETS[0][0],
+    }
+    # Label sets outside the catalog are still built, just not cached.
+    assert config.series_catalog.labels("retired", ("le", "9")) == {
+        **config.series_catalog.labels("retired"),
+        "le": "9",
+    }
+
+
+def test_heartbeat_is_sent_from_reusable_compressed_buffer() -> None:
+    bodies: list[bytes] = []
+
+    def urlopen(request: urllib.request.Request, timeout: float) -> FakeResponse:
+        assert isinstance(request.data, memoryview)
+        bodies.append(bytes(request.data))
+        return FakeResponse(204)
+
+    config = settings()
+    sample_time = datetime(2026, 5, 19, tzinfo=UTC)
+    for _ in range(2):
+        publish_remote_write_samples(
+            "token", [heartbeat_sample(config, sample_time)], config, urlopen=urlopen
+        )
+
+    buffers = payload_buffers()
+    assert buffers.compressed.startswith(bodies[1])
+    assert bodies[0] == bodies[1]
+    assert bodies[0] == encode_remote_write_payload(
+        [heartbeat_sample(config, sample_time)], config
+    )
+    assert bodies[0] == compress_snappy_raw(
+        encode_write_request([heartbeat_sample(config, sample_time)])
+    )
@@ -0,0 +1,61 @@
+from __future__ import annotations
+
+import random
+
+import pytest
+
+from external_sli_publisher.sketch import DDSketch, merge_sketches
+
+
+def _exact_quantile(values: list[float], q: float) -> float:
+    ordered = sorted(values)
+    return ordered[int(q * (len(ordered) - 1))]
+
+
+@pytest.mark.parametrize("q", [0.0, 0.5, 0.9, 0.95, 0.99, 1.0])
+def test_quantiles_are_within_relative_accuracy(q: float) -> None:
+    rng = random.Random(46)
+    values = [rng.lognormvariate(-2.0, 1.0) for _ in range(5000)]
+
+    estimate = DDSketch.of(values).quantile(q)
+
+    exact = _exact_quantile(values, q)
+    assert estimate == pytest.approx(exact, rel=0.01)
+
+
+def test_merge_equals_sketch_of_the_union() -> None:
+    rng = random.Random(7)
+    first = [rng.uniform(0.01, 2.0) for _ in range(300)]
+    second = [rng.uniform(0.5, 9.0) for _ in range(200)] + [0.0]
+
+    merged = merge_sketches([DDSketch.of(first), DDSketch.of(second)])
+
+    assert merged == DDSketch.of(first + second)
+    assert merged.count == 501
+    assert merged.zero_count == 1
+
+
+def test_json_round_trip() -> None:
+    sketch = DDSketch.of([0.0, 0.1, 0.1, 0.25, 3.0])
+    assert DDSketch.from_json(sketch.to_json()) == sketch
+    assert DDSketch.from_json({}).quantile(0.5) is None
+
+
+def test_collapse_keeps_upper_quantiles_accurate() -> None:
+    values = [0.001 * 1.1**step for step in range(200)]
+    sketch = DDSketch(max_bins=50)
+    for value in values:
+        sketch.add(value)
+
+    assert len(sketch.bins) == 50
+    assert sketch.count == 200
+    assert sketch.quantile(0.99) == pytest.approx(
+        _exact_quantile(values, 0.99), rel=0.01
+    )
+
+
+def test_rejects_mismatched_accuracy_and_negative_values() -> None:
+    with pytest.raises(ValueError, match="accuracy"):
+        DDSketch().merge(DDSketch(relative_accuracy=0.02))
+    with pytest.raises(ValueError, match="non-negative"):
+        DDSketch().add(-1.0)
@@ -0,0 +1,162 @@
+from __future__ import annotations
+
+import importlib.util
+import json
+import sys
+from datetime import UTC, datetime
+from pathlib import Path
+from types import SimpleNamespace
+from typing import Any
+
+import pytest
+from azure.core import MatchConditions
+from azure.core.exceptions import (
+    ResourceExistsError,
+    ResourceModifiedError,
+    ResourceNotFoundError,
+)
+
+from external_sli_publisher import state as state_module
+from external_sli_publisher.outbox import OutboxEntry
+from external_sli_publisher.sketch import DDSketch
+from external_sli_publisher.state import (
+    BlobStateStore,
+    FileStateStore,
+    PublisherState,
+    StateConflictError,
+    state_store_for,
+)
+
+WINDOW_END = datetime(2026, 5, 19, 16, 50, tzinfo=UTC)
+
+
+class FakeDownload:
+    def __init__(self, data: bytes, etag: str) -> None:
+        self.data = data
+        self.properties = SimpleNamespace(etag=etag)
+
+    def readall(self) -> bytes:
+        return self.data
+
+
+class FakeBlob:
+    """Minimal BlobClient honouring overwrite / If-Match like the service."""
+
+    def __init__(self, data: bytes | None = None) -> None:
+        self.data = data
+        self.version = 0 if data is None else 1
+        self.uploads: list[dict[str, Any]] = []
+
+    def download_blob(self) -> FakeDownload:
+        if self.data is None:
+            raise ResourceNotFoundError("missing")
+        return FakeDownload(self.data, f'"{self.version}"')
+
+    def upload_blob(self, data: str, **kwargs: Any) -> dict[str, str]:
+        self.uploads.append(kwargs)
+        if not kwargs["overwrite"] and self.data is not None:
+            raise ResourceExistsError("exists")
+        if kwargs.get("match_condition") == MatchConditions.IfNotModified and (
+            kwargs["etag"] != f'"{self.version}"'
+        ):
+            raise ResourceModifiedError("precondition failed")
+        self.data = data.encode("utf-8")
+        self.version += 1
+        return {"etag": f'"{self.version}"'}
+
+
+def state_with_outbox() -> PublisherState:
+    entry = OutboxEntry.create(b"\xff\x00payload", "1.0", WINDOW_END)
+    return PublisherState(last_published_end=WINDOW_END, outbox=(entry,))
+
+
+def test_blob_store_round_trips_state_with_if_match() -> None:
+    blob = FakeBlob()
+    store = BlobStateStore(blob)  # ty: ignore[invalid-argument-type]
+    assert store.load().state == PublisherState()
+    state = state_with_outbox()
+
+    etag = store.save(state, None)
+    loaded = store.load()
+
+    assert loaded.state == state
+    assert loaded.etag == etag
+    assert blob.uploads[0] == {"overwrite": False}
+    store.save(PublisherState(last_published_end=WINDOW_END), loaded.etag)
+    assert blob.uploads[1]["etag"] == etag
+    assert json.loads(blob.data or b"") == {
+        "last_published_window_end": "2026-05-19T16:50:00Z"
+    }
+
+
+def test_blob_store_reads_legacy_state_without_outbox() -> None:
+    blob = FakeBlob(b'{"last_published_window_end": "2026-05-19T16:50:00Z"}')
+    loaded = BlobStateStore(blob).load()  # ty: ignore[invalid-argument-type]
+    assert loaded.state == PublisherState(last_published_end=WINDOW_END)
+
+
+def test_latency_sketches_round_trip_per_target_and_window() -> None:
+    blob = FakeBlob()
+    store = BlobStateStore(blob)  # ty: ignore[invalid-argument-type]
+    state = PublisherState(
+        last_published_end=WINDOW_END,
+        latency_sketches={
+            "primary": (
+                (datetime(2026, 5, 19, 16, 45, tzinfo=UTC), DDSketch.of([0.1, 0.2])),
+                (WINDOW_END, DDSketch()),
+            )
+        },
+    )
+
+    store.save(state, None)
+
+    assert store.load().state == state
+    (_, latest) = json.loads(blob.data or b"")["latency_sketches"]["primary"]
+    assert latest == {
+        "window_end": "2026-05-19T16:50:00Z",
+        "alpha": 0.01,
+        "zero": 0,
+        "bins": {},
+    }
+
+
+def test_overlapping_invocations_conflict_instead_of_overwriting() -> None:
+    blob = FakeBlob(b'{"last_published_window_end": "2026-05-19T16:45:00Z"}')
+    store = BlobStateStore(blob)  # ty: ignore[invalid-argument-type]
+    first, second = store.load(), store.load()
+
+    store.save(PublisherState(last_published_end=WINDOW_END), first.etag)
+    with pytest.raises(StateConflictError):
+        store.save(PublisherState(last_published_end=WINDOW_END), second.etag)
+
+    with pytest.raises(StateConflictError):
+        BlobStateStore(blob).save(PublisherState(), None)  # ty: ignore[invalid-argument-type]
+
+
+def test_file_store_uses_content_etag(tmp_path: Path) -> None:
+    store = state_store_for((tmp_path / "state.json").as_uri(), credential=None)
+    assert isinstance(store, FileStateStore)
+    first = store.load()
+    assert first.etag is None
+
+    state = state_with_outbox()
+    etag = store.save(state, first.etag)
+
+    assert store.load().etag == etag
+    assert store.load().state == state
+    with pytest.raises(StateConflictError):
+        store.save(PublisherState(), first.etag)
+
+
+def test_module_imports_without_fcntl(monkeypatch: pytest.MonkeyPatch) -> None:
+    # Non-POSIX hosts have no fcntl; only FileStateStore.save needs it.
+    monkeypatch.setitem(sys.modules, "fcntl", None)
+    spec = importlib.util.spec_from_file_location(
+        "state_without_fcntl", state_module.__file__
+    )
+    assert spec is not None and spec.loader is not None
+    module = importlib.util.module_from_spec(spec)
+    monkeypatch.setitem(sys.modules, spec.name, module)
+    spec.loader.exec_module(module)
+
+    assert module.BlobStateStore.__name__ == "BlobStateStore"
@@ -0,0 +1,134 @@
+from __future__ import annotations
+
+import threading
+import urllib.error
+import urllib.request
+from collections.abc import Iterator
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any
+
+import pytest
+
+from external_sli_publisher.transport import PooledTransport
+
+
+class KeepAliveHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    peers: set[tuple[str, int]] = set()
+
+    def do_GET(self) -> None:  # noqa: N802
+        self.peers.add(self.client_address)
+        if self.path == "/redirect":
+            self._reply(302, b"", location="/ok")
+        elif self.path == "/unavailable":
+            self._reply(503, b"down")
+        elif self.path == "/drop":
+            # Keep-alive is advertised, but the server closes the socket anyway
+            # (the idle-timeout race seen on long-lived pooled connections).
+            self._reply(200, b"bye")
+            self.close_connection = True
+        else:
+            self._reply(200, b"ok")
+
+    def do_POST(self) -> None:  # noqa: N802
+        self.peers.add(self.client_address)
+        body = self.rfile.read(int(self.headers["Content-Length"]))
+        self._reply(200, body)
+
+    def _reply(self, status: int, body: bytes, location: str | None = None) -> None:
+        self.send_response(status)
+        self.send_header("Content-Length", str(len(body)))
+        if location:
+            self.send_header("Location", location)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format: str, *args: Any) -> None:  # noqa: A002
+        return None
+
+
+def request(url: str, **kwargs: object) -> urllib.request.Request:
+    return urllib.request.Request(url, **kwargs)  # noqa: S310  # ty: ignore[invalid-argument-type]
+
+
+@pytest.fixture
+def server() -> Iterator[str]:
+    KeepAliveHandler.peers = set()
+    httpd = ThreadingHTTPServer(("127.0.0.1", 0), KeepAliveHandler)
+    thread = threading.Thread(target=httpd.serve_forever, args=(0.05,), daemon=True)
+    thread.start()
+    try:
+        yield f"http://127.0.0.1:{httpd.server_address[1]}"
+    finally:
+        httpd.shutdown()
+        httpd.server_close()
+
+
+def test_sequential_requests_reuse_one_connection(server: str) -> None:
+    transport = PooledTransport()
+    get = request(f"{server}/ok")
+    post = request(f"{server}/write", data=b"payload", method="POST")
+
+    with transport.urlopen(get, timeout=5) as response:
+        assert response.read() == b"ok"
+    with transport.urlopen(post, timeout=5) as response:
+        assert response.read() == b"payload"
+
+    assert transport.connections_opened == 1
+    assert len(KeepAliveHandler.peers) == 1
+    transport.close()
+
+
+def test_error_status_raises_http_error_like_urlopen(server: str) -> None:
+    transport = PooledTransport()
+    with pytest.raises(urllib.error.HTTPError) as exc_info:
+        transport.urlopen(request(f"{server}/unavailable"), timeout=5)
+    assert exc_info.value.code == 503
+    transport.close()
+
+
+def test_get_redirect_is_followed(server: str) -> None:
+    transport = PooledTransport()
+    response = transport.urlopen(request(f"{server}/redirect"), timeout=5)
+    assert response.status == 200
+    assert response.url.endswith("/ok")
+    transport.close()
+
+
+def test_stale_pooled_connection_is_retried_on_a_new_one(server: str) -> None:
+    transport = PooledTransport()
+    transport.urlopen(request(f"{server}/drop"), timeout=5)
+
+    response = transport.urlopen(request(f"{server}/ok"), timeout=5)
+
+    assert response.read() == b"ok"
+    assert transport.connections_opened == 2
+    transport.close()
+
+
+def test_phases_are_timed_on_new_connections_only(server: str) -> None:
+    transport = PooledTransport()
+    first = transport.urlopen(request(f"{server}/ok"), timeout=5).phases
+    second = transport.urlopen(request(f"{server}/ok"), timeout=5).phases
+
+    assert first is not None and second is not None
+    assert first.connection_reused is False
+    assert set(first.as_dict()) == {"dns", "connect", "ttfb", "body"}  # no TLS
+    assert second.connection_reused is True
+    assert set(second.as_dict()) == {"ttfb", "body"}
+    assert all(value >= 0 for value in first.as_dict().values())
+    transport.close()
+
+
+def test_idle_connections_expire() -> None:
+    now = [0.0]
+    transport = PooledTransport(idle_timeout_seconds=10, clock=lambda: now[0])
+    connection, reused = transport._acquire(("http", "example.test", 80), 1)
+    assert reused is False
+    transport._release(("http", "example.test", 80), connection)
+
+    now[0] = 11.0
+    _, reused = transport._acquire(("http", "example.test", 80), 1)
+
+    assert reused is False
+    assert transport.connections_opened == 2